@@ -0,0 +1 @@
+"""Offline performance benchmarks for llm-helpers, run against a local stub server."""
@@ -0,0 +1,269 @@
+"""Run the benchmarks and compare the results with a saved baseline.
+
+    python -m benchmarks                     # run and compare with benchmarks/baseline.json
+    python -m benchmarks --update-baseline   # run and save the results as the new baseline
+
+Exits with status 1 if a result is worse than the baseline by more than the tolerance
+(and, for times and memory, by more than a small absolute noise floor). Metrics ending
+in `_per_second` or `_speedup` are better when higher, all others when lower.
+
+Absolute results depend on the machine, so they are only compared with a baseline
+recorded on the same machine (see `machine_environment`). Ratios between results of
+the same run (see `relative_metrics`) hardly do, and are compared with any baseline.
+"""
+
+import argparse
+import asyncio
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from fastapi import UploadFile
+from langchain_core.messages import HumanMessage
+
+from src.llm_helpers.file_utils import file_to_message
+from src.llm_helpers.get_llm import clear_llm_cache, get_llm
+from src.llm_helpers.http_clients import HttpClients, HttpPoolConfig
+from tests.stub_server import STUB_PROVIDERS, StubOpenAIServer
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_TOLERANCE = 0.5
+# Differences below these are noise, whatever their relative size
+NOISE_FLOORS = {"_seconds": 0.002, "_bytes": 2 * 1024 * 1024, "_ratio": 0.05}
+HIGHER_IS_BETTER = ("_per_second", "_speedup")
+
+PROVIDER_MODEL_STRINGS = {
+    "openai": "openai:gpt-5.1:none",
+    "azure": "azure:gpt-5-chat",
+    "groq": "groq:openai/gpt-oss-120b",
+    "mistralai": "mistralai:mistral-large-latest",
+    "google": "google:gemini-2.5-flash",
+}
+FILE_SIZES_MB = (1, 8, 32)
+
+MESSAGES = [HumanMessage(content="Say hello")]
+
+
+def machine_environment() -> dict[str, object]:
+    """The details absolute results depend on; a baseline is only comparable on a match."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def point_providers_at(server: StubOpenAIServer) -> None:
+    """Configure every provider with fake credentials and the stub server as endpoint."""
+    os.environ.update(server.environment((*STUB_PROVIDERS, "google")))
+
+
+def _best_seconds(fn: Callable[[], object], iterations: int) -> float:
+    """Fastest of `iterations` runs; for sub-millisecond timings the minimum is the least noisy."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_get_llm(iterations: int = 50) -> dict[str, float]:
+    """Construction cost of a client per provider, and of a client cache hit."""
+    results = {}
+    for provider, model_string in PROVIDER_MODEL_STRINGS.items():
+        # The first call imports the provider integration, leave it out
+        get_llm(model_string=model_string)
+        results[f"get_llm_{provider}_seconds"] = _best_seconds(
+            lambda: get_llm(model_string=model_string), iterations
+        )
+
+    get_llm(model_string=PROVIDER_MODEL_STRINGS["openai"], cache=True)
+    results["get_llm_cached_seconds"] = _best_seconds(
+        lambda: get_llm(model_string=PROVIDER_MODEL_STRINGS["openai"], cache=True), iterations
+    )
+    clear_llm_cache()
+    return results
+
+
+def _upload(content: bytes) -> UploadFile:
+    return UploadFile(
+        filename="document.pdf",
+        file=io.BytesIO(content),
+        size=len(content),
+        headers={"content-type": "application/pdf"},
+    )
+
+
+async def bench_file_to_message() -> dict[str, float]:
+    """Throughput and peak traced memory of `file_to_message` per file size and read mode."""
+    results = {}
+    for size_mb in FILE_SIZES_MB:
+        content = os.urandom(size_mb * 1024 * 1024)
+        for mode, streaming in (("read", False), ("streaming", True)):
+            name = f"file_to_message_{size_mb}mb_{mode}"
+
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                await file_to_message(_upload(content), "openai", streaming=streaming)
+                timings.append(time.perf_counter() - start)
+            results[f"{name}_mb_per_second"] = size_mb / statistics.median(timings)
+
+            gc.collect()
+            tracemalloc.start()
+            await file_to_message(_upload(content), "openai", streaming=streaming)
+            results[f"{name}_peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return results
+
+
+async def bench_streaming(server: StubOpenAIServer, requests: int = 20) -> dict[str, float]:
+    """Time to first token and to the complete stream, through warm connections."""
+    clients = HttpClients()
+    llm, _ = get_llm(model_string=PROVIDER_MODEL_STRINGS["openai"], http_clients=clients)
+    ttfts, totals = [], []
+    for _ in range(requests + 1):
+        start = time.perf_counter()
+        first = None
+        async for chunk in llm.astream(MESSAGES):
+            if first is None and chunk.content:
+                first = time.perf_counter()
+        ttfts.append(first - start)
+        totals.append(time.perf_counter() - start)
+    await clients.aclose()
+
+    # The first request opens the connection, leave it out
+    ttft = statistics.median(ttfts[1:])
+    return {
+        "stream_ttft_seconds": ttft,
+        "stream_ttft_overhead_seconds": max(ttft - server.latency, 0.0),
+        "stream_total_seconds": statistics.median(totals[1:]),
+    }
+
+
+async def bench_concurrency(concurrency: int = 32, requests: int = 256) -> dict[str, float]:
+    """Throughput of many concurrent non-streaming calls through one shared pool."""
+    clients = HttpClients(HttpPoolConfig(max_connections=concurrency))
+    llm, _ = get_llm(model_string=PROVIDER_MODEL_STRINGS["openai"], streaming=False, http_clients=clients)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call() -> None:
+        async with semaphore:
+            await llm.ainvoke(MESSAGES)
+
+    # The first call opens a connection, leave it out
+    await call()
+    start = time.perf_counter()
+    await call()
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await clients.aclose()
+    return {"single_request_seconds": single, "concurrent_requests_per_second": requests / elapsed}
+
+
+async def run_benchmarks(latency: float, token_rate: float, tokens: int) -> dict[str, float]:
+    reply = " ".join(f"token{i}" for i in range(tokens))
+    token_interval = 1 / token_rate if token_rate else 0.0
+    results = {}
+    with StubOpenAIServer(reply=reply, latency=latency, token_interval=token_interval) as server:
+        point_providers_at(server)
+        results.update(bench_get_llm())
+        results.update(await bench_file_to_message())
+        results.update(await bench_streaming(server))
+        results.update(await bench_concurrency())
+    return results
+
+
+def relative_metrics(results: dict[str, float], latency: float) -> dict[str, float]:
+    """Ratios between results of one run, which carry over between machines."""
+    ratios = {
+        "get_llm_cached_ratio": results["get_llm_cached_seconds"] / results["get_llm_openai_seconds"],
+        "concurrent_speedup": results["concurrent_requests_per_second"] * results["single_request_seconds"],
+    }
+    if latency > 0:
+        ratios["stream_ttft_ratio"] = results["stream_ttft_seconds"] / latency
+    for size_mb in FILE_SIZES_MB:
+        for mode in ("read", "streaming"):
+            name = f"file_to_message_{size_mb}mb_{mode}"
+            peak = results[f"{name}_peak_memory_bytes"]
+            ratios[f"{name}_peak_memory_ratio"] = peak / (size_mb * 1024 * 1024)
+    return ratios
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], tolerance: float) -> list[str]:
+    """Return a description of every result worse than its baseline by more than `tolerance`."""
+    regressions = []
+    for name, expected in baseline.items():
+        value = results.get(name)
+        if value is None or expected <= 0:
+            continue
+        if name.endswith(HIGHER_IS_BETTER):
+            change = (expected - value) / expected
+        else:
+            change = (value - expected) / expected
+            floor = next((floor for suffix, floor in NOISE_FLOORS.items() if name.endswith(suffix)), 0)
+            if value - expected <= floor:
+                continue
+        if change > tolerance:
+            regressions.append(f"{name}: {value:.4g} vs baseline {expected:.4g} ({change:.0%} worse)")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative regression")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server latency in seconds")
+    parser.add_argument("--token-rate", type=float, default=500, help="stub server tokens per second")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens per stub server reply")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmarks(args.latency, args.token_rate, args.tokens))
+    ratios = relative_metrics(results, args.latency)
+
+    settings = {"latency": args.latency, "token_rate": args.token_rate, "tokens": args.tokens}
+    environment = machine_environment()
+    saved = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    baseline, baseline_ratios = saved.get("results", {}), saved.get("ratios", {})
+    same_machine = saved.get("environment") == environment
+    if saved and saved.get("settings") != settings and not args.update_baseline:
+        print(f"Baseline was recorded with {saved.get('settings')}, not {settings}", file=sys.stderr)
+    if saved and not same_machine and not args.update_baseline:
+        print(
+            f"Baseline was recorded on {saved.get('environment')}, not {environment}; "
+            "only comparing ratios",
+            file=sys.stderr,
+        )
+    width = max(map(len, [*results, *ratios]))
+    for values, reference_values in ((results, baseline), (ratios, baseline_ratios)):
+        for name, value in values.items():
+            reference = f"  (baseline {reference_values[name]:.4g})" if name in reference_values else ""
+            print(f"{name:<{width}}  {value:.4g}{reference}")
+
+    if args.update_baseline:
+        saved = {"environment": environment, "settings": settings, "results": results, "ratios": ratios}
+        args.baseline.write_text(json.dumps(saved, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(ratios, baseline_ratios, args.tolerance)
+    if same_machine:
+        regressions += compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
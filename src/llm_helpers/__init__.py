@@ -1,10 +1,210 @@
 """LLM Helpers - A library for interacting with various LLM providers."""
 
-from .file_utils import file_to_message
-from .get_llm import get_llm
-from .const import MODEL_PROVIDERS, DEFAULT_MODEL_STRINGS
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+from .file_utils import file_to_message, file_to_messages, FileTooLargeError
+from .encoding_cache import EncodingCache, EncodingCacheInfo
+from .file_references import FileReference, FileReferenceCache, upload_file
+from .preprocess import PreprocessOptions, DEFAULT_PREPROCESS_OPTIONS, preprocess_content
+from .text_extraction import TextExtractionError, extract_text
+from .get_llm import get_llm, get_llm_cache_info, clear_llm_cache, set_llm_cache_maxsize
+from .const import (
+    MODEL_PROVIDERS,
+    DEFAULT_MODEL_STRINGS,
+    DEFAULT_EMBEDDING_MODEL_STRINGS,
+    EMBEDDING_BATCH_LIMITS,
+    MODEL_CONTEXT_BUDGETS,
+    ContextBudget,
+)
 from .parse_model_string import parse_model_string
 
+if TYPE_CHECKING:
+    from .http_clients import (
+        HttpClients,
+        HttpPoolConfig,
+        get_shared_http_clients,
+        close_shared_http_clients,
+    )
+    from .router import RouterChatModel, BackendStats
+    from .embeddings import get_embeddings, BatchedEmbeddings, EmbeddingCache, EmbeddingCacheInfo
+    from .rate_limit import (
+        RateLimit,
+        AdaptiveRateLimiter,
+        RateLimitCallbackHandler,
+        get_rate_limiter,
+        clear_rate_limiters,
+    )
+    from .response_cache import (
+        ResponseCache,
+        MemoryResponseCache,
+        SQLiteResponseCache,
+        RedisResponseCache,
+        CachedChatModel,
+        no_response_cache,
+    )
+    from .bulk import bulk_invoke, BulkResult
+    from .map_reduce import DocumentChunk, MapReduceResult, split_document, map_reduce
+    from .fan_out import fan_out, FanOutEvent, FanOutTiming
+    from .metrics import LLMMetrics, MetricsCallbackHandler, get_llm_metrics
+    from .warmup import warmup, WarmupTiming
+    from .loadtest import load_test, LoadTestResult, Percentiles
+    from .sse import StreamEvent, chunk_events, normalized_stream, sse_stream, sse_response
+    from .lazy_parts import LazyFile, LazyFileData
+    from .prompt_cache import PromptCache, GoogleContextCache, ContextCacheHandle
+    from .tokens import (
+        count_tokens,
+        count_message_tokens,
+        get_context_budget,
+        fits_context,
+        trim_to_budget,
+    )
+
 __version__ = "0.1.0"
 
-__all__ = ["file_to_message", "get_llm", "MODEL_PROVIDERS", "DEFAULT_MODEL_STRINGS", "parse_model_string"]
+# Exports backed by heavier dependencies (httpx, langchain_core, ...) are imported on
+# first attribute access, so `import llm_helpers` stays cheap.
+_LAZY_EXPORTS = {
+    "HttpClients": ".http_clients",
+    "HttpPoolConfig": ".http_clients",
+    "get_shared_http_clients": ".http_clients",
+    "close_shared_http_clients": ".http_clients",
+    "RouterChatModel": ".router",
+    "get_embeddings": ".embeddings",
+    "BatchedEmbeddings": ".embeddings",
+    "EmbeddingCache": ".embeddings",
+    "EmbeddingCacheInfo": ".embeddings",
+    "BackendStats": ".router",
+    "RateLimit": ".rate_limit",
+    "AdaptiveRateLimiter": ".rate_limit",
+    "RateLimitCallbackHandler": ".rate_limit",
+    "get_rate_limiter": ".rate_limit",
+    "clear_rate_limiters": ".rate_limit",
+    "ResponseCache": ".response_cache",
+    "MemoryResponseCache": ".response_cache",
+    "SQLiteResponseCache": ".response_cache",
+    "RedisResponseCache": ".response_cache",
+    "CachedChatModel": ".response_cache",
+    "no_response_cache": ".response_cache",
+    "bulk_invoke": ".bulk",
+    "BulkResult": ".bulk",
+    "DocumentChunk": ".map_reduce",
+    "MapReduceResult": ".map_reduce",
+    "split_document": ".map_reduce",
+    "map_reduce": ".map_reduce",
+    "fan_out": ".fan_out",
+    "FanOutEvent": ".fan_out",
+    "FanOutTiming": ".fan_out",
+    "LLMMetrics": ".metrics",
+    "MetricsCallbackHandler": ".metrics",
+    "get_llm_metrics": ".metrics",
+    "warmup": ".warmup",
+    "WarmupTiming": ".warmup",
+    "load_test": ".loadtest",
+    "LoadTestResult": ".loadtest",
+    "Percentiles": ".loadtest",
+    "StreamEvent": ".sse",
+    "chunk_events": ".sse",
+    "normalized_stream": ".sse",
+    "sse_stream": ".sse",
+    "sse_response": ".sse",
+    "LazyFile": ".lazy_parts",
+    "LazyFileData": ".lazy_parts",
+    "PromptCache": ".prompt_cache",
+    "GoogleContextCache": ".prompt_cache",
+    "ContextCacheHandle": ".prompt_cache",
+    "count_tokens": ".tokens",
+    "count_message_tokens": ".tokens",
+    "get_context_budget": ".tokens",
+    "fits_context": ".tokens",
+    "trim_to_budget": ".tokens",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_EXPORTS:
+        value = getattr(import_module(_LAZY_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "file_to_message",
+    "file_to_messages",
+    "FileTooLargeError",
+    "EncodingCache",
+    "EncodingCacheInfo",
+    "FileReference",
+    "FileReferenceCache",
+    "upload_file",
+    "PreprocessOptions",
+    "DEFAULT_PREPROCESS_OPTIONS",
+    "preprocess_content",
+    "TextExtractionError",
+    "extract_text",
+    "get_llm",
+    "get_llm_cache_info",
+    "clear_llm_cache",
+    "set_llm_cache_maxsize",
+    "MODEL_PROVIDERS",
+    "DEFAULT_MODEL_STRINGS",
+    "DEFAULT_EMBEDDING_MODEL_STRINGS",
+    "EMBEDDING_BATCH_LIMITS",
+    "MODEL_CONTEXT_BUDGETS",
+    "ContextBudget",
+    "parse_model_string",
+    "get_embeddings",
+    "BatchedEmbeddings",
+    "EmbeddingCache",
+    "EmbeddingCacheInfo",
+    "HttpClients",
+    "HttpPoolConfig",
+    "get_shared_http_clients",
+    "close_shared_http_clients",
+    "RouterChatModel",
+    "BackendStats",
+    "RateLimit",
+    "AdaptiveRateLimiter",
+    "RateLimitCallbackHandler",
+    "get_rate_limiter",
+    "clear_rate_limiters",
+    "ResponseCache",
+    "MemoryResponseCache",
+    "SQLiteResponseCache",
+    "RedisResponseCache",
+    "CachedChatModel",
+    "no_response_cache",
+    "bulk_invoke",
+    "BulkResult",
+    "DocumentChunk",
+    "MapReduceResult",
+    "split_document",
+    "map_reduce",
+    "fan_out",
+    "FanOutEvent",
+    "FanOutTiming",
+    "LLMMetrics",
+    "MetricsCallbackHandler",
+    "get_llm_metrics",
+    "warmup",
+    "WarmupTiming",
+    "load_test",
+    "LoadTestResult",
+    "Percentiles",
+    "StreamEvent",
+    "chunk_events",
+    "normalized_stream",
+    "sse_stream",
+    "sse_response",
+    "LazyFile",
+    "LazyFileData",
+    "PromptCache",
+    "GoogleContextCache",
+    "ContextCacheHandle",
+    "count_tokens",
+    "count_message_tokens",
+    "get_context_budget",
+    "fits_context",
+    "trim_to_budget",
+]
@@ -0,0 +1,238 @@
+"""Bulk processing of many prompts through provider batch APIs."""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import deque
+from collections.abc import AsyncIterator, Iterable, Sequence
+from typing import Any, NamedTuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+
+from .file_references import provider_client
+from .get_llm import get_llm
+from .state_file import StateCheckpoints, load_state
+
+# OpenAI accepts at most 50,000 requests per batch
+MAX_BATCH_SIZE = 50_000
+DEFAULT_BULK_CONCURRENCY = 8
+BATCH_PROVIDERS = ("openai", "azure")
+
+_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BulkResult(NamedTuple):
+    """The answer to one request of `bulk_invoke`, or the error it failed with."""
+
+    index: int
+    message: AIMessage | None
+    error: str | None = None
+
+
+async def bulk_invoke(
+    model_string: str,
+    requests: Iterable[Sequence[BaseMessage]],
+    state_path: str | os.PathLike | None = None,
+    poll_interval: float = 30.0,
+    max_batch_size: int = MAX_BATCH_SIZE,
+    max_concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    client: Any | None = None,
+) -> AsyncIterator[BulkResult]:
+    """
+    Answer many message lists, through the provider's batch API where available.
+
+    OpenAI and Azure requests are uploaded as JSONL files and submitted as batch jobs
+    (at most `max_batch_size` requests each), which are polled until they finish. Other
+    providers fall back to direct calls, at most `max_concurrency` at a time.
+
+    Args:
+        model_string: Model specification, see `parse_model_string`
+        requests: The message lists to send, one request each
+        state_path: JSON file the submitted batch jobs are recorded in. Calling again with
+            the same file and requests resumes polling the recorded jobs instead of
+            submitting them again. Ignored by the direct-call fallback.
+        poll_interval: Seconds between status checks of a batch job
+        max_batch_size: Maximum number of requests per batch job
+        max_concurrency: Maximum concurrent calls of the direct-call fallback
+        client: `openai.AsyncOpenAI` client for the batch API. Built from the
+            environment when None, and closed once the results were yielded.
+
+    Yields:
+        One `BulkResult` per request, in input order. Results of a batch job are yielded
+        once the job has finished.
+
+    Raises:
+        ValueError: If `state_path` records a job for different requests
+    """
+    llm, provider = get_llm(model_string=model_string, streaming=False)
+    if provider not in BATCH_PROVIDERS:
+        async for result in _invoke_concurrently(llm, requests, max_concurrency):
+            yield result
+        return
+
+    async with provider_client(provider, client) as client:
+        batches = _invoke_batches(
+            llm, client, model_string, requests, state_path, poll_interval, max_batch_size
+        )
+        async for result in batches:
+            yield result
+
+
+async def _invoke_batches(
+    llm: BaseChatModel,
+    client: Any,
+    model_string: str,
+    requests: Iterable[Sequence[BaseMessage]],
+    state_path: str | os.PathLike | None,
+    poll_interval: float,
+    max_batch_size: int,
+) -> AsyncIterator[BulkResult]:
+    """Submit `requests` as batch jobs, or resume the recorded ones, and yield their results."""
+    payloads = [_request_body(llm, messages) for messages in requests]
+    state = await asyncio.to_thread(
+        load_state,
+        state_path,
+        _digest(model_string, payloads),
+        {"jobs": []},
+        "a batch job for different requests",
+    )
+    # A submitted job must be recorded before the next one, or a retry would submit it again
+    checkpoints = StateCheckpoints(state_path, interval=0)
+
+    # Submit the requests not covered by a recorded job yet
+    start = sum(job["count"] for job in state["jobs"])
+    while start < len(payloads):
+        chunk = payloads[start : start + max_batch_size]
+        batch_id = await _submit(client, chunk, start)
+        state["jobs"].append({"batch_id": batch_id, "start": start, "count": len(chunk)})
+        await checkpoints.save(state)
+        start += len(chunk)
+
+    for job in state["jobs"]:
+        results = await _wait_for_results(client, job["batch_id"], poll_interval)
+        for index in range(job["start"], job["start"] + job["count"]):
+            yield _parse_result(llm, index, results.get(_custom_id(index)))
+
+
+async def _invoke_concurrently(
+    llm: BaseChatModel, requests: Iterable[Sequence[BaseMessage]], max_concurrency: int
+) -> AsyncIterator[BulkResult]:
+    """Call `llm` directly, yielding in input order while later requests run."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def invoke(index: int, messages: Sequence[BaseMessage]) -> BulkResult:
+        async with semaphore:
+            try:
+                return BulkResult(index, await llm.ainvoke(list(messages)))
+            except Exception as e:
+                return BulkResult(index, None, f"{type(e).__name__}: {e}")
+
+    # Keep a few requests queued behind the running ones, without creating a task for
+    # every request up front
+    window: deque[asyncio.Task[BulkResult]] = deque()
+    try:
+        for index, messages in enumerate(requests):
+            window.append(asyncio.create_task(invoke(index, messages)))
+            if len(window) >= 2 * max_concurrency:
+                yield await window.popleft()
+        while window:
+            yield await window.popleft()
+    finally:
+        for task in window:
+            task.cancel()
+
+
+def _request_body(llm: BaseChatModel, messages: Sequence[BaseMessage]) -> dict:
+    """The API request body the client would send for `messages`."""
+    payload = llm._get_request_payload(list(messages))
+    payload.pop("stream", None)
+    return payload
+
+
+def _endpoint(body: dict) -> str:
+    return "/v1/responses" if "input" in body else "/v1/chat/completions"
+
+
+def _custom_id(index: int) -> str:
+    return f"request-{index}"
+
+
+def _digest(model_string: str, payloads: list[dict]) -> str:
+    hasher = hashlib.sha256(model_string.encode())
+    for payload in payloads:
+        hasher.update(json.dumps(payload, sort_keys=True, default=str).encode())
+    return hasher.hexdigest()
+
+
+async def _submit(client: Any, payloads: list[dict], start: int) -> str:
+    lines = [
+        json.dumps(
+            {
+                "custom_id": _custom_id(start + offset),
+                "method": "POST",
+                "url": _endpoint(payload),
+                "body": payload,
+            },
+            default=str,
+        )
+        for offset, payload in enumerate(payloads)
+    ]
+    uploaded = await client.files.create(
+        file=("batch.jsonl", "\n".join(lines).encode(), "application/jsonl"),
+        purpose="batch",
+    )
+    batch = await client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=_endpoint(payloads[0]),
+        completion_window="24h",
+    )
+    return batch.id
+
+
+async def _wait_for_results(client: Any, batch_id: str, poll_interval: float) -> dict[str, dict]:
+    """Poll the batch until it finishes and return its result lines by custom ID."""
+    batch = await client.batches.retrieve(batch_id)
+    while batch.status not in _FINAL_STATUSES:
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch_id)
+
+    # Expired and cancelled batches still have results for the requests that finished
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if file_id is None:
+            continue
+        content = await client.files.content(file_id)
+        for line in content.text.splitlines():
+            if line.strip():
+                result = json.loads(line)
+                results[result["custom_id"]] = result
+    if not results and batch.status == "failed":
+        errors = batch.errors.data if batch.errors is not None else []
+        message = "; ".join(error.message or "" for error in errors or [])
+        raise RuntimeError(f"Batch {batch_id} failed: {message}")
+    return results
+
+
+def _parse_result(llm: BaseChatModel, index: int, result: dict | None) -> BulkResult:
+    if result is None:
+        return BulkResult(index, None, "No result returned by the batch job")
+    if result.get("error"):
+        return BulkResult(index, None, json.dumps(result["error"]))
+    response = result["response"]
+    if response["status_code"] != 200:
+        return BulkResult(index, None, json.dumps(response["body"]))
+
+    body = response["body"]
+    if body.get("object") == "response":
+        from langchain_openai.chat_models.base import _construct_lc_result_from_responses_api
+        from openai.types.responses import Response
+
+        # Build the response leniently, as the SDK does for HTTP responses
+        chat_result = _construct_lc_result_from_responses_api(
+            Response.model_construct(**body), output_version=llm.output_version
+        )
+    else:
+        chat_result = llm._create_chat_result(body)
+    return BulkResult(index, chat_result.generations[0].message)
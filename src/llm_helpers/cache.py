@@ -0,0 +1,120 @@
+"""A small thread-safe LRU cache with hit/miss counters."""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+from typing import Generic, NamedTuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class CacheInfo(NamedTuple):
+    """Statistics of an `LRUCache`, modelled after `functools.lru_cache().cache_info()`."""
+
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Size-bounded least-recently-used cache.
+
+    By default every entry counts as 1 towards `maxsize`. Pass a `weigher` to bound the
+    cache by something else, e.g. `weigher=len` to bound it by the total payload size.
+    """
+
+    def __init__(self, maxsize: int, weigher: Callable[[V], int] | None = None) -> None:
+        if maxsize < 0:
+            raise ValueError(f"maxsize must be >= 0, got {maxsize}")
+
+        self.maxsize = maxsize
+        self._weigher = weigher
+        self._data: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._currsize = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        """Return the cached value for `key` and mark it as recently used."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: K, value: V) -> None:
+        """Insert or replace `key`, evicting least recently used entries if needed."""
+        weight = self._weigher(value) if self._weigher is not None else 1
+        with self._lock:
+            if key in self._data:
+                self._currsize -= self._data.pop(key)[1]
+            if weight > self.maxsize:
+                # Never cache something that could not fit even in an empty cache.
+                return
+            self._data[key] = (value, weight)
+            self._currsize += weight
+            self._evict()
+
+    def resize(self, maxsize: int) -> None:
+        """Change `maxsize`, evicting least recently used entries if the cache shrinks."""
+        if maxsize < 0:
+            raise ValueError(f"maxsize must be >= 0, got {maxsize}")
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def invalidate(self, key: K) -> bool:
+        """Remove `key` from the cache. Returns whether it was present."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return False
+            self._currsize -= entry[1]
+            return True
+
+    def invalidate_where(self, predicate: Callable[[K], bool]) -> int:
+        """Remove all keys for which `predicate` is true. Returns the number removed."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._currsize -= self._data.pop(key)[1]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self._currsize = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def info(self) -> CacheInfo:
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self.maxsize, self._currsize)
+
+    def _evict(self) -> None:
+        while self._currsize > self.maxsize:
+            _, (_, evicted_weight) = self._data.popitem(last=False)
+            self._currsize -= evicted_weight
+            self._evictions += 1
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def __iter__(self) -> Iterator[K]:
+        with self._lock:
+            return iter(list(self._data))
@@ -0,0 +1,174 @@
+"""Command line interface, installed as `llm-helpers`.
+
+    llm-helpers bench openai:gpt-5.1:none groq:openai/gpt-oss-120b --prompt prompt.txt \\
+        --attach contract.pdf --concurrency 16 --duration 60
+
+Runs a load test per model specification (see `load_test`) one after the other and
+prints latency, time to first token and token rate percentiles, throughput and errors.
+Credentials and endpoints are read from the usual environment variables; `--base-url`
+points the benchmarked OpenAI-compatible providers at another endpoint, such as a local
+stub.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import mimetypes
+import os
+import sys
+from pathlib import Path
+from typing import Any
+
+# Per provider, the variable `--base-url` overrides and the key variable filled in if unset
+BASE_URL_ENV_VARS = {
+    "openai": ("OPENAI_BASE_URL", "OPENAI_API_KEY"),
+    "azure": ("AZURE_BASE_URL", "AZURE_OPENAI_API_KEY"),
+    "groq": ("GROQ_API_BASE", "GROQ_API_KEY"),
+    "mistralai": ("MISTRAL_BASE_URL", "MISTRAL_API_KEY"),
+}
+# The Groq SDK appends this path to GROQ_API_BASE
+GROQ_API_PATH = "/openai/v1"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="llm-helpers", description="Tools for the clients built by llm-helpers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser("bench", help="load test model specifications")
+    bench.add_argument("model_strings", nargs="+", metavar="MODEL", help="model specifications, e.g. openai:gpt-5.1:none")
+    bench.add_argument("--prompt", type=Path, required=True, help="file with the prompt text")
+    bench.add_argument("--attach", type=Path, action="append", default=[], help="file sent with the prompt (repeatable)")
+    bench.add_argument("--concurrency", type=int, default=8, help="requests in flight (default: 8)")
+    bench.add_argument("--duration", type=float, default=30.0, help="seconds per model (default: 30)")
+    bench.add_argument("--max-requests", type=int, help="stop each model after this many requests")
+    bench.add_argument("--no-streaming", action="store_true", help="invoke instead of streaming responses")
+    bench.add_argument("--no-warmup", action="store_true", help="do not open connections or send an unmeasured first request")
+    bench.add_argument("--base-url", help="endpoint for the OpenAI-compatible providers, e.g. a local stub")
+    bench.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.base_url:
+            point_providers_at(args.base_url, args.model_strings)
+        results = asyncio.run(_bench(args))
+    except (ValueError, NotImplementedError, OSError) as e:
+        parser.error(str(e))
+
+    if args.json:
+        print(json.dumps([_as_dict(result) for result in results], indent=2))
+    else:
+        print("\n\n".join(format_result(result) for result in results))
+    return 0
+
+
+def point_providers_at(base_url: str, model_strings: list[str]) -> None:
+    """
+    Point the providers of `model_strings` at `base_url` through their environment variables.
+
+    Raises:
+        ValueError: If a provider cannot be pointed at another endpoint, or `base_url` does
+            not end in `GROQ_API_PATH` for Groq
+    """
+    from .parse_model_string import parse_model_string
+
+    for model_string in model_strings:
+        provider, _, _ = parse_model_string(model_string=model_string)
+        if provider not in BASE_URL_ENV_VARS:
+            raise ValueError(f"--base-url cannot point {provider} models at another endpoint")
+        url_var, key_var = BASE_URL_ENV_VARS[provider]
+        url = base_url
+        if provider == "groq":
+            url = base_url.rstrip("/")
+            if not url.endswith(GROQ_API_PATH):
+                raise ValueError(
+                    f"The Groq SDK appends {GROQ_API_PATH} to its base URL, "
+                    f"so --base-url must end in {GROQ_API_PATH} for Groq models"
+                )
+            url = url.removesuffix(GROQ_API_PATH)
+        os.environ[url_var] = url
+        os.environ.setdefault(key_var, "bench-key")
+
+
+async def _bench(args: argparse.Namespace) -> list:
+    from langchain_core.messages import HumanMessage
+
+    from .file_utils import file_to_message
+    from .http_clients import HttpClients, HttpPoolConfig
+    from .loadtest import load_test
+    from .parse_model_string import parse_model_string
+    from .warmup import warmup
+
+    prompt = args.prompt.read_text()
+    attachments = [(path.name, path.read_bytes()) for path in args.attach]
+    clients = HttpClients(
+        HttpPoolConfig(max_connections=max(100, args.concurrency), max_keepalive_connections=args.concurrency)
+    )
+    options = {"streaming": not args.no_streaming, "http_clients": clients}
+
+    results = []
+    try:
+        for model_string in args.model_strings:
+            provider, _, _ = parse_model_string(model_string=model_string)
+            parts = [await file_to_message(_upload(name, content), provider) for name, content in attachments]
+            content = [{"type": "text", "text": prompt}, *parts] if parts else prompt
+
+            messages = [HumanMessage(content=content)]
+
+            if not args.no_warmup:
+                await warmup([model_string], connections=args.concurrency, **options)
+                # The first response also pays for one-time setup in the SDK (e.g. building
+                # the models of streamed events), which would skew the percentiles
+                await load_test(model_string, messages, concurrency=1, max_requests=1, **options)
+            results.append(
+                await load_test(
+                    model_string,
+                    messages,
+                    concurrency=args.concurrency,
+                    duration=args.duration,
+                    max_requests=args.max_requests,
+                    **options,
+                )
+            )
+    finally:
+        await clients.aclose()
+    return results
+
+
+def _upload(name: str, content: bytes) -> Any:
+    from fastapi import UploadFile
+
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    return UploadFile(filename=name, file=io.BytesIO(content), size=len(content), headers={"content-type": content_type})
+
+
+def format_result(result: Any) -> str:
+    """Render a `LoadTestResult` as a human-readable block."""
+    lines = [
+        f"{result.model_string}  concurrency {result.concurrency}  {result.duration:.1f}s",
+        f"  requests   {result.requests} ({result.requests_per_second:.2f}/s), "
+        f"{sum(result.errors.values())} failed",
+    ]
+    for label, percentiles, unit in (
+        ("latency", result.latency, "s"),
+        ("ttft", result.time_to_first_token, "s"),
+        ("tokens/s", result.output_tokens_per_second, ""),
+    ):
+        if percentiles is not None:
+            values = "  ".join(f"{name} {value:.3f}{unit}" for name, value in percentiles._asdict().items())
+            lines.append(f"  {label:<10} {values}")
+    lines.append(f"  output     {result.output_token_throughput:.1f} tokens/s in total")
+    for error, count in sorted(result.errors.items(), key=lambda item: -item[1]):
+        lines.append(f"  error      {error}: {count}")
+    return "\n".join(lines)
+
+
+def _as_dict(result: Any) -> dict:
+    return {
+        name: value._asdict() if hasattr(value, "_asdict") else value
+        for name, value in result._asdict().items()
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from typing import Literal, TypedDict
+from typing import Literal, NamedTuple, TypedDict
 
 
 MODEL_PROVIDERS = Literal["openai", "azure", "groq", "mistralai", "google"]
@@ -17,4 +17,56 @@ DEFAULT_MODEL_STRINGS: DefaultModelStrings = {
     "groq": "groq:openai/gpt-oss-120b",
     "mistralai": "mistralai:mistral-large-latest",
     "google": "google:gemini-3-flash-preview:minimal"
-}
\ No newline at end of file
+}
+
+class ContextBudget(NamedTuple):
+    """Token limits of a model: the whole context window and the largest possible output."""
+
+    context_window: int
+    max_output_tokens: int
+
+
+# Limits by model name prefix; the longest matching prefix wins
+MODEL_CONTEXT_BUDGETS: dict[str, ContextBudget] = {
+    "gpt-5": ContextBudget(400_000, 128_000),
+    "gpt-5-chat": ContextBudget(128_000, 16_384),
+    "gpt-4.1": ContextBudget(1_047_576, 32_768),
+    "gpt-4o": ContextBudget(128_000, 16_384),
+    "openai/gpt-oss": ContextBudget(131_072, 65_536),
+    "mistral-large": ContextBudget(131_072, 32_768),
+    "mistral-medium": ContextBudget(131_072, 32_768),
+    "mistral-small": ContextBudget(131_072, 32_768),
+    "gemini-2.5": ContextBudget(1_048_576, 65_536),
+    "gemini-3": ContextBudget(1_048_576, 65_536),
+}
+
+
+class DefaultEmbeddingModelStrings(TypedDict, total=True):
+    openai: str
+    azure: str
+    mistralai: str
+    google: str
+
+
+# Groq serves no embedding models
+DEFAULT_EMBEDDING_MODEL_STRINGS: DefaultEmbeddingModelStrings = {
+    "openai": "openai:text-embedding-3-small",
+    "azure": "azure:text-embedding-3-small",
+    "mistralai": "mistralai:mistral-embed",
+    "google": "google:gemini-embedding-001",
+}
+
+
+class EmbeddingBatchLimits(NamedTuple):
+    """How many texts, and how many tokens in total, one embedding request may carry."""
+
+    max_inputs: int
+    max_tokens: int | None
+
+
+EMBEDDING_BATCH_LIMITS: dict[str, EmbeddingBatchLimits] = {
+    "openai": EmbeddingBatchLimits(2048, 300_000),
+    "azure": EmbeddingBatchLimits(2048, 300_000),
+    "mistralai": EmbeddingBatchLimits(512, 16_000),
+    "google": EmbeddingBatchLimits(100, None),
+}
@@ -0,0 +1,511 @@
+"""Embedding clients that batch concurrent requests and cache vectors by content.
+
+`get_embeddings` is the companion of `get_llm` for embedding models. Texts embedded
+concurrently through one client, e.g. one per request handler, are merged into batches as
+large as the provider accepts, and vectors are kept in an optional `EmbeddingCache` keyed
+by the hash of the text, so re-indexing unchanged documents sends no requests.
+"""
+
+import array
+import asyncio
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import Counter
+from collections.abc import Iterator, Sequence
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from langchain_core.embeddings import Embeddings
+
+from .cache import LRUCache
+from .const import (
+    DEFAULT_EMBEDDING_MODEL_STRINGS,
+    EMBEDDING_BATCH_LIMITS,
+    MODEL_PROVIDERS,
+    EmbeddingBatchLimits,
+)
+from .parse_model_string import parse_model_string
+from .tokens import count_text_tokens
+
+if TYPE_CHECKING:
+    from .http_clients import HttpClients
+
+
+DEFAULT_EMBEDDING_CACHE_SIZE = 100_000
+
+# Seconds a batch waits for texts of other callers before it is sent
+DEFAULT_MAX_BATCH_WAIT = 0.005
+
+# Keys looked up per query in the on-disk tier, below SQLite's bound parameter limit
+_SQLITE_LOOKUP_SIZE = 500
+
+
+class EmbeddingCacheInfo(NamedTuple):
+    """Statistics of an `EmbeddingCache`."""
+
+    hits: int
+    disk_hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class EmbeddingCache:
+    """
+    Embedding vectors keyed by the SHA-256 of the model and the text.
+
+    The in-memory tier is an LRU of `maxsize` vectors; an optional SQLite file keeps them
+    across restarts and worker processes. Vectors are stored as 64-bit floats, so they
+    come back exactly as the provider returned them.
+
+    Args:
+        maxsize: Number of vectors kept in memory
+        path: Database file for the on-disk tier, created if it does not exist. Disabled
+            when None.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_EMBEDDING_CACHE_SIZE, path: str | os.PathLike | None = None) -> None:
+        self._memory: LRUCache[str, array.array] = LRUCache(maxsize)
+        self.path = os.fspath(path) if path is not None else None
+        self._stats: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._connection = None
+        if self.path is not None:
+            # WAL mode, so uvicorn workers on the same host can share one file
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            with self._lock:
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+                )
+
+    @staticmethod
+    def key(namespace: str, text: str) -> str:
+        """Return the cache key of `text` embedded by the model `namespace` identifies."""
+        return hashlib.sha256(f"{namespace}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> dict[str, list[float]]:
+        """Return the vectors stored under the distinct `keys`, from memory or disk."""
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is not None:
+                found[key] = vector.tolist()
+            else:
+                missing.append(key)
+        hits = len(found)
+
+        if missing and self._connection is not None:
+            for start in range(0, len(missing), _SQLITE_LOOKUP_SIZE):
+                batch = missing[start : start + _SQLITE_LOOKUP_SIZE]
+                with self._lock:
+                    rows = self._connection.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                for key, blob in rows:
+                    vector = array.array("d")
+                    vector.frombytes(blob)
+                    self._memory.put(key, vector)
+                    found[key] = vector.tolist()
+
+        with self._lock:
+            self._stats["hits"] += hits
+            self._stats["disk_hits"] += len(found) - hits
+            self._stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, vectors: dict[str, list[float]]) -> None:
+        """Store `vectors` by key in memory and, if enabled, on disk."""
+        packed = {key: array.array("d", vector) for key, vector in vectors.items()}
+        for key, vector in packed.items():
+            self._memory.put(key, vector)
+        if self._connection is not None:
+            with self._lock:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in packed.items()],
+                )
+
+    def info(self) -> EmbeddingCacheInfo:
+        """Return hit/miss counters and the size of the in-memory tier."""
+        memory = self._memory.info()
+        with self._lock:
+            return EmbeddingCacheInfo(
+                self._stats["hits"],
+                self._stats["disk_hits"],
+                self._stats["misses"],
+                memory.maxsize,
+                memory.currsize,
+            )
+
+    def clear(self) -> None:
+        """Empty the in-memory tier and reset the statistics. The disk tier is kept."""
+        self._memory.clear()
+        with self._lock:
+            self._stats.clear()
+
+    def close(self) -> None:
+        if self._connection is not None:
+            with self._lock:
+                self._connection.close()
+
+
+class _PendingBatch:
+    """Texts queued for one request, by cache key."""
+
+    def __init__(self, timer: asyncio.TimerHandle | None = None) -> None:
+        self.texts: dict[str, str] = {}
+        self.futures: dict[str, asyncio.Future[list[float]]] = {}
+        self.tokens = 0
+        self.timer = timer
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings client that merges concurrent calls into batches and caches vectors.
+
+    Async calls made within `max_batch_wait` seconds of each other share requests: their
+    texts are queued and sent together once the batch reaches the provider's limits or
+    the wait is over. A text already queued or in flight is not sent again. Sync calls are
+    split into batches as well, but not merged with other calls.
+
+    Args:
+        embeddings: The provider client
+        namespace: Identifies the model in cache keys, e.g. 'openai:text-embedding-3-small'
+        limits: Largest request the provider accepts
+        cache: Answer repeated texts from this cache and store new vectors in it
+        max_batch_wait: Seconds a batch waits for more texts before it is sent
+        document_kwargs: Keyword arguments of the client's `embed_documents` for documents
+        query_kwargs: Keyword arguments of the client's `embed_documents` for queries, for
+            models that embed queries differently. Queries are then batched and cached
+            apart from documents.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        namespace: str,
+        limits: EmbeddingBatchLimits,
+        cache: EmbeddingCache | None = None,
+        max_batch_wait: float = DEFAULT_MAX_BATCH_WAIT,
+        document_kwargs: dict[str, Any] | None = None,
+        query_kwargs: dict[str, Any] | None = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.limits = limits
+        self.cache = cache
+        self.max_batch_wait = max_batch_wait
+        self._kwargs = {"document": document_kwargs or {}}
+        self._query_kind = "document"
+        if query_kwargs is not None:
+            self._kwargs["query"] = query_kwargs
+            self._query_kind = "query"
+        self._pending: dict[str, _PendingBatch] = {}
+        self._futures: dict[str, asyncio.Future[list[float]]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, vectors, missing = self._lookup(texts, "document")
+        for batch in self._batches(missing):
+            embedded = self.embeddings.embed_documents(list(batch.values()), **self._kwargs["document"])
+            self._store(vectors, batch, embedded)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        kind = self._query_kind
+        keys, vectors, missing = self._lookup([text], kind)
+        if missing:
+            self._store(vectors, missing, self.embeddings.embed_documents([text], **self._kwargs[kind]))
+        return vectors[keys[0]]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._aembed(texts, "document")
+
+    async def aembed_query(self, text: str) -> list[float]:
+        [vector] = await self._aembed([text], self._query_kind)
+        return vector
+
+    async def _aembed(self, texts: Sequence[str], kind: str) -> list[list[float]]:
+        # The disk tier does blocking SQLite I/O
+        if self._uses_disk:
+            keys, vectors, missing = await asyncio.to_thread(self._lookup, texts, kind)
+        else:
+            keys, vectors, missing = self._lookup(texts, kind)
+        if missing:
+            futures = {key: self._enqueue(key, text, kind) for key, text in missing.items()}
+            # Shielded, so a cancelled caller does not cancel the texts of other callers
+            results = await asyncio.gather(*(asyncio.shield(future) for future in futures.values()))
+            vectors.update(zip(futures, results))
+        return [vectors[key] for key in keys]
+
+    @property
+    def _uses_disk(self) -> bool:
+        return self.cache is not None and self.cache.path is not None
+
+    def _lookup(
+        self, texts: Sequence[str], kind: str
+    ) -> tuple[list[str], dict[str, list[float]], dict[str, str]]:
+        """Return the keys of `texts`, the cached vectors and the texts still to embed."""
+        namespace = f"{self.namespace}\0{kind}"
+        keys = [EmbeddingCache.key(namespace, text) for text in texts]
+        vectors = self.cache.get_many(list(dict.fromkeys(keys))) if self.cache is not None else {}
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        return keys, vectors, missing
+
+    def _batches(self, texts: dict[str, str]) -> Iterator[dict[str, str]]:
+        batch: dict[str, str] = {}
+        tokens = 0
+        for key, text in texts.items():
+            text_tokens = count_text_tokens(text)
+            if batch and not self._fits(len(batch), tokens + text_tokens):
+                yield batch
+                batch, tokens = {}, 0
+            batch[key] = text
+            tokens += text_tokens
+        if batch:
+            yield batch
+
+    def _fits(self, count: int, tokens: int) -> bool:
+        """Whether one more text, bringing the batch to `tokens` tokens, fits in a request."""
+        max_tokens = self.limits.max_tokens
+        return count < self.limits.max_inputs and (max_tokens is None or tokens <= max_tokens)
+
+    def _store(self, vectors: dict[str, list[float]], batch: dict[str, str], embedded: list[list[float]]) -> None:
+        if len(embedded) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings from {self.namespace}, got {len(embedded)}")
+        stored = dict(zip(batch, embedded))
+        if self.cache is not None:
+            self.cache.put_many(stored)
+        vectors.update(stored)
+
+    def _enqueue(self, key: str, text: str, kind: str) -> "asyncio.Future[list[float]]":
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        tokens = count_text_tokens(text)
+        batch = self._pending.get(kind)
+        if batch is not None and not self._fits(len(batch.texts), batch.tokens + tokens):
+            self._flush(kind)
+            batch = None
+        if batch is None:
+            batch = self._pending[kind] = _PendingBatch(loop.call_later(self.max_batch_wait, self._flush, kind))
+
+        future = loop.create_future()
+        batch.texts[key] = text
+        batch.futures[key] = future
+        batch.tokens += tokens
+        self._futures[key] = future
+        if len(batch.texts) >= self.limits.max_inputs:
+            self._flush(kind)
+        return future
+
+    def _flush(self, kind: str) -> None:
+        batch = self._pending.pop(kind, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.ensure_future(self._send(batch, kind))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: _PendingBatch, kind: str) -> None:
+        vectors: dict[str, list[float]] = {}
+        try:
+            embedded = await self.embeddings.aembed_documents(list(batch.texts.values()), **self._kwargs[kind])
+            # The futures stay in `_futures` meanwhile, so callers asking for these texts
+            # wait for them instead of missing the cache
+            if self._uses_disk:
+                await asyncio.to_thread(self._store, vectors, batch.texts, embedded)
+            else:
+                self._store(vectors, batch.texts, embedded)
+        except BaseException as e:
+            for key, future in batch.futures.items():
+                self._futures.pop(key, None)
+                if future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for key, future in batch.futures.items():
+            self._futures.pop(key, None)
+            if not future.done():
+                future.set_result(vectors[key])
+
+
+def get_embeddings(
+    model_env: str | None = None,
+    model_string: str | None = None,
+    http_clients: "HttpClients | bool" = False,
+    embedding_cache: EmbeddingCache | None = None,
+    max_batch_wait: float = DEFAULT_MAX_BATCH_WAIT,
+) -> tuple[BatchedEmbeddings, MODEL_PROVIDERS]:
+    """
+    Get a configured embeddings client based on model specification.
+
+    Only calls through the same client are merged into batches, so build one client and
+    share it between concurrent callers. Texts are sent as they are; split documents to
+    the model's input limit (8,192 tokens for OpenAI) before embedding them.
+
+    Args:
+        model_env: Environment variable name containing the model specification
+        model_string: Direct model specification string, e.g. 'openai:text-embedding-3-small'.
+            Defaults to `DEFAULT_EMBEDDING_MODEL_STRINGS['openai']`.
+        http_clients: Connection pools to send all requests of the client through. Pass
+            an `HttpClients` instance, or True to use the process-wide pools from
+            `get_shared_http_clients()`. By default the client opens its own pools.
+        embedding_cache: Answer texts embedded before by the same model from this cache
+        max_batch_wait: Seconds a batch waits for texts of other callers before it is sent
+
+    Returns:
+        Tuple of (embeddings_client, provider_name)
+
+    Raises:
+        ValueError: If the model specification is invalid
+        NotImplementedError: If the provider serves no embedding models (Groq)
+    """
+    if model_string is None:
+        default = DEFAULT_EMBEDDING_MODEL_STRINGS["openai"]
+        model_string = os.getenv(model_env, default) if model_env is not None else default
+    provider, model_name, reasoning_effort = parse_model_string(model_string=model_string)
+    if reasoning_effort is not None:
+        raise ValueError(f"Embedding model string {model_string} must be in the format 'provider:model_name'")
+
+    if http_clients is True:
+        from .http_clients import get_shared_http_clients
+
+        http_clients = get_shared_http_clients()
+
+    limits = EMBEDDING_BATCH_LIMITS.get(provider)
+    if limits is None:
+        raise NotImplementedError(f"Embeddings not supported for {provider} models.")
+    document_kwargs, query_kwargs = {}, None
+    if provider == "google":
+        # Gemini embeds retrieval queries and documents differently
+        document_kwargs = {"batch_size": limits.max_inputs}
+        query_kwargs = {"batch_size": limits.max_inputs, "task_type": "RETRIEVAL_QUERY"}
+
+    embeddings = _build_embeddings(provider, model_name, limits, http_clients or None)
+    return (
+        BatchedEmbeddings(
+            embeddings,
+            f"{provider}:{model_name}",
+            limits,
+            cache=embedding_cache,
+            max_batch_wait=max_batch_wait,
+            document_kwargs=document_kwargs,
+            query_kwargs=query_kwargs,
+        ),
+        provider,
+    )
+
+
+@functools.cache
+def _mistral_embeddings_class() -> type[Embeddings]:
+    from langchain_mistralai import MistralAIEmbeddings
+
+    limits = EMBEDDING_BATCH_LIMITS["mistralai"]
+
+    class _MistralAIEmbeddings(MistralAIEmbeddings):
+        """Sizes batches with the tiktoken counter of `tokens` instead of Mistral's tokenizer."""
+
+        def _get_batches(self, texts: list[str]) -> Iterator[list[str]]:
+            batch: list[str] = []
+            tokens = 0
+            for text in texts:
+                text_tokens = count_text_tokens(text)
+                if batch and (len(batch) >= limits.max_inputs or tokens + text_tokens > limits.max_tokens):
+                    yield batch
+                    batch, tokens = [], 0
+                batch.append(text)
+                tokens += text_tokens
+            if batch:
+                yield batch
+
+    return _MistralAIEmbeddings
+
+
+def _build_embeddings(
+    provider: MODEL_PROVIDERS,
+    model_name: str,
+    limits: EmbeddingBatchLimits,
+    http_clients: "HttpClients | None",
+) -> Embeddings:
+    http_params = {}
+    if http_clients is not None:
+        http_params = {
+            "http_client": http_clients.client,
+            "http_async_client": http_clients.async_client,
+        }
+
+    # Batches are sized here; tokenizing every text again in langchain_openai (and
+    # downloading its encoding on first use) only adds latency
+    openai_params = {"chunk_size": limits.max_inputs, "check_embedding_ctx_length": False}
+
+    match provider:
+        case "azure":
+            from langchain_openai import OpenAIEmbeddings
+            from pydantic import SecretStr
+
+            return OpenAIEmbeddings(
+                model=model_name,
+                base_url=os.environ["AZURE_BASE_URL"],
+                api_key=SecretStr(os.environ["AZURE_OPENAI_API_KEY"]),
+                **openai_params,
+                **http_params,
+            )
+
+        case "openai":
+            from langchain_openai import OpenAIEmbeddings
+
+            return OpenAIEmbeddings(model=model_name, **openai_params, **http_params)
+
+        case "mistralai":
+            from tokenizers import Tokenizer
+            from tokenizers.models import WordLevel
+
+            endpoint = {"endpoint": os.environ["MISTRAL_BASE_URL"]} if os.environ.get("MISTRAL_BASE_URL") else {}
+            # Passing an async client stops MistralAIEmbeddings from building one that would
+            # only be thrown away unclosed; the shared one is derived from the sync client.
+            async_client = {"async_client": http_clients.async_client} if http_clients is not None else {}
+            # Giving a tokenizer skips downloading Mistral's from Hugging Face. This empty
+            # one is never used: `_get_batches` counts tokens itself.
+            embeddings = _mistral_embeddings_class()(
+                model=model_name,
+                tokenizer=Tokenizer(WordLevel({}, unk_token="[UNK]")),
+                **endpoint,
+                **async_client,
+            )
+            if http_clients is not None:
+                client = embeddings.client
+                embeddings.client = http_clients.derive_client(client)
+                embeddings.async_client = http_clients.derive_async_client(client)
+                client.close()
+            return embeddings
+
+        case "google":
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+            from .get_llm import _use_google_http_clients
+
+            embeddings = GoogleGenerativeAIEmbeddings(model=model_name)
+            if http_clients is not None:
+                _use_google_http_clients(embeddings, http_clients)
+            return embeddings
+
+        case _:
+            raise NotImplementedError(f"Embeddings not supported for {provider} models.")
@@ -0,0 +1,114 @@
+"""Content-addressed cache for the base64 payloads and extracted texts produced by `file_to_message`."""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import NamedTuple
+from .cache import LRUCache
+
+
+DEFAULT_ENCODING_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class EncodingCacheInfo(NamedTuple):
+    """Statistics of an `EncodingCache`."""
+
+    hits: int
+    disk_hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class EncodingCache:
+    """
+    Base64 payloads keyed by the SHA-256 of the file bytes.
+
+    The payload does not depend on the provider, so a document sent to OpenAI and to
+    Google is encoded once. The in-memory tier is an LRU bounded by the total payload
+    size; an optional on-disk tier keeps payloads across restarts and worker processes.
+
+    Args:
+        max_bytes: Upper bound for the total size of the payloads kept in memory
+        directory: Directory for the on-disk tier. Disabled when None.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_ENCODING_CACHE_BYTES,
+        directory: str | os.PathLike | None = None,
+    ) -> None:
+        self._memory: LRUCache[str, str] = LRUCache(maxsize=max_bytes, weigher=len)
+        self.directory = Path(directory) if directory is not None else None
+        self._stats: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        """Return the cache key for `content`."""
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, digest: str) -> str | None:
+        """Return the payload for `digest` from memory or disk, or None."""
+        content_b64 = self._memory.get(digest)
+        if content_b64 is not None:
+            self._count("hits")
+            return content_b64
+
+        if self.directory is not None:
+            path = self._path(digest)
+            try:
+                content_b64 = path.read_text("utf-8")
+            except FileNotFoundError:
+                pass
+            else:
+                self._memory.put(digest, content_b64)
+                self._count("disk_hits")
+                return content_b64
+
+        self._count("misses")
+        return None
+
+    def put(self, digest: str, content_b64: str) -> None:
+        """Store the payload for `digest` in memory and, if enabled, on disk."""
+        self._memory.put(digest, content_b64)
+
+        if self.directory is not None:
+            path = self._path(digest)
+            if path.exists():
+                return
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so concurrent readers never see a partial payload
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content_b64)
+            os.replace(tmp_path, path)
+
+    def info(self) -> EncodingCacheInfo:
+        """Return hit/miss counters and the size of the in-memory tier."""
+        memory = self._memory.info()
+        with self._lock:
+            return EncodingCacheInfo(
+                self._stats["hits"],
+                self._stats["disk_hits"],
+                self._stats["misses"],
+                memory.maxsize,
+                memory.currsize,
+            )
+
+    def clear(self) -> None:
+        """Empty the in-memory tier and reset the statistics. The disk tier is kept."""
+        self._memory.clear()
+        with self._lock:
+            self._stats.clear()
+
+    def _path(self, digest: str) -> Path:
+        assert self.directory is not None
+        return self.directory / digest[:2] / f"{digest}.b64"
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
@@ -0,0 +1,142 @@
+"""Send the same messages to several models at once.
+
+`fan_out` builds one client per model specification with `get_llm`, streams all of them
+concurrently and merges their output into one feed of events tagged with the model
+specification. Comparing N models then takes as long as the slowest of them instead of
+the sum of their latencies, and with `quorum` the feed stops as soon as enough of them
+have answered.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Sequence
+from typing import TYPE_CHECKING, Any, Literal, NamedTuple
+
+from langchain_core.messages import AIMessage, message_chunk_to_message
+
+from .get_llm import get_llm
+from .sse import DEFAULT_MAX_QUEUED, chunk_events
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+
+class FanOutTiming(NamedTuple):
+    """
+    Timing of one model specification in a `fan_out`, in seconds since the fan-out started.
+
+    `time_to_first_token` is None if no text or reasoning arrived.
+    """
+
+    time_to_first_token: float | None
+    latency: float
+
+
+class FanOutEvent(NamedTuple):
+    """
+    An event of one model specification in a `fan_out` feed.
+
+    `text` and `reasoning` events carry a piece of streamed output in `text`. Every model
+    specification ends with exactly one `done` event (with the complete `message`), `error`
+    event (with the error in `text`) or `cancelled` event (when `quorum` was reached
+    first); these carry the specification's `timing`.
+    """
+
+    model_string: str
+    kind: Literal["text", "reasoning", "done", "error", "cancelled"]
+    text: str = ""
+    message: AIMessage | None = None
+    timing: FanOutTiming | None = None
+
+
+async def fan_out(
+    model_strings: Sequence[str],
+    messages: Sequence["BaseMessage"],
+    quorum: int | None = None,
+    max_queued: int = DEFAULT_MAX_QUEUED,
+    **llm_options: Any,
+) -> AsyncIterator[FanOutEvent]:
+    """
+    Stream `messages` to every model in `model_strings` concurrently.
+
+    Events of all models are yielded in the order they arrive. Closing the iterator
+    early cancels the requests still running.
+
+    Args:
+        model_strings: Model specifications, see `parse_model_string`
+        messages: The prompt sent to every model
+        quorum: Stop once this many models have answered successfully and cancel the
+            others; 1 takes the first successful answer. None waits for all of them.
+            Answers that arrived together with the last one needed are still yielded.
+        max_queued: Events read ahead of the consumer before the streams are paused
+        **llm_options: Options for `get_llm` (`http_clients`, `rate_limit`, ...)
+
+    Yields:
+        The merged events, see `FanOutEvent`
+
+    Raises:
+        ValueError: If a model specification is invalid or listed twice, or `quorum` is
+            not between 1 and the number of model specifications
+    """
+    if len(set(model_strings)) != len(model_strings):
+        raise ValueError("Every model specification can only be listed once")
+    if quorum is not None and not 1 <= quorum <= len(model_strings):
+        raise ValueError(f"quorum must be between 1 and {len(model_strings)}, got {quorum}")
+    llms = {
+        model_string: get_llm(model_string=model_string, streaming=True, **llm_options)[0]
+        for model_string in model_strings
+    }
+
+    queue: asyncio.Queue[FanOutEvent] = asyncio.Queue(maxsize=max_queued)
+    first_tokens: dict[str, float] = {}
+    start = time.perf_counter()
+
+    def timing(model_string: str) -> FanOutTiming:
+        first = first_tokens.get(model_string)
+        return FanOutTiming(None if first is None else first - start, time.perf_counter() - start)
+
+    async def stream(model_string: str) -> None:
+        merged = None
+        try:
+            async for chunk in llms[model_string].astream(messages):
+                merged = chunk if merged is None else merged + chunk
+                for event in chunk_events(chunk):
+                    first_tokens.setdefault(model_string, time.perf_counter())
+                    await queue.put(FanOutEvent(model_string, event.kind, event.text))
+        except Exception as e:
+            await queue.put(FanOutEvent(model_string, "error", f"{type(e).__name__}: {e}", timing=timing(model_string)))
+            return
+        message = AIMessage(content="") if merged is None else message_chunk_to_message(merged)
+        await queue.put(FanOutEvent(model_string, "done", message=message, timing=timing(model_string)))
+
+    tasks = {model_string: asyncio.create_task(stream(model_string)) for model_string in model_strings}
+    running = set(model_strings)
+    answered = 0
+    try:
+        while running and (quorum is None or answered < quorum):
+            event = await queue.get()
+            if event.kind in ("done", "error"):
+                running.discard(event.model_string)
+                answered += event.kind == "done"
+            yield event
+
+        # Models that finished in the same tick as the quorum already have their events
+        # queued; take those before cancelling the rest
+        queued = []
+        while not queue.empty():
+            event = queue.get_nowait()
+            if event.kind in ("done", "error"):
+                running.discard(event.model_string)
+            queued.append(event)
+        cancelled = [model_string for model_string in model_strings if model_string in running]
+        for model_string in cancelled:
+            tasks[model_string].cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        for event in queued:
+            yield event
+        for model_string in cancelled:
+            yield FanOutEvent(model_string, "cancelled", timing=timing(model_string))
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
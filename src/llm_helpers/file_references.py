@@ -0,0 +1,187 @@
+"""Upload files to provider file endpoints and reference them by ID in messages."""
+
+import asyncio
+import contextlib
+import io
+import os
+import time
+from collections.abc import AsyncIterator
+from typing import Any, NamedTuple
+from .cache import CacheInfo, LRUCache
+from .get_llm import credentials_fingerprint
+
+
+# Google deletes uploaded files after 48 hours; reuse references for a bit less than that.
+GOOGLE_FILE_TTL_SECONDS = 47 * 60 * 60
+
+FILE_REFERENCE_CACHE_MAXSIZE = 1024
+
+
+class FileReference(NamedTuple):
+    """An uploaded file: its provider ID (or URI for Google) and when it expires."""
+
+    file_id: str
+    expires_at: float | None = None
+
+
+class FileReferenceCache:
+    """
+    Maps the SHA-256 of a file's bytes to the ID it was uploaded under.
+
+    Keys also include the provider and a fingerprint of its credentials and endpoint,
+    since uploaded files are only visible to the account that uploaded them.
+    """
+
+    def __init__(self, maxsize: int = FILE_REFERENCE_CACHE_MAXSIZE) -> None:
+        self._cache: LRUCache[tuple[str, str, str], FileReference] = LRUCache(maxsize=maxsize)
+
+    def get(self, provider: str, digest: str) -> FileReference | None:
+        """Return the unexpired reference for `digest`, or None."""
+        key = (provider, credentials_fingerprint(provider), digest)
+        reference = self._cache.get(key)
+        if reference is not None and reference.expires_at is not None:
+            if reference.expires_at <= time.time():
+                self._cache.invalidate(key)
+                return None
+        return reference
+
+    def put(self, provider: str, digest: str, reference: FileReference) -> None:
+        """Remember that the file with `digest` was uploaded as `reference`."""
+        self._cache.put((provider, credentials_fingerprint(provider), digest), reference)
+
+    def info(self) -> CacheInfo:
+        """Return hit/miss counters."""
+        return self._cache.info()
+
+    def clear(self) -> None:
+        """Forget all references. The uploaded files are not deleted."""
+        self._cache.clear()
+
+
+_default_references = FileReferenceCache()
+
+
+def get_default_file_references() -> FileReferenceCache:
+    """Return the process-wide reference cache used when none is passed."""
+    return _default_references
+
+
+async def upload_file(
+    content: bytes,
+    filename: str | None,
+    content_type: str | None,
+    model_provider: str,
+    client: Any | None = None,
+) -> FileReference:
+    """
+    Upload `content` through the provider's files endpoint.
+
+    Args:
+        content: The file bytes
+        filename: Name of the file as shown by the provider
+        content_type: MIME type of the file
+        model_provider: The LLM provider ('openai', 'azure', 'google')
+        client: SDK client to upload with (`openai.AsyncOpenAI` for 'openai' and 'azure',
+            `google.genai.Client` for 'google'). Built from the environment when None,
+            and closed after the upload.
+
+    Returns:
+        The reference to the uploaded file
+
+    Raises:
+        NotImplementedError: If the provider has no supported files endpoint
+    """
+    match model_provider:
+        case "openai" | "azure":
+            async with provider_client(model_provider, client) as client:
+                uploaded = await client.files.create(
+                    file=(filename or "file", content, content_type or "application/octet-stream"),
+                    purpose="user_data",
+                )
+            return FileReference(uploaded.id)
+
+        case "google":
+            async with provider_client(model_provider, client) as client:
+                uploaded = await client.aio.files.upload(
+                    file=io.BytesIO(content),
+                    config={"mime_type": content_type, "display_name": filename},
+                )
+                # Large documents are processed asynchronously before they can be referenced
+                while uploaded.state is not None and uploaded.state.name == "PROCESSING":
+                    await asyncio.sleep(1)
+                    uploaded = await client.aio.files.get(name=uploaded.name)
+            if uploaded.state is not None and uploaded.state.name == "FAILED":
+                raise ValueError(f"Google failed to process uploaded file {filename}: {uploaded.error}")
+            return FileReference(uploaded.uri, time.time() + GOOGLE_FILE_TTL_SECONDS)
+
+        case "groq":
+            raise NotImplementedError("File upload not supported for Groq models yet.")
+        case "mistralai":
+            raise NotImplementedError("File upload not supported for MistralAI models yet.")
+        case _:
+            raise ValueError(f"Unsupported model provider: {model_provider}")
+
+
+def render_file_reference(
+    model_provider: str, reference: FileReference, content_type: str | None
+) -> dict:
+    """Build the message part that references an uploaded file."""
+    match model_provider:
+        case "openai":
+            return {
+                "type": "input_file",
+                "file_id": reference.file_id,
+            }
+        case "azure":
+            return {
+                "type": "file",
+                "file": {
+                    "type": "input_file",
+                    "file_id": reference.file_id,
+                },
+            }
+        case "google":
+            return {
+                "type": "media",
+                "file_uri": reference.file_id,
+                "mime_type": f"{content_type}",
+            }
+        case _:
+            raise ValueError(f"Unsupported model provider: {model_provider}")
+
+
+@contextlib.asynccontextmanager
+async def provider_client(model_provider: str, client: Any | None = None) -> AsyncIterator[Any]:
+    """
+    Yield `client`, or an SDK client built from the environment and closed afterwards.
+
+    The default client uses the same endpoint and credentials as `get_llm`: an
+    `openai.AsyncOpenAI` for 'openai' and 'azure', a `google.genai.Client` for 'google'.
+    A given `client` is left open.
+    """
+    if client is not None:
+        yield client
+        return
+
+    if model_provider == "google":
+        from google import genai
+
+        google_client = genai.Client()
+        try:
+            yield google_client
+        finally:
+            await google_client.aio.aclose()
+            google_client.close()
+        return
+
+    from openai import AsyncOpenAI
+
+    if model_provider == "azure":
+        openai_client = AsyncOpenAI(
+            base_url=os.environ["AZURE_BASE_URL"],
+            api_key=os.environ["AZURE_OPENAI_API_KEY"],
+        )
+    else:
+        openai_client = AsyncOpenAI()
+    async with openai_client:
+        yield openai_client
@@ -1,54 +1,519 @@
 """Utilities for handling file uploads for different LLM providers."""
 
+import asyncio
 import base64
-from fastapi import UploadFile
+import hashlib
+import html
+from collections.abc import Mapping, Sequence
+from typing import TYPE_CHECKING, Any, Literal
+from .encoding_cache import EncodingCache
+from .file_references import (
+    FileReferenceCache,
+    get_default_file_references,
+    render_file_reference,
+    upload_file,
+)
+from .lazy_parts import LazyFile, LazyFileData
+from .preprocess import (
+    DEFAULT_PREPROCESS_OPTIONS,
+    PreprocessOptions,
+    preprocess_content,
+    preprocessed_content_type,
+)
+from .text_extraction import TextExtractionError, can_extract_text, extract_text, text_content_type
 
+# FastAPI is only needed for the type annotation; importing it eagerly would make every
+# `import llm_helpers` pay for Starlette and Pydantic.
+if TYPE_CHECKING:
+    from fastapi import UploadFile
 
-async def file_to_message(file: UploadFile, model_provider: str) -> dict:
+
+# Files converted at the same time by `file_to_messages` unless configured otherwise
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Read size used in streaming mode. A multiple of 3, so every chunk encodes to base64
+# without padding and the encoded chunks can simply be concatenated.
+DEFAULT_CHUNK_SIZE = 3 * 256 * 1024
+
+# Extracted texts kept by the process-wide cache used in text mode
+DEFAULT_TEXT_CACHE_BYTES = 64 * 1024 * 1024
+
+_text_cache = EncodingCache(max_bytes=DEFAULT_TEXT_CACHE_BYTES)
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds the `max_size` passed to `file_to_message`."""
+
+
+async def file_to_message(
+    file: "UploadFile",
+    model_provider: str,
+    streaming: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_size: int | None = None,
+    cache: EncodingCache | None = None,
+    mode: Literal["inline", "reference", "lazy", "text"] = "inline",
+    references: FileReferenceCache | None = None,
+    upload_client: Any | None = None,
+    preprocess: bool | PreprocessOptions | Mapping[str, PreprocessOptions] = False,
+    llm: Any | None = None,
+) -> dict:
     """
     Converts an uploaded file to a message dictionary suitable as input for different model providers.
-    
+
     Args:
         file: The uploaded file from FastAPI
-        model_provider: The LLM provider ('openai', 'azure', 'groq')
-        
+        model_provider: The LLM provider ('openai', 'azure', 'google'; 'groq' and
+            'mistralai' in text mode)
+        streaming: Read the file in chunks of `chunk_size` bytes and base64-encode them
+            incrementally in a worker thread, instead of reading the whole file at once
+            and encoding it on the event loop. This keeps the event loop responsive; peak
+            memory is about the same as reading the whole file (roughly 2.7 times the
+            file size). Use mode 'lazy' to keep it below the file size.
+        chunk_size: Bytes read per chunk in streaming and lazy mode, rounded down to a
+            multiple of 3
+        max_size: Reject files larger than this many bytes. Checked against the upload's
+            reported size before reading and against the bytes actually read.
+        cache: Look up the base64 payload by the SHA-256 of the file bytes and store it
+            after encoding, so repeated uploads of the same document are not re-encoded.
+            In text mode it holds the extracted texts and defaults to a process-wide cache.
+        mode: 'inline' embeds the file as base64. 'reference' uploads it once through the
+            provider's files endpoint and returns a part that references the file ID
+            (OpenAI/Azure) or file URI (Google), so later turns do not resend the file.
+            'lazy' (OpenAI/Azure) keeps a reference to the uploaded file and encodes it
+            only while the request is sent, chunk by chunk, so no base64 copy of the
+            whole file is built. Needs the chat model as `llm`, built with
+            `get_llm(http_clients=...)`, and `file` must stay open until the request was
+            sent; `streaming` and `cache` do not apply. 'text' extracts the text of PDFs (text layer), DOCX, HTML and
+            plain text files locally and returns it as a text part, which every
+            provider accepts, including Groq and MistralAI; `streaming` and
+            `preprocess` do not apply.
+        references: Cache mapping content hashes to uploaded file IDs in 'reference'
+            mode. Defaults to a process-wide cache.
+        upload_client: SDK client used for uploads in 'reference' mode (see `upload_file`)
+        preprocess: Downscale and recompress images and cut PDFs to a page range before
+            encoding or uploading. True uses `DEFAULT_PREPROCESS_OPTIONS` for the provider;
+            a mapping selects options per provider. Needs the `images`/`pdf` extras.
+        llm: The chat model the part is sent with, required in 'lazy' mode to check that
+            it expands lazy parts
+
     Returns:
         A dictionary formatted for the specified model provider
-        
+
     Raises:
-        ValueError: If the model provider is not supported
+        ValueError: If the model provider is not supported, or `llm` does not send
+            through `HttpClients` in 'lazy' mode
         NotImplementedError: If the feature is not yet implemented for the provider
+        FileTooLargeError: If the file is larger than `max_size`
+        TextExtractionError: If no text can be extracted from the file in text mode
+    """
+    check_file_provider(model_provider, mode)
+    _check_size(file.size, max_size)
+    if mode == "text":
+        return await _text_part(file, max_size, cache)
+    options = _preprocess_options(preprocess, model_provider)
+
+    if mode == "reference":
+        return await _upload_reference(
+            file, model_provider, max_size, references, upload_client, options
+        )
+    if mode == "lazy":
+        return await _lazy_part(file, model_provider, chunk_size, max_size, options, llm)
+    if mode != "inline":
+        raise ValueError(f"Unsupported mode: {mode}, supported: 'inline', 'reference', 'lazy', 'text'")
+
+    if options is not None:
+        content_b64 = await _read_base64_preprocessed(file, options, cache, max_size)
+        content_type = preprocessed_content_type(file.content_type, options)
+        return render_file_part(model_provider, file.filename, content_type, content_b64)
+
+    if cache is not None:
+        content_b64 = await _read_base64_cached(file, cache, streaming, chunk_size, max_size)
+    elif streaming:
+        # Join the encoded chunks into the final payload at once, without another copy
+        prefix = _payload_prefix(model_provider, file.content_type)
+        payload = await _read_base64_chunked(file, chunk_size, max_size, prefix)
+        return render_file_part(model_provider, file.filename, file.content_type, payload, prefixed=True)
+    else:
+        content = await file.read()
+        _check_size(len(content), max_size)
+        content_b64 = base64.b64encode(content).decode("utf-8")
+
+    return render_file_part(model_provider, file.filename, file.content_type, content_b64)
+
+
+async def file_to_messages(
+    files: Sequence["UploadFile"],
+    model_provider: str,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    **kwargs: Any,
+) -> list[dict]:
     """
+    Converts many uploaded files concurrently, see `file_to_message`.
+
+    At most `max_concurrency` files are read and encoded at the same time, which also
+    bounds the memory in flight to `max_concurrency` conversions of the largest file (or
+    of `max_size`, if given).
+
+    Args:
+        files: The uploaded files from FastAPI
+        model_provider: The LLM provider ('openai', 'azure', 'google')
+        max_concurrency: Maximum number of files converted at the same time
+        **kwargs: Passed to `file_to_message` for every file
+
+    Returns:
+        The message dictionaries, in the order of `files`
+
+    Raises:
+        ValueError: If the model provider is not supported or `max_concurrency` < 1
+        NotImplementedError: If the feature is not yet implemented for the provider
+        FileTooLargeError: If a file is larger than `max_size`
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be >= 1, got {max_concurrency}")
+    check_file_provider(model_provider, kwargs.get("mode", "inline"))
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def convert(file: "UploadFile") -> dict:
+        async with semaphore:
+            return await file_to_message(file, model_provider, **kwargs)
+
+    # Cancel the remaining conversions as soon as one of them fails, and raise that first
+    # error as-is, so callers can handle it like one from `file_to_message`.
+    tasks = [asyncio.ensure_future(convert(file)) for file in files]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def check_file_provider(model_provider: str, mode: str = "inline") -> None:
+    """
+    Check that `model_provider` accepts file parts of `file_to_message` in `mode`.
+
+    Raises:
+        ValueError: If the model provider is not supported
+        NotImplementedError: If the provider does not accept files in `mode`
+    """
+    match model_provider:
+        case "openai" | "azure" | "google":
+            return
+        case "groq" | "mistralai" if mode == "text":
+            return
+        case "groq":
+            raise NotImplementedError(
+                "File upload not supported for Groq models yet. Use mode='text' for text-bearing files."
+            )
+        case "mistralai":
+            raise NotImplementedError(
+                "File upload not supported for MistralAI models yet. Use mode='text' for text-bearing files."
+            )
+        case _:
+            raise ValueError(f"Unsupported model provider: {model_provider}")
+
+
+def _preprocess_options(
+    preprocess: bool | PreprocessOptions | Mapping[str, PreprocessOptions], model_provider: str
+) -> PreprocessOptions | None:
+    if isinstance(preprocess, PreprocessOptions):
+        return preprocess
+    if isinstance(preprocess, Mapping):
+        return preprocess.get(model_provider)
+    if preprocess:
+        return DEFAULT_PREPROCESS_OPTIONS[model_provider]
+    return None
+
+
+def _check_size(size: int | None, max_size: int | None) -> None:
+    if size is not None and max_size is not None and size > max_size:
+        raise FileTooLargeError(f"File is larger than the maximum of {max_size} bytes.")
+
+
+async def _read_base64_chunked(
+    file: "UploadFile", chunk_size: int, max_size: int | None, prefix: str = ""
+) -> str:
+    """Read `file` in chunks and base64-encode them in a worker thread as they arrive."""
+    chunk_size = max(3, chunk_size - chunk_size % 3)
+    pieces: list[str] = [prefix]
+    remainder = b""
+    total = 0
+
+    while chunk := await file.read(chunk_size):
+        total += len(chunk)
+        _check_size(total, max_size)
+
+        data, remainder = _split_encodable(remainder, chunk)
+        if data:
+            pieces.append(await asyncio.to_thread(_encode, data))
+
+    if remainder:
+        pieces.append(_encode(remainder))
+    return "".join(pieces)
+
+
+async def _read_base64_cached(
+    file: "UploadFile",
+    cache: EncodingCache,
+    streaming: bool,
+    chunk_size: int,
+    max_size: int | None,
+) -> str:
+    """Read and hash `file`, and only encode it if its payload is not cached yet."""
+    if streaming:
+        chunk_size = max(3, chunk_size - chunk_size % 3)
+        chunks: list[bytes] = []
+        digest = hashlib.sha256()
+        total = 0
+        while chunk := await file.read(chunk_size):
+            total += len(chunk)
+            _check_size(total, max_size)
+            digest.update(chunk)
+            chunks.append(chunk)
+        key = digest.hexdigest()
+    else:
+        content = await file.read()
+        _check_size(len(content), max_size)
+        chunks = [content]
+        key = EncodingCache.digest(content)
+
+    # The disk tier does blocking file I/O
+    if cache.directory is not None:
+        content_b64 = await asyncio.to_thread(cache.get, key)
+    else:
+        content_b64 = cache.get(key)
+    if content_b64 is not None:
+        return content_b64
+
+    if streaming:
+        content_b64 = await asyncio.to_thread(_encode_chunks, chunks)
+    else:
+        content_b64 = _encode(chunks[0])
+
+    if cache.directory is not None:
+        await asyncio.to_thread(cache.put, key, content_b64)
+    else:
+        cache.put(key, content_b64)
+    return content_b64
+
+
+async def _upload_reference(
+    file: "UploadFile",
+    model_provider: str,
+    max_size: int | None,
+    references: FileReferenceCache | None,
+    upload_client: Any | None,
+    options: PreprocessOptions | None,
+) -> dict:
+    """Upload `file` unless the same content was uploaded before, and reference it."""
+    references = references or get_default_file_references()
+    content = await file.read()
+    _check_size(len(content), max_size)
+
+    content_type = file.content_type
+    if options is None:
+        digest = EncodingCache.digest(content)
+    else:
+        digest = _preprocessed_digest(content, options)
+        content_type = preprocessed_content_type(file.content_type, options)
+
+    reference = references.get(model_provider, digest)
+    if reference is None:
+        if options is not None:
+            content = await asyncio.to_thread(
+                preprocess_content, content, file.content_type, options
+            )
+        reference = await upload_file(
+            content, file.filename, content_type, model_provider, client=upload_client
+        )
+        references.put(model_provider, digest, reference)
+
+    return render_file_reference(model_provider, reference, content_type)
+
+
+async def _lazy_part(
+    file: "UploadFile",
+    model_provider: str,
+    chunk_size: int,
+    max_size: int | None,
+    options: PreprocessOptions | None,
+    llm: Any | None,
+) -> dict:
+    """Render a part that references the content of `file` instead of embedding it."""
+    if model_provider not in ("openai", "azure"):
+        raise NotImplementedError(f"Lazy file parts are not supported for {model_provider} yet.")
+    from .http_clients import expands_lazy_parts
+
+    # Any other client would send the placeholder instead of the file
+    if llm is None or not expands_lazy_parts(llm):
+        raise ValueError(
+            "Lazy file parts need the chat model as `llm`, built with get_llm(http_clients=...)"
+        )
+
+    content_type = file.content_type
+    if options is not None:
+        content = await file.read()
+        _check_size(len(content), max_size)
+        content = await asyncio.to_thread(preprocess_content, content, file.content_type, options)
+        lazy_file = LazyFile(content, chunk_size=chunk_size)
+        content_type = preprocessed_content_type(file.content_type, options)
+    else:
+        lazy_file = LazyFile(file.file, file.size, chunk_size)
+        _check_size(lazy_file.size, max_size)
+    return render_file_part(model_provider, file.filename, content_type, lazy_file)
+
+
+async def _text_part(file: "UploadFile", max_size: int | None, cache: EncodingCache | None) -> dict:
+    """Extract the text of `file` in a worker thread, unless it is cached."""
+    content_type = text_content_type(file.content_type, file.filename)
+    if not can_extract_text(content_type):
+        raise TextExtractionError(f"Cannot extract text from {content_type} files")
     content = await file.read()
-    content_b64 = base64.b64encode(content).decode("utf-8")
+    _check_size(len(content), max_size)
+
+    cache = cache or _text_cache
+    key = _text_digest(content)
+    # The disk tier does blocking file I/O
+    if cache.directory is not None:
+        text = await asyncio.to_thread(cache.get, key)
+    else:
+        text = cache.get(key)
+    if text is None:
+        text = await asyncio.to_thread(extract_text, content, content_type)
+        if cache.directory is not None:
+            await asyncio.to_thread(cache.put, key, text)
+        else:
+            cache.put(key, text)
+
+    name = f' name="{html.escape(file.filename)}"' if file.filename else ""
+    return {"type": "text", "text": f"<document{name}>\n{text}\n</document>"}
+
+
+async def _read_base64_preprocessed(
+    file: "UploadFile",
+    options: PreprocessOptions,
+    cache: EncodingCache | None,
+    max_size: int | None,
+) -> str:
+    """Reduce `file` in a worker thread and encode it, unless the result is cached."""
+    content = await file.read()
+    _check_size(len(content), max_size)
+
+    # The payload depends on the options too, not only on the uploaded bytes
+    key = _preprocessed_digest(content, options)
+    if cache is not None:
+        content_b64 = await asyncio.to_thread(cache.get, key)
+        if content_b64 is not None:
+            return content_b64
+
+    content_b64 = await asyncio.to_thread(
+        _preprocess_and_encode, content, file.content_type, options
+    )
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, content_b64)
+    return content_b64
+
+
+def _preprocess_and_encode(
+    content: bytes, content_type: str | None, options: PreprocessOptions
+) -> str:
+    return _encode(preprocess_content(content, content_type, options))
+
+
+def _preprocessed_digest(content: bytes, options: PreprocessOptions) -> str:
+    return EncodingCache.digest(EncodingCache.digest(content).encode() + options.fingerprint().encode())
+
+
+def _text_digest(content: bytes) -> str:
+    # Texts and base64 payloads of the same file may share a cache
+    return EncodingCache.digest(EncodingCache.digest(content).encode() + b"text")
+
+
+def _split_encodable(remainder: bytes, chunk: bytes) -> tuple[bytes, bytes]:
+    """Split off the whole 3-byte groups, so no padding ends up mid-stream."""
+    data = remainder + chunk if remainder else chunk
+    cut = len(data) - len(data) % 3
+    return data[:cut], data[cut:]
+
+
+def _encode_chunks(chunks: list[bytes]) -> str:
+    pieces: list[str] = []
+    remainder = b""
+    for chunk in chunks:
+        data, remainder = _split_encodable(remainder, chunk)
+        if data:
+            pieces.append(_encode(data))
+    if remainder:
+        pieces.append(_encode(remainder))
+    return "".join(pieces)
+
+
+def _encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _payload_prefix(model_provider: str, content_type: str | None) -> str:
+    """What `render_file_part` puts in front of the base64 payload for `model_provider`."""
+    if model_provider in ("openai", "azure"):
+        return f"data:{content_type};base64,"
+    return ""
+
+
+def render_file_part(
+    model_provider: str,
+    filename: str | None,
+    content_type: str | None,
+    content_b64: str | LazyFile,
+    prefixed: bool = False,
+) -> dict:
+    """
+    Build the message part that embeds a file, as `file_to_message` returns it.
+
+    Args:
+        model_provider: The LLM provider ('openai', 'azure', 'google')
+        filename: The file name shown to the model
+        content_type: The file's content type
+        content_b64: The base64-encoded content, or a `LazyFile` encoded while the
+            request is sent (OpenAI/Azure)
+        prefixed: `content_b64` already starts with the data URI prefix of OpenAI and
+            Azure parts, so a large payload is not copied once more to add it
+
+    Raises:
+        ValueError: If the model provider is not supported
+    """
+    prefix = _payload_prefix(model_provider, content_type)
+    if isinstance(content_b64, LazyFile):
+        file_data = LazyFileData(prefix, content_b64)
+    elif prefixed or not prefix:
+        file_data = content_b64
+    else:
+        file_data = f"{prefix}{content_b64}"
 
     match model_provider:
         case "openai":
             return {
                 "type": "input_file",
-                "filename": file.filename,
-                "file_data": f"data:{file.content_type};base64,{content_b64}",
+                "filename": filename,
+                "file_data": file_data,
             }
         case "azure":
             return {
                 "type": "file",
                 "file": {
                     "type": "input_file",
-                    "filename": file.filename,
-                    "file_data": f"data:{file.content_type};base64,{content_b64}",
+                    "filename": filename,
+                    "file_data": file_data,
                 },
             }
-        case "groq":
-            raise NotImplementedError("File upload not supported for Groq models yet.")
-        case "mistralai":
-            raise NotImplementedError("File upload not supported for MistralAI models yet.")
-        
+
         # https://docs.langchain.com/oss/python/integrations/chat/google_generative_ai#multimodal-usage
         case "google":
             return {
                     "type": "file",
                     "source_type": "base64",
-                    "mime_type": f"{file.content_type}",
+                    "mime_type": f"{content_type}",
                     "data": content_b64,
                 }
         case _:
@@ -1,33 +1,96 @@
 """Factory functions for creating LLM client instances."""
 
+import hashlib
 import os
-from langchain_mistralai import ChatMistralAI
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import TYPE_CHECKING, Any
+from .cache import CacheInfo, LRUCache
 from .const import MODEL_PROVIDERS
-from langchain_core.language_models import BaseChatModel
-from pydantic import SecretStr
 from .parse_model_string import parse_model_string
 
+# Provider integrations are imported inside the branch that needs them, so importing
+# this module (or the package root) does not pay for SDKs that are never used.
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from .http_clients import HttpClients
+    from .metrics import LLMMetrics
+    from .prompt_cache import PromptCache
+    from .rate_limit import AdaptiveRateLimiter, RateLimit
+    from .response_cache import ResponseCache
+
+
+# Environment variables each provider reads its credentials and endpoint from. They are
+# part of the client cache key, so rotating a key never hands out a stale client.
+CREDENTIAL_ENV_VARS: dict[str, tuple[str, ...]] = {
+    "openai": ("OPENAI_API_KEY", "OPENAI_BASE_URL", "OPENAI_ORG_ID"),
+    "azure": ("AZURE_BASE_URL", "AZURE_OPENAI_API_KEY"),
+    "groq": ("GROQ_API_KEY", "GROQ_API_BASE"),
+    "mistralai": ("MISTRAL_API_KEY", "MISTRAL_BASE_URL"),
+    "google": ("GOOGLE_API_KEY", "GEMINI_API_KEY"),
+}
+
+LLM_CACHE_MAXSIZE = 32
+
+_llm_cache: LRUCache[tuple, "BaseChatModel"] = LRUCache(maxsize=LLM_CACHE_MAXSIZE)
+
+
+def credentials_fingerprint(provider: MODEL_PROVIDERS) -> str:
+    """Hash the provider's credential env vars so the cache key never holds secrets."""
+    digest = hashlib.sha256()
+    for name in CREDENTIAL_ENV_VARS[provider]:
+        digest.update(f"{name}={os.environ.get(name, '')}\0".encode())
+    return digest.hexdigest()
+
+
 def get_llm(
     model_env: str | None = None,
     model_string: str | None = None,
     streaming: bool = True,
-) -> tuple[BaseChatModel, MODEL_PROVIDERS]:
+    cache: bool = False,
+    http_clients: "HttpClients | bool" = False,
+    rate_limit: "RateLimit | AdaptiveRateLimiter | None" = None,
+    response_cache: "ResponseCache | None" = None,
+    metrics: "LLMMetrics | bool" = False,
+    prompt_cache: "PromptCache | None" = None,
+) -> tuple["BaseChatModel", MODEL_PROVIDERS]:
     """
     Get a configured LLM client based on model specification.
 
+    The provider integration (``langchain_openai``, ``langchain_groq``, ...) is imported
+    on the first call for that provider.
+
     Args:
         model_env: Environment variable name containing the model specification
         model_string: Direct model specification string
         streaming: Whether to enable streaming responses
+        cache: Reuse a previously built client for the same specification and
+            credentials instead of building a new one. Cached clients keep their HTTP
+            connection pool open between calls.
+        http_clients: Connection pools to send all requests of the client through.
+            Pass an `HttpClients` instance, or True to use the process-wide pools from
+            `get_shared_http_clients()`. By default every client opens its own pools.
+        rate_limit: Client-side requests/tokens per minute budget. A `RateLimit` uses the
+            limiter shared by all clients in the process for this provider and model,
+            which must always be given the same limit; an `AdaptiveRateLimiter` is used
+            as-is. The limiter adapts to `Retry-After` and
+            rate limit response headers.
+        response_cache: Answer repeated calls with the same messages and model parameters
+            from this cache (`MemoryResponseCache`, `SQLiteResponseCache` or
+            `RedisResponseCache`). Cached streams are replayed as streams. Use
+            `no_response_cache()` to bypass it for single calls.
+        metrics: Record latency, time to first token, throughput, token usage, retries
+            and errors, labeled by provider, model and reasoning effort. Pass an
+            `LLMMetrics` instance, or True to use the process-wide `get_llm_metrics()`.
+            Nothing is attached by default.
+        prompt_cache: Provider-side prompt caching: an OpenAI/Azure `prompt_cache_key`
+            and retention, or a Google context cache from `GoogleContextCache`. The
+            share of input tokens read from the cache is reported by `metrics`.
 
     Returns:
         Tuple of (llm_client, provider_name)
 
     Raises:
-        ValueError: If model specification is invalid or provider is unsupported
+        ValueError: If model specification is invalid or provider is unsupported, or
+            `rate_limit` differs from the limit of the model's shared limiter
 
     Model specification format:
         - "provider:model_name" or "provider:model_name:reasoning"
@@ -36,6 +99,117 @@ def get_llm(
 
     provider, model_name, reasoning_effort = parse_model_string(model_env, model_string)
 
+    if http_clients is True:
+        from .http_clients import get_shared_http_clients
+
+        http_clients = get_shared_http_clients()
+
+    rate_limiter = None
+    if rate_limit is not None:
+        from .rate_limit import RateLimit, get_rate_limiter
+
+        if isinstance(rate_limit, RateLimit):
+            rate_limiter = get_rate_limiter(provider, model_name, rate_limit)
+        else:
+            rate_limiter = rate_limit
+
+    if metrics is True:
+        from .metrics import get_llm_metrics
+
+        metrics = get_llm_metrics()
+
+    options = {
+        "http_clients": http_clients or None,
+        "rate_limiter": rate_limiter,
+        "response_cache": response_cache,
+        "metrics": metrics or None,
+        "prompt_cache": prompt_cache,
+    }
+
+    if not cache:
+        return _build_llm(provider, model_name, reasoning_effort, streaming, **options), provider
+
+    key = (
+        provider,
+        model_name,
+        reasoning_effort,
+        streaming,
+        credentials_fingerprint(provider),
+        tuple((name, _cache_token(value)) for name, value in options.items()),
+    )
+    llm = _llm_cache.get(key)
+    if llm is None:
+        llm = _build_llm(provider, model_name, reasoning_effort, streaming, **options)
+        _llm_cache.put(key, llm)
+    return llm, provider
+
+
+def _cache_token(value: object) -> object:
+    """Cache key part for an option: the value itself if hashable, else its identity."""
+    try:
+        hash(value)
+    except TypeError:
+        return ("id", id(value))
+    return value
+
+
+def get_llm_cache_info() -> CacheInfo:
+    """Return hit/miss/eviction counters of the client cache used by `get_llm(cache=True)`."""
+    return _llm_cache.info()
+
+
+def clear_llm_cache(model_env: str | None = None, model_string: str | None = None) -> int:
+    """
+    Drop cached clients.
+
+    Args:
+        model_env: Environment variable name containing the model specification to drop
+        model_string: Model specification to drop
+
+    Returns:
+        The number of clients removed. Without a specification the whole cache is
+        cleared, including its statistics.
+    """
+    if model_env is None and model_string is None:
+        removed = len(_llm_cache)
+        _llm_cache.clear()
+        return removed
+
+    spec = parse_model_string(model_env, model_string)
+    return _llm_cache.invalidate_where(lambda key: key[:3] == spec)
+
+
+def set_llm_cache_maxsize(maxsize: int) -> None:
+    """Change the number of clients kept by the client cache, evicting if it shrinks."""
+    _llm_cache.resize(maxsize)
+
+
+def _build_llm(
+    provider: MODEL_PROVIDERS,
+    model_name: str,
+    reasoning_effort: str | None,
+    streaming: bool,
+    response_cache: "ResponseCache | None" = None,
+    **options: Any,
+) -> "BaseChatModel":
+    llm = _build_provider_llm(provider, model_name, reasoning_effort, streaming, **options)
+    if response_cache is not None:
+        from .response_cache import CachedChatModel
+
+        llm = CachedChatModel(llm=llm, cache=response_cache)
+    return llm
+
+
+def _build_provider_llm(
+    provider: MODEL_PROVIDERS,
+    model_name: str,
+    reasoning_effort: str | None,
+    streaming: bool,
+    http_clients: "HttpClients | None" = None,
+    rate_limiter: "AdaptiveRateLimiter | None" = None,
+    metrics: "LLMMetrics | None" = None,
+    prompt_cache: "PromptCache | None" = None,
+) -> "BaseChatModel":
     params = {
         "output_version": "responses/v1",
         "streaming": streaming,
@@ -44,36 +218,109 @@ def get_llm(
     if reasoning_effort is not None:
         params["reasoning"] = {"effort": reasoning_effort}
 
+    callbacks = []
+    if rate_limiter is not None:
+        from .rate_limit import RateLimitCallbackHandler
+
+        params["rate_limiter"] = rate_limiter
+        callbacks.append(RateLimitCallbackHandler(rate_limiter))
+    if metrics is not None:
+        from .metrics import MetricsCallbackHandler
+
+        callbacks.append(MetricsCallbackHandler(metrics, provider, model_name, reasoning_effort))
+    if callbacks:
+        params["callbacks"] = callbacks
+    if prompt_cache is not None:
+        params.update(prompt_cache.model_params(provider))
+
+    # OpenAI-compatible SDKs send absolute URLs through the client they are given
+    http_params = {}
+    if http_clients is not None:
+        http_params = {
+            "http_client": http_clients.client,
+            "http_async_client": http_clients.async_client,
+        }
+
+    # Only ChatOpenAI can pass response headers on; the limiter adapts to them
+    openai_params = {"include_response_headers": True} if rate_limiter is not None else {}
+
     match provider:
         case "azure":
+            from langchain_openai import ChatOpenAI
+            from pydantic import SecretStr
+
             base_url = os.environ["AZURE_BASE_URL"]
             api_key = os.environ["AZURE_OPENAI_API_KEY"]
             
-            llm = ChatOpenAI(
+            return ChatOpenAI(
                 base_url=base_url,
                 api_key=SecretStr(api_key),
                 **params,
+                **http_params,
+                **openai_params,
             )
-            return llm, provider   
 
         case "openai":
-            llm = ChatOpenAI(**params)
+            from langchain_openai import ChatOpenAI
 
-            return llm, provider
+            return ChatOpenAI(**params, **http_params, **openai_params)
 
         case "groq":
-            llm = ChatGroq(**params)
+            from langchain_groq import ChatGroq
+
+            return ChatGroq(**params, **http_params)
 
-            return llm, provider
         case "mistralai":
-            llm = ChatMistralAI(**params)
+            from langchain_mistralai import ChatMistralAI
+
+            if http_clients is None:
+                return ChatMistralAI(**params)
+            # ChatMistralAI relies on clients pre-configured with its base URL and auth
+            # headers, so keep those and swap in the shared pools. Passing an async client
+            # stops it from building one that would only be thrown away unclosed.
+            llm = ChatMistralAI(**params, async_client=http_clients.async_client)
+            client = llm.client
+            llm.client = http_clients.derive_client(client)
+            llm.async_client = http_clients.derive_async_client(client)
+            client.close()
+            return llm
 
-            return llm, provider
         case "google":
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
             llm = ChatGoogleGenerativeAI(
                 **params,
             )
-            return llm, provider
+            if http_clients is not None:
+                _use_google_http_clients(llm, http_clients)
+            return llm
 
         case _:
             raise ValueError(f"Unsupported provider: {provider}, supported: 'openai', 'azure'")
+
+
+def _use_google_http_clients(llm: "BaseChatModel", http_clients: "HttpClients") -> None:
+    """Rebuild the google-genai client of `llm` on top of the shared httpx clients."""
+    from google.genai import Client
+    from google.genai.types import HttpOptions
+
+    http_options = HttpOptions(
+        base_url=llm.base_url if isinstance(llm.base_url, str) else None,
+        api_version=llm.api_version,
+        headers=llm.additional_headers,
+        httpx_client=http_clients.client,
+        httpx_async_client=http_clients.async_client,
+    )
+    if llm._use_vertexai:
+        llm.client = Client(
+            vertexai=True,
+            project=llm.project,
+            location=llm.location,
+            credentials=llm.credentials,
+            http_options=http_options,
+        )
+    else:
+        llm.client = Client(
+            api_key=llm.google_api_key.get_secret_value(),
+            http_options=http_options,
+        )
@@ -0,0 +1,246 @@
+"""Shared, tunable HTTP connection pools for the clients built by `get_llm`."""
+
+import asyncio
+import threading
+import warnings
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from .lazy_parts import LazyFile, find_lazy_files
+
+
+@dataclass(frozen=True)
+class HttpPoolConfig:
+    """
+    Connection pool and timeout settings for `HttpClients`.
+
+    Attributes:
+        max_connections: Upper bound on open connections per pool (sync and async each)
+        max_keepalive_connections: Idle connections kept open for reuse
+        keepalive_expiry: Seconds an idle connection is kept before it is closed
+        http2: Negotiate HTTP/2 where the server supports it. Requires the `h2` package:
+            pip install "llm-helpers[http2]"
+        timeout: Default read/write/pool timeout in seconds
+        connect_timeout: Timeout for establishing a connection in seconds
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    timeout: float = 600.0
+    connect_timeout: float = 10.0
+
+
+class _LazyBodyStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """A request body made of raw byte segments and lazily encoded files."""
+
+    def __init__(self, pieces: list[bytes | LazyFile]) -> None:
+        self._pieces = pieces
+
+    def __iter__(self) -> Iterator[bytes]:
+        for piece in self._pieces:
+            if isinstance(piece, bytes):
+                yield piece
+            else:
+                yield from piece.iter_base64()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for piece in self._pieces:
+            if isinstance(piece, bytes):
+                yield piece
+            else:
+                # Reading and encoding are blocking, keep them off the event loop
+                for offset in piece.chunk_offsets():
+                    yield await asyncio.to_thread(piece.encode_chunk, offset)
+
+
+def expand_lazy_parts(request: httpx.Request) -> httpx.Request:
+    """
+    Return `request` with the placeholders of lazy parts replaced by their encoded content.
+
+    The content is encoded while the returned request's body is sent. Requests without
+    placeholders, and streamed request bodies (e.g. file uploads), are returned as-is.
+    """
+    try:
+        body = request.content
+    except httpx.RequestNotRead:
+        return request
+    found = find_lazy_files(body)
+    if not found:
+        return request
+
+    pieces: list[bytes | LazyFile] = []
+    size = position = 0
+    for start, end, file in found:
+        pieces += [body[position:start], file]
+        size += start - position + file.encoded_size
+        position = end
+    pieces.append(body[position:])
+    size += len(body) - position
+
+    headers = request.headers.copy()
+    headers["Content-Length"] = str(size)
+    return httpx.Request(
+        request.method,
+        request.url,
+        headers=headers,
+        stream=_LazyBodyStream(pieces),
+        extensions=request.extensions,
+    )
+
+
+class _SharedTransport(httpx.BaseTransport):
+    """
+    Delegates to a shared transport without closing it together with the client.
+
+    Also fills in the content of lazy message parts (see `expand_lazy_parts`) while requests
+    are sent.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self._transport.handle_request(expand_lazy_parts(request))
+
+
+class _SharedAsyncTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of `_SharedTransport`."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(expand_lazy_parts(request))
+
+
+def expands_lazy_parts(llm: Any) -> bool:
+    """
+    Whether every HTTP client of the OpenAI/Azure chat model `llm` expands lazy parts.
+
+    True only for clients built with `get_llm(http_clients=...)`; any other client would
+    send the placeholders of lazy parts to the provider instead of the file content.
+    """
+    # Unwrap a `CachedChatModel`
+    llm = getattr(llm, "llm", llm)
+    clients = [getattr(llm, "root_client", None), getattr(llm, "root_async_client", None)]
+    transports = [getattr(getattr(client, "_client", None), "_transport", None) for client in clients]
+    return all(isinstance(t, (_SharedTransport, _SharedAsyncTransport)) for t in transports)
+
+
+class HttpClients:
+    """
+    A sync and an async httpx client, each backed by one connection pool.
+
+    Pass an instance to `get_llm(http_clients=...)` to make every provider client share
+    the same pools, which caps the number of open sockets in the process and lets
+    connections be reused across providers and models.
+    """
+
+    def __init__(self, config: HttpPoolConfig | None = None) -> None:
+        self.config = config or HttpPoolConfig()
+        limits = httpx.Limits(
+            max_connections=self.config.max_connections,
+            max_keepalive_connections=self.config.max_keepalive_connections,
+            keepalive_expiry=self.config.keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(self.config.timeout, connect=self.config.connect_timeout)
+        self.transport: httpx.BaseTransport = httpx.HTTPTransport(
+            limits=limits, http2=self.config.http2
+        )
+        self.async_transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(
+            limits=limits, http2=self.config.http2
+        )
+        self.client = httpx.Client(
+            transport=_SharedTransport(self.transport), timeout=self.timeout
+        )
+        self.async_client = httpx.AsyncClient(
+            transport=_SharedAsyncTransport(self.async_transport), timeout=self.timeout
+        )
+
+    def derive_client(self, template: httpx.Client) -> httpx.Client:
+        """
+        Return a client with the base URL and headers of `template` on the shared pool.
+
+        Needed for SDKs that rely on a pre-configured client (e.g. MistralAI) instead of
+        sending absolute URLs through a client they are given.
+        """
+        return httpx.Client(
+            base_url=template.base_url,
+            headers=template.headers,
+            timeout=template.timeout,
+            transport=_SharedTransport(self.transport),
+        )
+
+    def derive_async_client(self, template: httpx.Client | httpx.AsyncClient) -> httpx.AsyncClient:
+        """Async counterpart of `derive_client`; `template` may also be a sync client."""
+        return httpx.AsyncClient(
+            base_url=template.base_url,
+            headers=template.headers,
+            timeout=template.timeout,
+            transport=_SharedAsyncTransport(self.async_transport),
+        )
+
+    def close(self) -> None:
+        """
+        Close the sync client and pool.
+
+        The async pool can only be closed from async code: once the async client was used,
+        call `aclose` instead, which closes both. Open async connections left behind are
+        reported with a `ResourceWarning`.
+        """
+        self.client.close()
+        self.transport.close()
+        pool = getattr(self.async_transport, "_pool", None)
+        if pool is not None and pool.connections:
+            warnings.warn(
+                "HttpClients.close() cannot close the async pool; use `await aclose()`",
+                ResourceWarning,
+                stacklevel=2,
+            )
+
+    async def aclose(self) -> None:
+        """Close both clients and pools."""
+        self.client.close()
+        self.transport.close()
+        await self.async_client.aclose()
+        await self.async_transport.aclose()
+
+
+_shared_clients: HttpClients | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_http_clients(config: HttpPoolConfig | None = None) -> HttpClients:
+    """
+    Return the process-wide `HttpClients`, creating it on first use.
+
+    Args:
+        config: Pool settings. Only used when the shared clients are created
+
+    Raises:
+        ValueError: If the shared clients already exist with a different config
+    """
+    global _shared_clients
+    with _shared_lock:
+        if _shared_clients is None:
+            _shared_clients = HttpClients(config)
+        elif config is not None and config != _shared_clients.config:
+            raise ValueError(
+                "Shared HTTP clients already exist with a different config. "
+                "Call close_shared_http_clients() first to reconfigure them."
+            )
+        return _shared_clients
+
+
+async def close_shared_http_clients() -> None:
+    """Close the process-wide `HttpClients`, e.g. in a FastAPI lifespan shutdown."""
+    global _shared_clients
+    with _shared_lock:
+        clients, _shared_clients = _shared_clients, None
+    if clients is not None:
+        await clients.aclose()
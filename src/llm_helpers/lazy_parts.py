@@ -0,0 +1,128 @@
+"""Message parts whose file content is base64-encoded while the request body is sent.
+
+An inline part holds the whole file as a base64 string, and the SDK copies it once more
+into the JSON request body, so a request costs several times the file size in memory.
+A lazy part only holds a short placeholder in `file_data`. The `HttpClients` transports
+replace the placeholder with the encoded content chunk by chunk while the request body
+is written, so no full base64 copy of the file is ever built.
+"""
+
+import base64
+import threading
+import uuid
+import weakref
+from collections.abc import Iterator
+from typing import BinaryIO
+
+# Read size per encoded chunk. A multiple of 3, so the encoded chunks concatenate
+# without padding in between.
+DEFAULT_CHUNK_SIZE = 3 * 256 * 1024
+
+LAZY_MARKER = b"llm-helpers-lazy:"
+_TOKEN_LENGTH = 32
+
+_lazy_files: "weakref.WeakValueDictionary[str, LazyFile]" = weakref.WeakValueDictionary()
+
+
+class LazyFile:
+    """
+    File content that is base64-encoded only when a request carrying it is sent.
+
+    Args:
+        source: The raw bytes, or a seekable binary file such as the spooled temporary
+            file behind a FastAPI `UploadFile`. A file must stay open and unchanged until
+            every request using it has been sent.
+        size: Size of `source` in bytes; determined by seeking if not given
+        chunk_size: Bytes read and encoded at a time, rounded down to a multiple of 3
+    """
+
+    def __init__(self, source: bytes | BinaryIO, size: int | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.source = source
+        self.chunk_size = max(3, chunk_size - chunk_size % 3)
+        self._lock = threading.Lock()
+        if size is None:
+            size = len(source) if isinstance(source, bytes) else source.seek(0, 2)
+        self.size = size
+        self.token = uuid.uuid4().hex
+        _lazy_files[self.token] = self
+
+    @property
+    def encoded_size(self) -> int:
+        return 4 * -(-self.size // 3)
+
+    @property
+    def placeholder(self) -> str:
+        return f"{LAZY_MARKER.decode()}{self.token}"
+
+    def read(self) -> bytes:
+        """Return the whole raw content."""
+        if isinstance(self.source, bytes):
+            return self.source
+        return self._read(0, self.size)
+
+    def chunk_offsets(self) -> range:
+        return range(0, self.size, self.chunk_size)
+
+    def encode_chunk(self, offset: int) -> bytes:
+        """Read and base64-encode the chunk starting at `offset`."""
+        length = min(self.chunk_size, self.size - offset)
+        data = self._read(offset, length)
+        if len(data) != length:
+            raise ValueError("The file of a lazy message part changed before the request was sent")
+        return base64.b64encode(data)
+
+    def iter_base64(self) -> Iterator[bytes]:
+        for offset in self.chunk_offsets():
+            yield self.encode_chunk(offset)
+
+    def _read(self, offset: int, length: int) -> bytes | memoryview:
+        if isinstance(self.source, bytes):
+            return memoryview(self.source)[offset : offset + length]
+        # Requests sending the same file concurrently share its position
+        with self._lock:
+            self.source.seek(offset)
+            return self.source.read(length)
+
+
+class LazyFileData(str):
+    """
+    A `file_data` string whose base64 payload is a placeholder for a `LazyFile`.
+
+    The string itself is the data URL prefix followed by the placeholder; the attached
+    `file` keeps the content alive for as long as the message part exists.
+    """
+
+    file: LazyFile
+
+    def __new__(cls, prefix: str, file: LazyFile) -> "LazyFileData":
+        data = super().__new__(cls, prefix + file.placeholder)
+        data.file = file
+        return data
+
+    # Message parts are copied on their way into the request; never copy the content
+    def __copy__(self) -> "LazyFileData":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "LazyFileData":
+        return self
+
+
+def find_lazy_files(body: bytes) -> list[tuple[int, int, LazyFile]]:
+    """
+    Locate the placeholders of live lazy files in a serialized request body.
+
+    Returns:
+        (start, end, file) for every placeholder, in body order. Placeholder-like text
+        that belongs to no live `LazyFile` is left alone.
+    """
+    if not _lazy_files:
+        return []
+    found = []
+    position = 0
+    while (index := body.find(LAZY_MARKER, position)) != -1:
+        position = index + len(LAZY_MARKER) + _TOKEN_LENGTH
+        token = body[index + len(LAZY_MARKER) : position].decode("ascii", errors="replace")
+        file = _lazy_files.get(token)
+        if file is not None:
+            found.append((index, position, file))
+    return found
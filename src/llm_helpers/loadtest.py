@@ -0,0 +1,157 @@
+"""Closed-loop load tests of `get_llm` clients.
+
+`load_test` keeps `concurrency` requests in flight against one model specification for a
+fixed duration and reports latency, time to first token and output token rate
+percentiles, throughput and errors by type. Used by `llm-helpers bench`.
+"""
+
+import asyncio
+import math
+import time
+from collections import Counter
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from .get_llm import get_llm
+from .sse import chunk_events
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+
+class Percentiles(NamedTuple):
+    """Percentiles of a set of measurements."""
+
+    p50: float
+    p95: float
+    p99: float
+
+    @classmethod
+    def of(cls, values: Sequence[float]) -> "Percentiles | None":
+        if not values:
+            return None
+        ordered = sorted(values)
+        return cls(*(_nearest_rank(ordered, q) for q in (50, 95, 99)))
+
+
+class LoadTestResult(NamedTuple):
+    """
+    Measurements of one `load_test` run. Times are in seconds.
+
+    `time_to_first_token` is only measured for streamed requests. `output_tokens_per_second`
+    are per request, measured from the first token (or the request start if not streamed);
+    `output_token_throughput` is the total over the whole run.
+    """
+
+    model_string: str
+    concurrency: int
+    duration: float
+    requests: int
+    errors: dict[str, int]
+    requests_per_second: float
+    output_token_throughput: float
+    latency: Percentiles | None
+    time_to_first_token: Percentiles | None
+    output_tokens_per_second: Percentiles | None
+
+
+async def load_test(
+    model_string: str,
+    messages: Sequence["BaseMessage"],
+    concurrency: int = 8,
+    duration: float = 30.0,
+    max_requests: int | None = None,
+    streaming: bool = True,
+    **llm_options: Any,
+) -> LoadTestResult:
+    """
+    Send `messages` to a model from `concurrency` workers until `duration` has passed.
+
+    Every worker starts its next request as soon as the previous one finished. Requests
+    in flight when the time is up are completed and counted.
+
+    Args:
+        model_string: Model specification, see `parse_model_string`
+        messages: The prompt sent with every request
+        concurrency: Requests in flight at the same time
+        duration: Seconds during which new requests are started
+        max_requests: Stop starting requests after this many, even before `duration`
+        streaming: Stream responses (measures time to first token) or invoke them
+        **llm_options: Options for `get_llm` (`http_clients`, `rate_limit`, ...)
+
+    Returns:
+        The measurements
+
+    Raises:
+        ValueError: If the model specification is invalid or `concurrency` < 1
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be >= 1, got {concurrency}")
+    llm, _ = get_llm(model_string=model_string, streaming=streaming, **llm_options)
+
+    latencies: list[float] = []
+    ttfts: list[float] = []
+    rates: list[float] = []
+    errors: Counter[str] = Counter()
+    output_tokens = 0
+    started = 0
+
+    async def request() -> None:
+        nonlocal output_tokens
+        start = time.perf_counter()
+        first = None
+        usage = None
+        try:
+            if streaming:
+                async for chunk in llm.astream(messages):
+                    if first is None and chunk_events(chunk):
+                        first = time.perf_counter()
+                    usage = chunk.usage_metadata or usage
+            else:
+                usage = (await llm.ainvoke(messages)).usage_metadata
+        except Exception as e:
+            errors[_error_name(e)] += 1
+            return
+        end = time.perf_counter()
+
+        latencies.append(end - start)
+        if first is not None:
+            ttfts.append(first - start)
+        tokens = usage["output_tokens"] if usage else 0
+        elapsed = end - (first if first is not None else start)
+        if tokens and elapsed > 0:
+            output_tokens += tokens
+            rates.append(tokens / elapsed)
+
+    async def worker(deadline: float) -> None:
+        nonlocal started
+        while time.perf_counter() < deadline and (max_requests is None or started < max_requests):
+            started += 1
+            await request()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(start + duration) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return LoadTestResult(
+        model_string=model_string,
+        concurrency=concurrency,
+        duration=elapsed,
+        requests=started,
+        errors=dict(errors),
+        requests_per_second=started / elapsed,
+        output_token_throughput=output_tokens / elapsed,
+        latency=Percentiles.of(latencies),
+        time_to_first_token=Percentiles.of(ttfts),
+        output_tokens_per_second=Percentiles.of(rates),
+    )
+
+
+def _nearest_rank(ordered: Sequence[float], q: float) -> float:
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def _error_name(error: Exception) -> str:
+    """The error type, with the HTTP status for provider API errors."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return f"{type(error).__name__} {status}" if isinstance(status, int) else type(error).__name__
@@ -0,0 +1,299 @@
+"""Map-reduce over documents too large for one model call.
+
+`split_document` cuts a PDF into page ranges or a text into size-bounded pieces.
+`map_reduce` sends every chunk with the same prompt to a model, at most `max_concurrency`
+at a time, yields the partial answers as they arrive and finally combines them with a
+reduce prompt. Splitting PDFs requires the optional dependency `pypdf`:
+
+    pip install "llm-helpers[pdf]"
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import os
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from typing import Any, Literal, NamedTuple
+
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict, messages_from_dict
+
+from .file_utils import check_file_provider, render_file_part
+from .get_llm import get_llm
+from .state_file import DEFAULT_CHECKPOINT_INTERVAL, StateCheckpoints, load_state
+
+DEFAULT_PAGES_PER_CHUNK = 20
+DEFAULT_MAX_CHUNK_CHARS = 50_000
+DEFAULT_MAP_CONCURRENCY = 8
+
+# Content types split as text
+TEXT_CONTENT_TYPES = ("application/json", "application/xml")
+
+
+@dataclass(frozen=True)
+class DocumentChunk:
+    """
+    One piece of a split document.
+
+    Attributes:
+        index: Position of the chunk in the document
+        content: PDF bytes holding the chunk's pages, or the chunk's text
+        content_type: 'application/pdf' or the text content type of the document
+        pages: The 1-based, inclusive page range of a PDF chunk, None for text
+    """
+
+    index: int
+    content: bytes | str
+    content_type: str
+    pages: tuple[int, int] | None = None
+
+    @property
+    def label(self) -> str:
+        if self.pages is None:
+            return f"Part {self.index + 1}"
+        first, last = self.pages
+        return f"Pages {first}-{last}" if first != last else f"Page {first}"
+
+    def message_part(self, model_provider: str) -> dict:
+        """The chunk as a content part for a `HumanMessage` to `model_provider`."""
+        if isinstance(self.content, str):
+            return {"type": "text", "text": self.content}
+        check_file_provider(model_provider)
+        first, last = self.pages or (1, 1)
+        return render_file_part(
+            model_provider,
+            f"pages-{first}-{last}.pdf",
+            self.content_type,
+            base64.b64encode(self.content).decode("ascii"),
+        )
+
+    def digest(self) -> str:
+        content = self.content.encode() if isinstance(self.content, str) else self.content
+        return hashlib.sha256(content).hexdigest()
+
+
+class MapReduceResult(NamedTuple):
+    """
+    A partial answer for one chunk (`stage` 'map') or the combined answer ('reduce').
+
+    `index` is the chunk's position in `chunks` for map results and None for the reduce
+    result. `cached` is True for answers taken from the state file of an earlier run.
+    """
+
+    stage: Literal["map", "reduce"]
+    index: int | None
+    message: AIMessage | None
+    error: str | None = None
+    cached: bool = False
+
+
+def split_document(
+    content: bytes,
+    content_type: str,
+    pages_per_chunk: int = DEFAULT_PAGES_PER_CHUNK,
+    max_chunk_bytes: int | None = None,
+    max_chunk_chars: int = DEFAULT_MAX_CHUNK_CHARS,
+) -> list[DocumentChunk]:
+    """
+    Split a PDF into page ranges or a text document into size-bounded pieces.
+
+    This is CPU-bound; call it from a worker thread in async code.
+
+    Args:
+        content: The document
+        content_type: 'application/pdf', or a text type ('text/*', JSON or XML)
+        pages_per_chunk: Maximum pages per PDF chunk
+        max_chunk_bytes: Split PDF chunks further until they are at most this large.
+            A single page larger than this becomes a chunk of its own.
+        max_chunk_chars: Maximum characters per text chunk. Text is cut at the last
+            paragraph break, line break or space within the limit.
+
+    Returns:
+        The chunks, in document order
+
+    Raises:
+        ValueError: If the content type cannot be split or a limit is not positive
+        ImportError: If a PDF is split and pypdf is not installed
+    """
+    if pages_per_chunk < 1 or max_chunk_chars < 1:
+        raise ValueError("pages_per_chunk and max_chunk_chars must be positive")
+    if content_type == "application/pdf":
+        return _split_pdf(content, pages_per_chunk, max_chunk_bytes)
+    if content_type.startswith("text/") or content_type in TEXT_CONTENT_TYPES:
+        texts = _split_text(content.decode("utf-8"), max_chunk_chars)
+        return [DocumentChunk(index, text, content_type) for index, text in enumerate(texts)]
+    raise ValueError(f"Cannot split documents of type {content_type}")
+
+
+async def map_reduce(
+    model_string: str,
+    chunks: Sequence[DocumentChunk],
+    map_prompt: str,
+    reduce_prompt: str,
+    max_concurrency: int = DEFAULT_MAP_CONCURRENCY,
+    state_path: str | os.PathLike | None = None,
+    checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    **llm_options: Any,
+) -> AsyncIterator[MapReduceResult]:
+    """
+    Answer `map_prompt` for every chunk concurrently, then combine the answers.
+
+    Each chunk is sent in its own call together with `map_prompt`. Once all chunks are
+    answered, their answers are sent in document order, labelled with their page ranges,
+    in one call with `reduce_prompt`.
+
+    Args:
+        model_string: Model specification, see `parse_model_string`
+        chunks: The chunks of the document, see `split_document`
+        map_prompt: Instruction sent with every chunk
+        reduce_prompt: Instruction sent with the combined partial answers
+        max_concurrency: Maximum number of chunks answered at the same time
+        state_path: JSON file the answers are recorded in. Calling again with the same
+            file, chunks and map prompt takes the recorded answers instead of asking
+            again, so a failed or interrupted run only repeats the missing chunks.
+        checkpoint_interval: Minimum seconds between two writes of `state_path` while
+            chunks are answered. The file is written in a worker thread, and once more
+            when the map step ends or the iteration is closed.
+        **llm_options: Options for `get_llm` (`http_clients`, `rate_limit`, ...)
+
+    Yields:
+        One map result per chunk in the order they finish (recorded answers first), then
+        the reduce result. If any chunk failed, the reduce step is skipped and the reduce
+        result carries the error.
+
+    Raises:
+        ValueError: If `state_path` records answers for a different document or prompt
+        NotImplementedError: If PDF chunks are sent to a provider without file support
+    """
+    llm, provider = get_llm(model_string=model_string, streaming=False, **llm_options)
+    if any(not isinstance(chunk.content, str) for chunk in chunks):
+        check_file_provider(provider)
+    state = await asyncio.to_thread(
+        load_state,
+        state_path,
+        _digest(model_string, map_prompt, chunks),
+        {"map": {}},
+        "answers for a different document or prompt",
+    )
+    checkpoints = StateCheckpoints(state_path, checkpoint_interval)
+    answers: dict[int, AIMessage] = {}
+    failed = 0
+
+    for key, data in state["map"].items():
+        [answers[int(key)]] = messages_from_dict([data])
+        yield MapReduceResult("map", int(key), answers[int(key)], cached=True)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def answer(index: int) -> MapReduceResult:
+        async with semaphore:
+            try:
+                # Encoding a PDF chunk is CPU-bound, so it happens in a worker thread and
+                # only once the chunk is actually sent
+                part = await asyncio.to_thread(chunks[index].message_part, provider)
+                message = HumanMessage(content=[{"type": "text", "text": map_prompt}, part])
+                return MapReduceResult("map", index, await llm.ainvoke([message]))
+            except Exception as e:
+                return MapReduceResult("map", index, None, f"{type(e).__name__}: {e}")
+
+    tasks = [asyncio.create_task(answer(index)) for index in range(len(chunks)) if index not in answers]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            if result.message is not None:
+                answers[result.index] = result.message
+                state["map"][str(result.index)] = message_to_dict(result.message)
+                await checkpoints.save(state)
+            else:
+                failed += 1
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await checkpoints.flush(state)
+
+    if failed:
+        error = f"{failed} of {len(chunks)} chunks failed; call again to retry them"
+        yield MapReduceResult("reduce", None, None, error)
+        return
+
+    reduce_digest = hashlib.sha256(reduce_prompt.encode()).hexdigest()
+    recorded = state.get("reduce")
+    if recorded is not None and recorded["prompt"] == reduce_digest:
+        [message] = messages_from_dict([recorded["message"]])
+        yield MapReduceResult("reduce", None, message, cached=True)
+        return
+
+    partial_answers = "\n\n".join(
+        f"{chunk.label}:\n{answers[position].text}" for position, chunk in enumerate(chunks)
+    )
+    try:
+        message = await llm.ainvoke([HumanMessage(content=f"{reduce_prompt}\n\n{partial_answers}")])
+    except Exception as e:
+        yield MapReduceResult("reduce", None, None, f"{type(e).__name__}: {e}")
+        return
+    state["reduce"] = {"prompt": reduce_digest, "message": message_to_dict(message)}
+    await checkpoints.save(state)
+    await checkpoints.flush(state)
+    yield MapReduceResult("reduce", None, message)
+
+
+def _split_pdf(content: bytes, pages_per_chunk: int, max_chunk_bytes: int | None) -> list[DocumentChunk]:
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError as e:
+        raise ImportError('Splitting PDFs requires pypdf: pip install "llm-helpers[pdf]"') from e
+
+    reader = PdfReader(io.BytesIO(content))
+
+    def write(first: int, last: int) -> bytes:
+        writer = PdfWriter()
+        for page in reader.pages[first - 1 : last]:
+            writer.add_page(page)
+        output = io.BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+    def split(first: int, last: int) -> list[tuple[tuple[int, int], bytes]]:
+        data = write(first, last)
+        if max_chunk_bytes is None or len(data) <= max_chunk_bytes or first == last:
+            return [((first, last), data)]
+        middle = (first + last) // 2
+        return split(first, middle) + split(middle + 1, last)
+
+    page_count = len(reader.pages)
+    ranges = [
+        piece
+        for first in range(1, page_count + 1, pages_per_chunk)
+        for piece in split(first, min(first + pages_per_chunk - 1, page_count))
+    ]
+    return [
+        DocumentChunk(index, data, "application/pdf", pages)
+        for index, (pages, data) in enumerate(ranges)
+    ]
+
+
+def _split_text(text: str, max_chars: int) -> list[str]:
+    chunks = []
+    while len(text) > max_chars:
+        window = text[:max_chars]
+        for separator in ("\n\n", "\n", " "):
+            cut = window.rfind(separator)
+            if cut > 0:
+                cut += len(separator)
+                break
+        else:
+            cut = max_chars
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
+
+
+def _digest(model_string: str, map_prompt: str, chunks: Sequence[DocumentChunk]) -> str:
+    hasher = hashlib.sha256(f"{model_string}\0{map_prompt}".encode())
+    for chunk in chunks:
+        hasher.update(f"\0{chunk.index}:{chunk.digest()}".encode())
+    return hasher.hexdigest()
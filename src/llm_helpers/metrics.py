@@ -0,0 +1,278 @@
+"""Latency and throughput metrics for the clients built by `get_llm`.
+
+Measurements are kept in in-process histograms and counters, which can be rendered in
+the Prometheus text format or mirrored to OpenTelemetry instruments (requires the
+optional dependency `opentelemetry-api`: pip install "llm-helpers[otel]").
+"""
+
+import bisect
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any, NamedTuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+RATE_BUCKETS = (5, 10, 25, 50, 100, 200, 400, 800, 1600)
+
+LABEL_NAMES = ("provider", "model", "reasoning_effort")
+
+
+class Labels(NamedTuple):
+    """The client a measurement was taken for, as parsed by `parse_model_string`."""
+
+    provider: str
+    model: str
+    reasoning_effort: str
+
+
+class HistogramSnapshot(NamedTuple):
+    """Cumulative bucket counts (one per bound plus +Inf), sum and count of a histogram."""
+
+    buckets: tuple[int, ...]
+    sum: float
+    count: int
+
+
+class Histogram:
+    """A thread-safe histogram with fixed bucket bounds, one series per label set."""
+
+    def __init__(self, name: str, description: str, unit: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.description = description
+        self.unit = unit
+        self.buckets = tuple(buckets)
+        self._series: dict[Labels, list] = {}
+        self._lock = threading.Lock()
+        self._otel: Any = None
+
+    def observe(self, labels: Labels, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+        if self._otel is not None:
+            self._otel.record(value, labels._asdict())
+
+    def snapshot(self) -> dict[Labels, HistogramSnapshot]:
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        snapshots = {}
+        for labels, (counts, total, count) in series.items():
+            cumulative, running = [], 0
+            for bucket_count in counts:
+                running += bucket_count
+                cumulative.append(running)
+            snapshots[labels] = HistogramSnapshot(tuple(cumulative), total, count)
+        return snapshots
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """A thread-safe monotonic counter, one series per label set."""
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self._series: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+        self._otel: Any = None
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+        if self._otel is not None:
+            self._otel.add(amount, labels._asdict())
+
+    def snapshot(self) -> dict[Labels, float]:
+        with self._lock:
+            return dict(self._series)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class LLMMetrics:
+    """The metrics recorded by `MetricsCallbackHandler`."""
+
+    def __init__(self) -> None:
+        self.duration = Histogram(
+            "llm_request_duration_seconds", "Time from request start to the complete response", "s", LATENCY_BUCKETS
+        )
+        self.time_to_first_token = Histogram(
+            "llm_time_to_first_token_seconds", "Time from request start to the first streamed token", "s", LATENCY_BUCKETS
+        )
+        self.output_tokens_per_second = Histogram(
+            "llm_output_tokens_per_second", "Output tokens per second after the first token", "{token}/s", RATE_BUCKETS
+        )
+        self.input_tokens = Histogram("llm_input_tokens", "Input tokens per request", "{token}", TOKEN_BUCKETS)
+        self.output_tokens = Histogram("llm_output_tokens", "Output tokens per request", "{token}", TOKEN_BUCKETS)
+        self.requests = Counter("llm_requests_total", "Finished requests")
+        self.errors = Counter("llm_errors_total", "Failed requests")
+        self.retries = Counter("llm_retries_total", "Retried requests")
+        self.cached_input_tokens = Counter("llm_cached_input_tokens_total", "Input tokens read from the provider's prompt cache")
+
+    @property
+    def histograms(self) -> tuple[Histogram, ...]:
+        return (self.duration, self.time_to_first_token, self.output_tokens_per_second, self.input_tokens, self.output_tokens)
+
+    @property
+    def counters(self) -> tuple[Counter, ...]:
+        return (self.requests, self.errors, self.retries, self.cached_input_tokens)
+
+    def cache_hit_rates(self) -> dict[Labels, float]:
+        """Share of input tokens read from the provider's prompt cache, per label set."""
+        cached = self.cached_input_tokens.snapshot()
+        return {
+            labels: cached.get(labels, 0) / snapshot.sum
+            for labels, snapshot in self.input_tokens.snapshot().items()
+            if snapshot.sum
+        }
+
+    def clear(self) -> None:
+        for metric in (*self.histograms, *self.counters):
+            metric.clear()
+
+    def render_prometheus(self) -> str:
+        """Render all series in the Prometheus text exposition format."""
+        lines = []
+        for histogram in self.histograms:
+            lines += [f"# HELP {histogram.name} {histogram.description}", f"# TYPE {histogram.name} histogram"]
+            for labels, snapshot in histogram.snapshot().items():
+                bounds = [*(_format_number(bound) for bound in histogram.buckets), "+Inf"]
+                for bound, count in zip(bounds, snapshot.buckets):
+                    lines.append(f"{histogram.name}_bucket{_format_labels(labels, le=bound)} {count}")
+                lines.append(f"{histogram.name}_sum{_format_labels(labels)} {_format_number(snapshot.sum)}")
+                lines.append(f"{histogram.name}_count{_format_labels(labels)} {snapshot.count}")
+        for counter in self.counters:
+            lines += [f"# HELP {counter.name} {counter.description}", f"# TYPE {counter.name} counter"]
+            for labels, value in counter.snapshot().items():
+                lines.append(f"{counter.name}{_format_labels(labels)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def enable_opentelemetry(self, meter_provider: Any = None) -> None:
+        """
+        Also record every measurement in OpenTelemetry instruments of the same name.
+
+        Args:
+            meter_provider: The OpenTelemetry `MeterProvider`, the global one when None
+
+        Raises:
+            ImportError: If `opentelemetry-api` is not installed
+        """
+        try:
+            from opentelemetry import metrics
+        except ImportError as e:
+            raise ImportError(
+                'OpenTelemetry export requires opentelemetry-api: pip install "llm-helpers[otel]"'
+            ) from e
+
+        meter = metrics.get_meter("llm_helpers", meter_provider=meter_provider)
+        for histogram in self.histograms:
+            histogram._otel = meter.create_histogram(
+                histogram.name,
+                unit=histogram.unit,
+                description=histogram.description,
+                explicit_bucket_boundaries_advisory=list(histogram.buckets),
+            )
+        for counter in self.counters:
+            counter._otel = meter.create_counter(counter.name, description=counter.description)
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    pairs = {**labels._asdict(), **extra}
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+_default_metrics = LLMMetrics()
+
+
+def get_llm_metrics() -> LLMMetrics:
+    """Return the process-wide metrics used by `get_llm(metrics=True)`."""
+    return _default_metrics
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records latency, time to first token, throughput, token usage, prompt cache reads,
+    retries and errors.
+
+    Time to first token is only known for streamed calls. Tokens per second are measured
+    from the first token for streamed calls and from the request start otherwise. Retries
+    are those reported to langchain callbacks; retries inside the provider SDK are not
+    visible.
+    """
+
+    # The handler only does bookkeeping, so run it inline instead of in an executor
+    run_inline = True
+
+    def __init__(self, metrics: LLMMetrics, provider: str, model: str, reasoning_effort: str | None) -> None:
+        self.metrics = metrics
+        self.labels = Labels(provider, model, reasoning_effort or "")
+        self._runs: dict[UUID, list[float | None]] = {}
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs[run_id] = [time.perf_counter(), None]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is not None and run[1] is None:
+            run[1] = time.perf_counter()
+            self.metrics.time_to_first_token.observe(self.labels, run[1] - run[0])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        end = time.perf_counter()
+        start, first_token = run
+        self.metrics.duration.observe(self.labels, end - start)
+        self.metrics.requests.inc(self.labels)
+
+        usage = _usage(response)
+        if usage is None:
+            return
+        self.metrics.input_tokens.observe(self.labels, usage.get("input_tokens", 0))
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        self.metrics.cached_input_tokens.inc(self.labels, cached_tokens)
+        output_tokens = usage.get("output_tokens", 0)
+        self.metrics.output_tokens.observe(self.labels, output_tokens)
+        elapsed = end - (first_token if first_token is not None else start)
+        if output_tokens and elapsed > 0:
+            self.metrics.output_tokens_per_second.observe(self.labels, output_tokens / elapsed)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+        self.metrics.errors.inc(self.labels)
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.metrics.retries.inc(self.labels)
+
+
+def _usage(response: LLMResult) -> dict | None:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage
+    return None
@@ -0,0 +1,145 @@
+"""Payload reduction for images and PDFs before they are encoded by `file_to_message`.
+
+Requires the optional dependencies `pillow` (images) and `pypdf` (PDFs):
+
+    pip install "llm-helpers[images,pdf]"
+"""
+
+import hashlib
+import io
+from dataclasses import dataclass
+
+
+IMAGE_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+@dataclass(frozen=True)
+class PreprocessOptions:
+    """
+    How uploads are reduced before encoding.
+
+    Attributes:
+        max_edge: Downscale images so their longer edge is at most this many pixels.
+            Images are never upscaled. None keeps the original resolution.
+        quality: Compression quality for JPEG and WEBP output (1-95)
+        image_format: Format images are re-encoded to ('JPEG', 'PNG' or 'WEBP').
+            Transparent images are flattened onto white for JPEG.
+        strip_metadata: Drop EXIF (after applying its orientation) and other metadata
+        pdf_pages: Keep only this 1-based, inclusive page range of PDFs, e.g. (1, 10).
+            A range past the last page is cut at the last page; one that starts after it
+            is an error. None keeps all pages.
+    """
+
+    max_edge: int | None = 2048
+    quality: int = 85
+    image_format: str = "JPEG"
+    strip_metadata: bool = True
+    pdf_pages: tuple[int, int] | None = None
+
+    def __post_init__(self) -> None:
+        if self.image_format not in IMAGE_FORMATS:
+            raise ValueError(
+                f"Unsupported image format: {self.image_format}, supported: {list(IMAGE_FORMATS)}"
+            )
+        if self.pdf_pages is not None and not 1 <= self.pdf_pages[0] <= self.pdf_pages[1]:
+            raise ValueError(f"Invalid PDF page range: {self.pdf_pages}")
+
+    def fingerprint(self) -> str:
+        """Stable identifier of these options, used in cache keys."""
+        return hashlib.sha256(repr(self).encode()).hexdigest()[:16]
+
+
+# OpenAI scales images to fit 2048x2048 before tiling them, Gemini accepts up to 3072.
+DEFAULT_PREPROCESS_OPTIONS: dict[str, PreprocessOptions] = {
+    "openai": PreprocessOptions(max_edge=2048),
+    "azure": PreprocessOptions(max_edge=2048),
+    "google": PreprocessOptions(max_edge=3072),
+}
+
+
+def preprocessed_content_type(content_type: str | None, options: PreprocessOptions) -> str | None:
+    """Return the content type `preprocess_content` produces for `content_type`."""
+    if _is_image(content_type):
+        return IMAGE_FORMATS[options.image_format]
+    return content_type
+
+
+def preprocess_content(
+    content: bytes, content_type: str | None, options: PreprocessOptions
+) -> bytes:
+    """
+    Reduce an image or PDF according to `options`. Other content is returned unchanged.
+
+    This is CPU-bound; call it from a worker thread in async code.
+
+    Raises:
+        ImportError: If the optional dependency for the content type is not installed
+        ValueError: If `options.pdf_pages` starts after the last page of a PDF
+    """
+    if _is_image(content_type):
+        return _preprocess_image(content, options)
+    if content_type == "application/pdf" and options.pdf_pages is not None:
+        return _select_pdf_pages(content, options.pdf_pages, options.strip_metadata)
+    return content
+
+
+def _is_image(content_type: str | None) -> bool:
+    # GIFs may be animated and SVGs are not raster images, leave both untouched
+    return (
+        content_type is not None
+        and content_type.startswith("image/")
+        and content_type not in ("image/gif", "image/svg+xml")
+    )
+
+
+def _preprocess_image(content: bytes, options: PreprocessOptions) -> bytes:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError as e:
+        raise ImportError(
+            'Image preprocessing requires Pillow: pip install "llm-helpers[images]"'
+        ) from e
+
+    with Image.open(io.BytesIO(content)) as image:
+        # Bake the EXIF orientation into the pixels before the EXIF data is dropped
+        processed = ImageOps.exif_transpose(image)
+        # Without its Orientation tag, so viewers do not rotate the pixels a second time
+        exif = processed.getexif()
+        if options.max_edge is not None:
+            processed.thumbnail((options.max_edge, options.max_edge), Image.Resampling.LANCZOS)
+
+        if options.image_format == "JPEG" and processed.mode not in ("RGB", "L"):
+            rgba = processed.convert("RGBA")
+            processed = Image.new("RGB", rgba.size, (255, 255, 255))
+            processed.paste(rgba, mask=rgba.getchannel("A"))
+
+        save_args: dict = {"optimize": True}
+        if options.image_format in ("JPEG", "WEBP"):
+            save_args["quality"] = options.quality
+        if not options.strip_metadata and exif:
+            save_args["exif"] = exif
+
+        output = io.BytesIO()
+        processed.save(output, format=options.image_format, **save_args)
+        return output.getvalue()
+
+
+def _select_pdf_pages(content: bytes, pages: tuple[int, int], strip_metadata: bool) -> bytes:
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError as e:
+        raise ImportError('PDF preprocessing requires pypdf: pip install "llm-helpers[pdf]"') from e
+
+    reader = PdfReader(io.BytesIO(content))
+    first, last = pages
+    if first > len(reader.pages):
+        raise ValueError(f"PDF page range {pages} starts after the last page ({len(reader.pages)})")
+    writer = PdfWriter()
+    for page in reader.pages[first - 1 : last]:
+        writer.add_page(page)
+    if not strip_metadata and reader.metadata is not None:
+        writer.add_metadata(reader.metadata)
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
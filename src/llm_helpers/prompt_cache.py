@@ -0,0 +1,243 @@
+"""Provider-side prompt caching for `get_llm` clients.
+
+OpenAI and Azure cache long prompt prefixes automatically; a `PromptCache.key` routes
+requests sharing a prefix to the same cache and `retention` keeps it longer. Google only
+reuses explicitly created context caches, which `GoogleContextCache` creates for documents
+from `file_to_message`, shares between calls and keeps alive while they are used.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import weakref
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Literal, NamedTuple
+
+from .parse_model_string import parse_model_string
+
+DEFAULT_CONTEXT_CACHE_TTL = 3600.0
+DEFAULT_REFRESH_MARGIN = 300.0
+
+
+@dataclass(frozen=True)
+class PromptCache:
+    """
+    Prompt caching settings for `get_llm(prompt_cache=...)`.
+
+    Args:
+        key: OpenAI/Azure `prompt_cache_key`. Requests with the same key and prompt prefix
+            are routed to the same cache; use one key per shared system prompt or document.
+        retention: OpenAI/Azure `prompt_cache_retention`, "in_memory" or "24h"
+        cached_content: Name of a Google context cache, see `GoogleContextCache`
+    """
+
+    key: str | None = None
+    retention: Literal["in_memory", "24h"] | None = None
+    cached_content: str | None = None
+
+    def model_params(self, provider: str) -> dict[str, Any]:
+        """
+        Return the client parameters for `provider`.
+
+        Groq and MistralAI cache prompts automatically where the model supports it and take
+        no settings.
+
+        Raises:
+            ValueError: If `cached_content` is set for a provider other than Google
+        """
+        if self.cached_content is not None and provider != "google":
+            raise ValueError(f"Context caches are only supported for Google, not {provider}")
+        match provider:
+            case "openai" | "azure":
+                model_kwargs = {}
+                if self.key is not None:
+                    model_kwargs["prompt_cache_key"] = self.key
+                if self.retention is not None:
+                    model_kwargs["prompt_cache_retention"] = self.retention
+                return {"model_kwargs": model_kwargs} if model_kwargs else {}
+            case "google" if self.cached_content is not None:
+                return {"cached_content": self.cached_content}
+            case _:
+                return {}
+
+
+class ContextCacheHandle(NamedTuple):
+    """A Google context cache and when it expires, as a Unix timestamp."""
+
+    name: str
+    expire_time: float
+
+
+class GoogleContextCache:
+    """
+    Creates Google context caches for documents and keeps them alive while they are used.
+
+    Every distinct document (and system instruction) gets one cache, created on first
+    use and shared by all later calls. A cache that expires within `refresh_margin`
+    seconds gets its TTL extended on the next `get`; one that has expired or was deleted
+    is created again. Handles of expired caches are forgotten.
+
+    Example:
+        context_caches = GoogleContextCache("google:gemini-2.5-flash")
+        part = await file_to_message(file, "google")
+        prompt_cache = await context_caches.get([part], system_instruction=SYSTEM_PROMPT)
+        llm, _ = get_llm(model_string="google:gemini-2.5-flash", prompt_cache=prompt_cache, cache=True)
+        await llm.ainvoke([HumanMessage(content="Summarize the document")])
+
+    Calls with a context cache must not repeat its system instruction or contents. Google
+    only caches contents above a model-specific minimum size (1024 to 4096 tokens).
+
+    Args:
+        model_string: Google model specification the caches are created for; calls
+            using a cache must use the same model
+        ttl: Seconds a cache lives after it was created or last refreshed
+        refresh_margin: Extend a cache's TTL when it expires within this many seconds
+        client: A `google.genai.Client`; by default one is built from `GOOGLE_API_KEY`
+            or `GEMINI_API_KEY`
+
+    Raises:
+        ValueError: If `model_string` is not a Google model
+    """
+
+    def __init__(
+        self,
+        model_string: str,
+        ttl: float = DEFAULT_CONTEXT_CACHE_TTL,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+        client: Any | None = None,
+    ) -> None:
+        provider, self.model_name, _ = parse_model_string(model_string=model_string)
+        if provider != "google":
+            raise ValueError(f"Context caches are only supported for Google, not {provider}")
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self._client = client
+        self._handles: dict[str, ContextCacheHandle] = {}
+        # Only alive while a call holds or waits for them, so one key per document ever
+        # requested does not pile up
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            from google.genai import Client
+
+            self._client = Client()
+        return self._client
+
+    def handles(self) -> list[ContextCacheHandle]:
+        return list(self._handles.values())
+
+    async def get(self, parts: Sequence[dict | str], system_instruction: str | None = None) -> PromptCache:
+        """
+        Return the prompt cache settings for a context cache holding `parts`.
+
+        Args:
+            parts: Text and file parts, as produced by `file_to_message(..., "google")`
+            system_instruction: System instruction to cache along with the parts
+
+        Returns:
+            Settings to pass to `get_llm(prompt_cache=...)`
+
+        Raises:
+            ValueError: If a part has an unsupported format
+        """
+        # Hashing a large document takes a while; hashlib releases the GIL meanwhile
+        key = await asyncio.to_thread(_digest, self.model_name, parts, system_instruction)
+        self._prune()
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        async with lock:
+            handle = self._handles.get(key)
+            now = time.time()
+            if handle is not None and handle.expire_time - now <= self.refresh_margin:
+                handle = await self._refresh(handle) if handle.expire_time > now else None
+            if handle is None:
+                handle = await self._create(key, parts, system_instruction)
+            self._handles[key] = handle
+        return PromptCache(cached_content=handle.name)
+
+    async def clear(self) -> None:
+        """Delete every context cache created by this instance."""
+        from google.genai import errors
+
+        handles, self._handles = self._handles, {}
+        for handle in handles.values():
+            try:
+                await self.client.aio.caches.delete(name=handle.name)
+            except errors.ClientError as e:
+                if e.code != 404:
+                    raise
+
+    def _prune(self) -> None:
+        """Forget handles of caches that have expired; Google has deleted them already."""
+        now = time.time()
+        for key, handle in list(self._handles.items()):
+            if handle.expire_time <= now:
+                del self._handles[key]
+
+    async def _create(self, key: str, parts: Sequence[dict | str], system_instruction: str | None) -> ContextCacheHandle:
+        from google.genai import types
+
+        config = types.CreateCachedContentConfig(
+            contents=[types.Content(role="user", parts=[_to_part(part) for part in parts])],
+            system_instruction=system_instruction,
+            ttl=f"{int(self.ttl)}s",
+            display_name=f"llm-helpers-{key[:16]}",
+        )
+        cached = await self.client.aio.caches.create(model=self.model_name, config=config)
+        return ContextCacheHandle(cached.name, _expire_time(cached, self.ttl))
+
+    async def _refresh(self, handle: ContextCacheHandle) -> ContextCacheHandle | None:
+        """Extend the TTL of `handle`, or return None if it no longer exists."""
+        from google.genai import errors, types
+
+        try:
+            cached = await self.client.aio.caches.update(
+                name=handle.name, config=types.UpdateCachedContentConfig(ttl=f"{int(self.ttl)}s")
+            )
+        except errors.ClientError as e:
+            if e.code in (403, 404):
+                return None
+            raise
+        return ContextCacheHandle(handle.name, _expire_time(cached, self.ttl))
+
+
+def _expire_time(cached: Any, ttl: float) -> float:
+    if cached.expire_time is not None:
+        return cached.expire_time.timestamp()
+    return time.time() + ttl
+
+
+def _digest(model_name: str, parts: Sequence[dict | str], system_instruction: str | None) -> str:
+    digest = hashlib.sha256(f"{model_name}\0{system_instruction or ''}\0".encode())
+    for part in parts:
+        if isinstance(part, dict) and isinstance(part.get("data"), str):
+            # Hash base64 data directly instead of copying it through json.dumps
+            fields = {name: value for name, value in part.items() if name != "data"}
+            digest.update(json.dumps(fields, sort_keys=True).encode())
+            digest.update(part["data"].encode())
+        else:
+            digest.update(json.dumps(part, sort_keys=True).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _to_part(part: dict | str) -> Any:
+    from google.genai import types
+
+    if isinstance(part, str):
+        return types.Part(text=part)
+    match part.get("type"):
+        case "text":
+            return types.Part(text=part["text"])
+        case "file" if part.get("source_type") == "base64":
+            return types.Part.from_bytes(data=base64.b64decode(part["data"]), mime_type=part["mime_type"])
+        case "media" if "file_uri" in part:
+            return types.Part.from_uri(file_uri=part["file_uri"], mime_type=part.get("mime_type"))
+        case _:
+            raise ValueError(f"Unsupported part for a context cache: {part.get('type')}")
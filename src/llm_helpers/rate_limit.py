@@ -0,0 +1,253 @@
+"""Adaptive client-side rate limiting for the clients built by `get_llm`."""
+
+import asyncio
+import email.utils
+import re
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Request and token budgets for one provider and model.
+
+    Attributes:
+        requests_per_minute: Maximum requests started per minute. None for no limit.
+        tokens_per_minute: Maximum tokens (input + output) used per minute. Usage is only
+            known after a response, so it is deducted afterwards and delays the next
+            requests until the budget has recovered. None for no limit.
+        burst_seconds: How many seconds worth of budget may be used at once
+    """
+
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+    burst_seconds: float = 10.0
+
+
+class _TokenBucket:
+    """Token bucket whose level may go negative when usage is reported after the fact."""
+
+    def __init__(self, per_minute: float, burst_seconds: float, now: float) -> None:
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> float | None:
+    """
+    Parse durations as sent in rate limit headers into seconds.
+
+    Accepts plain seconds ("1.5") and unit strings ("20ms", "6m0s", "1h2m3.5s").
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """Return the delay requested by `retry-after-ms` or `retry-after`, in seconds."""
+    headers = {key.lower(): value for key, value in headers.items()}
+    if "retry-after-ms" in headers:
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if "retry-after" in headers:
+        seconds = parse_duration(headers["retry-after"])
+        if seconds is not None:
+            return seconds
+        try:
+            date = email.utils.parsedate_to_datetime(headers["retry-after"])
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, date.timestamp() - time.time())
+    return None
+
+
+class AdaptiveRateLimiter(BaseRateLimiter):
+    """
+    Token-bucket limiter for requests and tokens per minute that follows provider hints.
+
+    Besides its own budgets it honours `Retry-After` and the `x-ratelimit-remaining-*` /
+    `x-ratelimit-reset-*` headers reported through `update_from_headers`, so the process
+    slows down before the provider starts answering with 429s.
+    """
+
+    def __init__(self, limit: RateLimit | None = None, check_every: float = 0.05) -> None:
+        self.limit = limit or RateLimit()
+        self.check_every = check_every
+        now = time.monotonic()
+        self._requests = (
+            _TokenBucket(self.limit.requests_per_minute, self.limit.burst_seconds, now)
+            if self.limit.requests_per_minute
+            else None
+        )
+        self._tokens = (
+            _TokenBucket(self.limit.tokens_per_minute, self.limit.burst_seconds, now)
+            if self.limit.tokens_per_minute
+            else None
+        )
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _try_acquire(self) -> float:
+        """Take a request if allowed. Returns 0 on success, else the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._blocked_until - now
+            for bucket in (self._requests, self._tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+            if self._requests is not None:
+                wait = max(wait, self._requests.wait_time(1))
+            if self._tokens is not None:
+                # Wait until earlier usage has been paid back
+                wait = max(wait, self._tokens.wait_time(min(1.0, self._tokens.capacity)))
+            if wait > 0:
+                return wait
+            if self._requests is not None:
+                self._requests.level -= 1
+            return 0.0
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        while (wait := self._try_acquire()) > 0:
+            if not blocking:
+                return False
+            time.sleep(min(wait, self.check_every))
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        while (wait := self._try_acquire()) > 0:
+            if not blocking:
+                return False
+            await asyncio.sleep(min(wait, self.check_every))
+        return True
+
+    def record_usage(self, tokens: int) -> None:
+        """Deduct the tokens a finished request used from the token budget."""
+        if self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.level -= tokens
+
+    def pause(self, seconds: float) -> None:
+        """Let no request through for `seconds`, e.g. after a 429 with `Retry-After`."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Adapt to `Retry-After` and `x-ratelimit-*` headers of a provider response."""
+        headers = {key.lower(): value for key, value in headers.items()}
+
+        retry_after = parse_retry_after(headers)
+        if retry_after is not None:
+            self.pause(retry_after)
+
+        for kind, bucket in (("requests", self._requests), ("tokens", self._tokens)):
+            remaining = _parse_float(headers.get(f"x-ratelimit-remaining-{kind}"))
+            if remaining is None:
+                continue
+            reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}", ""))
+            if remaining <= 0 and reset is not None:
+                self.pause(reset)
+            elif bucket is not None:
+                with self._lock:
+                    bucket.refill(time.monotonic())
+                    bucket.level = min(bucket.level, remaining)
+
+
+def _parse_float(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+    """Feeds token usage, rate limit headers and 429 errors back into a limiter."""
+
+    def __init__(self, limiter: AdaptiveRateLimiter) -> None:
+        self.limiter = limiter
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                if usage:
+                    self.limiter.record_usage(usage.get("total_tokens", 0))
+                metadata = getattr(message, "response_metadata", None) or {}
+                headers = metadata.get("headers") or (generation.generation_info or {}).get("headers")
+                if headers:
+                    self.limiter.update_from_headers(headers)
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        if status != 429:
+            return
+        headers = getattr(response, "headers", None)
+        if headers:
+            self.limiter.update_from_headers(headers)
+
+
+_limiters: dict[tuple[str, str], AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model_name: str, limit: RateLimit) -> AdaptiveRateLimiter:
+    """
+    Return the process-wide limiter for `provider` and `model_name`.
+
+    Every client built with the same provider and model shares one limiter, so the budgets
+    hold for the whole process rather than per client.
+
+    Raises:
+        ValueError: If the limiter already exists with a different limit
+    """
+    with _limiters_lock:
+        key = (provider, model_name)
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AdaptiveRateLimiter(limit)
+        elif limiter.limit != limit:
+            raise ValueError(
+                f"The rate limiter of {provider}:{model_name} already exists with {limiter.limit}. "
+                "Call clear_rate_limiters() first to change it."
+            )
+        return limiter
+
+
+def clear_rate_limiters() -> None:
+    """Drop the process-wide limiters, e.g. to change the limit of a model."""
+    with _limiters_lock:
+        _limiters.clear()
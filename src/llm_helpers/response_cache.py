@@ -0,0 +1,384 @@
+"""Response caches for the clients built by `get_llm`.
+
+Identical calls (same normalized messages, model and parameters) are answered from the
+cache instead of the provider. The Redis backend requires the optional dependency `redis`:
+
+    pip install "llm-helpers[redis]"
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import abstractmethod
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    message_chunk_to_message,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import model_validator
+
+from .cache import LRUCache
+
+_cache_enabled: ContextVar[bool] = ContextVar("llm_helpers_response_cache", default=True)
+
+
+@contextmanager
+def no_response_cache() -> Iterator[None]:
+    """Bypass response caches (reads and writes) for the calls made inside this block."""
+    token = _cache_enabled.set(False)
+    try:
+        yield
+    finally:
+        _cache_enabled.reset(token)
+
+
+class ResponseCache(BaseCache):
+    """
+    Base class of the response cache backends.
+
+    Entries are stored as JSON under a SHA-256 key of the model parameters and the
+    normalized messages, and expire after `ttl` seconds (None to keep them until evicted
+    or cleared). Subclasses implement `_get`, `_set` and `clear`.
+    """
+
+    def __init__(self, ttl: float | None = None) -> None:
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"ttl must be positive, got {ttl}")
+        self.ttl = ttl
+
+    @staticmethod
+    def key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        if not _cache_enabled.get():
+            return None
+        data = self._get(self.key(prompt, llm_string))
+        return _loads(data) if data is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if not _cache_enabled.get():
+            return
+        self._set(self.key(prompt, llm_string), _dumps(return_val))
+
+    @abstractmethod
+    def _get(self, key: str) -> str | None:
+        """Return the unexpired entry stored under `key`, if any."""
+
+    @abstractmethod
+    def _set(self, key: str, value: str) -> None:
+        """Store `value` under `key`, expiring after `self.ttl` seconds."""
+
+
+def _dumps(generations: RETURN_VAL_TYPE) -> str:
+    return json.dumps(
+        [
+            {
+                "message": message_to_dict(generation.message),
+                "generation_info": generation.generation_info,
+            }
+            for generation in generations
+            if isinstance(generation, ChatGeneration)
+        ]
+    )
+
+
+def _loads(data: str) -> list[ChatGeneration]:
+    entries = json.loads(data)
+    messages = messages_from_dict([entry["message"] for entry in entries])
+    return [
+        ChatGeneration(message=message, generation_info=entry["generation_info"])
+        for message, entry in zip(messages, entries)
+    ]
+
+
+class MemoryResponseCache(ResponseCache):
+    """
+    In-process LRU response cache.
+
+    Args:
+        maxsize: Maximum number of cached responses
+        ttl: Seconds until an entry expires, None to keep entries until evicted
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None) -> None:
+        super().__init__(ttl)
+        self._entries: LRUCache[str, tuple[float, str]] = LRUCache(maxsize)
+
+    def _get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.invalidate(key)
+            return None
+        return value
+
+    def _set(self, key: str, value: str) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else math.inf
+        self._entries.put(key, (expires_at, value))
+
+    def clear(self, **kwargs: Any) -> None:
+        self._entries.clear()
+
+    # Lookups are cheap, skip the executor the default async methods use
+    async def alookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+        return self.lookup(prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.update(prompt, llm_string, return_val)
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    Response cache in a SQLite database file.
+
+    The database runs in WAL mode, so uvicorn workers on the same host can share one file.
+
+    Args:
+        path: Database file, created if it does not exist
+        ttl: Seconds until an entry expires, None to keep entries until cleared
+    """
+
+    # Expired rows are deleted on every this many writes
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str | os.PathLike = "llm_responses.sqlite", ttl: float | None = None) -> None:
+        super().__init__(ttl)
+        self.path = os.fspath(path)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connection = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM responses WHERE key = ? AND (expires_at IS NULL OR expires_at >= ?)",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def _set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._connection.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class RedisResponseCache(ResponseCache):
+    """
+    Response cache in Redis, shared by all workers and hosts using the same server.
+
+    Args:
+        url: Redis connection URL, ignored if `client` is given
+        ttl: Seconds until an entry expires, None to keep entries until evicted by Redis
+        prefix: Prefix of the Redis keys, `clear()` deletes all keys with this prefix
+        client: An existing `redis.Redis` client
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        ttl: float | None = None,
+        prefix: str = "llm-helpers:response:",
+        client: Any = None,
+    ) -> None:
+        super().__init__(ttl)
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError(
+                    'The Redis response cache requires redis: pip install "llm-helpers[redis]"'
+                ) from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _get(self, key: str) -> str | None:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            return value.decode()
+        return value
+
+    def _set(self, key: str, value: str) -> None:
+        px = math.ceil(self.ttl * 1000) if self.ttl is not None else None
+        self.client.set(self.prefix + key, value, px=px)
+
+    def clear(self, **kwargs: Any) -> None:
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class CachedChatModel(BaseChatModel):
+    """
+    Answers repeated calls to `llm` from `cache`, including streamed calls.
+
+    Invocations are cached by langchain itself. Streams are looked up here and a hit is
+    replayed as a stream, so callers using `stream` / `astream` see no difference apart
+    from the response arriving at once. Only streams that complete are stored.
+    """
+
+    llm: BaseChatModel
+
+    @model_validator(mode="after")
+    def _check_cache(self) -> "CachedChatModel":
+        if not isinstance(self.cache, BaseCache):
+            raise ValueError("CachedChatModel needs a cache backend")
+        return self
+
+    @property
+    def _llm_type(self) -> str:
+        return self.llm._llm_type
+
+    def _get_llm_string(self, stop: list[str] | None = None, **kwargs: Any) -> str:
+        return self.llm._get_llm_string(stop=stop, **kwargs)
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Any:
+        # Bind the provider specific tool format to this model, so tool calls are cached too
+        return self.bind(**self.llm.bind_tools(tools, **kwargs).kwargs)
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self.llm.invoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt, llm_string = self._cache_key(messages, stop, **kwargs)
+        cached = self.cache.lookup(prompt, llm_string)
+        if cached:
+            yield from _replay(cached)
+            return
+
+        chunks = []
+        for chunk in self.llm.stream(messages, stop=stop, **kwargs):
+            chunks.append(chunk)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager is not None:
+                run_manager.on_llm_new_token(chunk.text, chunk=generation)
+            yield generation
+        if chunks:
+            self.cache.update(prompt, llm_string, _merge(chunks))
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        prompt, llm_string = self._cache_key(messages, stop, **kwargs)
+        cached = await self.cache.alookup(prompt, llm_string)
+        if cached:
+            for generation in _replay(cached):
+                yield generation
+            return
+
+        chunks = []
+        async for chunk in self.llm.astream(messages, stop=stop, **kwargs):
+            chunks.append(chunk)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.text, chunk=generation)
+            yield generation
+        if chunks:
+            await self.cache.aupdate(prompt, llm_string, _merge(chunks))
+
+    def _cache_key(self, messages: list[BaseMessage], stop: list[str] | None, **kwargs: Any) -> tuple[str, str]:
+        """The (prompt, llm_string) pair langchain uses to cache invocations."""
+        normalized = [
+            message.model_copy(update={"id": None}) if message.id is not None else message
+            for message in messages
+        ]
+        return dumps(normalized), self._get_llm_string(stop=stop, **kwargs)
+
+
+def _merge(chunks: list[AIMessageChunk]) -> list[ChatGeneration]:
+    merged = chunks[0] + chunks[1:] if len(chunks) > 1 else chunks[0]
+    return [ChatGeneration(message=message_chunk_to_message(merged))]
+
+
+def _replay(generations: RETURN_VAL_TYPE) -> Iterator[ChatGenerationChunk]:
+    for generation in generations:
+        message = generation.message
+        if not isinstance(message, AIMessage):
+            continue
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content=message.content,
+                additional_kwargs=message.additional_kwargs,
+                response_metadata=message.response_metadata,
+                usage_metadata=message.usage_metadata,
+                tool_call_chunks=[
+                    tool_call_chunk(
+                        name=tool_call["name"],
+                        args=json.dumps(tool_call["args"]),
+                        id=tool_call["id"],
+                        index=index,
+                    )
+                    for index, tool_call in enumerate(message.tool_calls)
+                ],
+            )
+        )
@@ -0,0 +1,362 @@
+"""A chat model that routes each call to the fastest healthy of several backends."""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Sequence
+from typing import Any, Literal, NamedTuple, TypeVar
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr, model_validator
+
+from .get_llm import get_llm
+
+T = TypeVar("T")
+
+# Streaming calls are measured until the first chunk, other calls until the full response
+CallKind = Literal["invoke", "stream"]
+
+
+class BackendStats(NamedTuple):
+    """
+    Routing statistics of one backend of a `RouterChatModel`.
+
+    `ewma_latency` is measured on calls that return the full response,
+    `ewma_time_to_first_token` on streaming calls; `samples` counts both.
+    """
+
+    name: str
+    ewma_latency: float | None
+    ewma_time_to_first_token: float | None
+    error_rate: float
+    samples: int
+    healthy: bool
+
+
+class _Latencies:
+    """EWMA and recent samples of one kind of latency."""
+
+    def __init__(self, window: int) -> None:
+        self.ewma: float | None = None
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def add(self, latency: float, alpha: float) -> None:
+        self.samples.append(latency)
+        self.ewma = latency if self.ewma is None else self.ewma + alpha * (latency - self.ewma)
+
+
+class _Backend:
+    """Mutable latency and error bookkeeping for one backend."""
+
+    def __init__(self, name: str, window: int) -> None:
+        self.name = name
+        # A first chunk arrives long before the full response; never mix the two
+        self.latencies: dict[CallKind, _Latencies] = {
+            "invoke": _Latencies(window),
+            "stream": _Latencies(window),
+        }
+        self.error_rate = 0.0
+        self.last_failure = -math.inf
+
+
+class RouterChatModel(BaseChatModel):
+    """
+    Routes every call to the backend with the lowest latency among the healthy ones.
+
+    Latency is the time until the first output: the first chunk for streaming calls and
+    the full response otherwise. Each backend keeps an exponentially weighted moving
+    average (EWMA) of its error rate, and of its latency separately for streaming and
+    other calls; a call is routed and hedged by the latency of its own kind. Backends whose error rate is at or above
+    `max_error_rate` are skipped until `cooldown` seconds after their last failure. If a
+    backend fails before producing output, the call fails over to the next one.
+
+    With `hedge=True`, async calls that have not produced output after the backend's
+    `hedge_percentile` latency (or `hedge_delay` while there are fewer than
+    `min_samples` measurements) are also sent to the next backend, and whichever answers
+    first wins. The other request is cancelled.
+    """
+
+    backends: list[BaseChatModel]
+    names: list[str] = Field(default_factory=list)
+    hedge: bool = False
+    hedge_percentile: float = 0.95
+    hedge_delay: float = 2.0
+    min_samples: int = 10
+    ewma_alpha: float = 0.2
+    max_error_rate: float = 0.5
+    cooldown: float = 30.0
+    window: int = 100
+
+    _backends: list[_Backend] = PrivateAttr(default_factory=list)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @model_validator(mode="after")
+    def _init_backends(self) -> "RouterChatModel":
+        if not self.backends:
+            raise ValueError("RouterChatModel needs at least one backend")
+        if not self.names:
+            self.names = [f"{i}:{backend._llm_type}" for i, backend in enumerate(self.backends)]
+        if len(self.names) != len(self.backends):
+            raise ValueError("names must have one entry per backend")
+        self._backends = [_Backend(name, self.window) for name in self.names]
+        return self
+
+    @classmethod
+    def from_model_strings(
+        cls,
+        model_strings: Sequence[str],
+        streaming: bool = True,
+        **kwargs: Any,
+    ) -> "RouterChatModel":
+        """
+        Build a router with one `get_llm` client per model string.
+
+        Args:
+            model_strings: Model specifications, see `parse_model_string`
+            streaming: Whether to enable streaming responses
+            **kwargs: Options for `get_llm` (`cache`, `http_clients`, ...) and fields of
+                the router (`hedge`, `hedge_percentile`, ...)
+        """
+        # Fields inherited from BaseChatModel (`cache`, `rate_limiter`, ...) share names with
+        # `get_llm` options and belong to the backends
+        own_fields = cls.model_fields.keys() - BaseChatModel.model_fields.keys()
+        llm_options = {key: kwargs.pop(key) for key in list(kwargs) if key not in own_fields}
+        backends = [
+            get_llm(model_string=model_string, streaming=streaming, **llm_options)[0]
+            for model_string in model_strings
+        ]
+        return cls(backends=backends, names=list(model_strings), **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    def backend_stats(self) -> list[BackendStats]:
+        """Return the current routing statistics of every backend."""
+        with self._lock:
+            return [
+                BackendStats(
+                    backend.name,
+                    backend.latencies["invoke"].ewma,
+                    backend.latencies["stream"].ewma,
+                    backend.error_rate,
+                    sum(len(latencies.samples) for latencies in backend.latencies.values()),
+                    self._is_healthy(backend),
+                )
+                for backend in self._backends
+            ]
+
+    def _ranked(self, kind: CallKind) -> list[int]:
+        """Backend indices, best first: healthy before unhealthy, then by latency."""
+        with self._lock:
+
+            def score(i: int) -> tuple[bool, float, float]:
+                backend = self._backends[i]
+                # Unmeasured backends go first, so every backend gets measured
+                ewma = backend.latencies[kind].ewma
+                latency = ewma if ewma is not None else -1.0
+                return (not self._is_healthy(backend), latency, backend.error_rate)
+
+            return sorted(range(len(self._backends)), key=score)
+
+    def _is_healthy(self, backend: _Backend) -> bool:
+        return (
+            backend.error_rate < self.max_error_rate
+            or time.monotonic() - backend.last_failure >= self.cooldown
+        )
+
+    def _record_success(self, i: int, kind: CallKind, latency: float) -> None:
+        with self._lock:
+            backend = self._backends[i]
+            backend.latencies[kind].add(latency, self.ewma_alpha)
+            backend.error_rate *= 1 - self.ewma_alpha
+
+    def _record_failure(self, i: int) -> None:
+        with self._lock:
+            backend = self._backends[i]
+            backend.error_rate += self.ewma_alpha * (1 - backend.error_rate)
+            backend.last_failure = time.monotonic()
+
+    def _hedge_deadline(self, i: int, kind: CallKind) -> float:
+        with self._lock:
+            latencies = sorted(self._backends[i].latencies[kind].samples)
+        if len(latencies) < self.min_samples:
+            return self.hedge_delay
+        rank = min(len(latencies) - 1, math.ceil(self.hedge_percentile * len(latencies)) - 1)
+        return latencies[max(rank, 0)]
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        error: BaseException | None = None
+        for i in self._ranked("invoke"):
+            start = time.monotonic()
+            try:
+                message = self.backends[i].invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                self._record_failure(i)
+                error = e
+                continue
+            self._record_success(i, "invoke", time.monotonic() - start)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        assert error is not None
+        raise error
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        error: BaseException | None = None
+        for i in self._ranked("stream"):
+            start = time.monotonic()
+            stream = self.backends[i].stream(messages, stop=stop, **kwargs)
+            try:
+                first = next(stream)
+            except StopIteration:
+                first = None
+            except Exception as e:
+                self._record_failure(i)
+                error = e
+                continue
+            self._record_success(i, "stream", time.monotonic() - start)
+
+            chunks = stream if first is None else _prepend(first, stream)
+            for chunk in chunks:
+                generation = ChatGenerationChunk(message=chunk)
+                if run_manager is not None:
+                    run_manager.on_llm_new_token(chunk.text, chunk=generation)
+                yield generation
+            return
+        assert error is not None
+        raise error
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        async def call(i: int) -> AIMessage:
+            return await self.backends[i].ainvoke(messages, stop=stop, **kwargs)
+
+        _, message = await self._race("invoke", call)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async def first_chunk(i: int) -> tuple[AsyncIterator[AIMessageChunk], AIMessageChunk | None]:
+            stream = self.backends[i].astream(messages, stop=stop, **kwargs)
+            try:
+                return stream, await anext(stream, None)
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        _, (stream, first) = await self._race(
+            "stream", first_chunk, cleanup=lambda result: result[0].aclose()
+        )
+
+        if first is None:
+            return
+        async for chunk in _aprepend(first, stream):
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.text, chunk=generation)
+            yield generation
+
+    async def _race(
+        self,
+        kind: CallKind,
+        call: Callable[[int], Awaitable[T]],
+        cleanup: Callable[[T], Awaitable[Any]] | None = None,
+    ) -> tuple[int, T]:
+        """
+        Run `call` on the best backend, hedging and failing over as configured.
+
+        `kind` selects the latencies `call` is ranked, hedged and measured by.
+
+        Returns:
+            The index of the backend that answered first and its result
+
+        Raises:
+            The error of the last backend tried, if all of them failed
+        """
+        candidates = iter(self._ranked(kind))
+        pending: dict[asyncio.Task, tuple[int, float]] = {}
+        error: BaseException | None = None
+
+        def start_next() -> bool:
+            i = next(candidates, None)
+            if i is None:
+                return False
+            pending[asyncio.ensure_future(call(i))] = (i, time.monotonic())
+            return True
+
+        start_next()
+        first = next(iter(pending.values()))[0]
+        hedge_timeout = self._hedge_deadline(first, kind) if self.hedge else None
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=hedge_timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # The deadline passed without an answer: hedge once on the next backend
+                    hedge_timeout = None
+                    start_next()
+                    continue
+
+                for task in done:
+                    i, started = pending.pop(task)
+                    if task.exception() is None:
+                        self._record_success(i, kind, time.monotonic() - started)
+                        return i, task.result()
+                    self._record_failure(i)
+                    error = task.exception()
+                if not pending:
+                    hedge_timeout = None
+                    start_next()
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    result = await task
+                except BaseException:
+                    continue
+                # The losing request already answered; release what it holds
+                if cleanup is not None:
+                    await cleanup(result)
+
+        assert error is not None
+        raise error
+
+
+def _prepend(first: T, rest: Iterator[T]) -> Iterator[T]:
+    yield first
+    yield from rest
+
+
+async def _aprepend(first: T, rest: AsyncIterator[T]) -> AsyncIterator[T]:
+    yield first
+    async for item in rest:
+        yield item
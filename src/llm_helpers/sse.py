@@ -0,0 +1,245 @@
+"""Stream the output of `get_llm` clients as Server-Sent Events.
+
+Providers stream chunks in different shapes: plain strings (Groq, Mistral), `responses/v1`
+content blocks (OpenAI, Azure), Google parts, and reasoning as content blocks or in
+`additional_kwargs`. `normalized_stream` turns any of them into one stream of text and
+reasoning events and coalesces tiny chunks, so a FastAPI handler writes one SSE event per
+flush instead of one per token.
+"""
+
+import asyncio
+import json
+from collections.abc import AsyncIterator, Mapping
+from contextlib import suppress
+from typing import TYPE_CHECKING, Any, Literal, NamedTuple
+
+if TYPE_CHECKING:
+    from fastapi.responses import StreamingResponse
+    from langchain_core.messages import BaseMessageChunk
+
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_FLUSH_SIZE = 1024
+DEFAULT_MAX_QUEUED = 64
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Keep nginx and similar proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+_END = object()
+
+
+class StreamEvent(NamedTuple):
+    """A piece of streamed model output."""
+
+    kind: Literal["text", "reasoning"]
+    text: str
+
+
+def chunk_events(chunk: "BaseMessageChunk") -> list[StreamEvent]:
+    """
+    Extract the text and reasoning of a streamed chunk, whatever the provider's format.
+
+    Args:
+        chunk: A chunk from the `astream` of a `get_llm` client
+
+    Returns:
+        The chunk's events in order; empty for chunks without output (usage, metadata)
+    """
+    events = []
+    reasoning = chunk.additional_kwargs.get("reasoning_content")
+    if reasoning:
+        events.append(StreamEvent("reasoning", reasoning))
+
+    content = chunk.content
+    if isinstance(content, str):
+        if content:
+            events.append(StreamEvent("text", content))
+        return events
+
+    for block in content:
+        if isinstance(block, str):
+            kind, text = "text", block
+        else:
+            match block.get("type"):
+                case "text" | "output_text":
+                    kind, text = "text", block.get("text")
+                case "reasoning":
+                    # langchain standard blocks carry `reasoning`, OpenAI's a summary
+                    kind, text = "reasoning", block.get("reasoning") or _join_text(block.get("summary"))
+                case "thinking":
+                    # Google sends a string, Mistral a list of text blocks
+                    kind, text = "reasoning", _join_text(block.get("thinking"))
+                case _:
+                    continue
+        if text:
+            events.append(StreamEvent(kind, text))
+    return events
+
+
+def _join_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if not value:
+        return ""
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in value)
+
+
+async def normalized_stream(
+    chunks: AsyncIterator["BaseMessageChunk"],
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    flush_size: int = DEFAULT_FLUSH_SIZE,
+    max_queued: int = DEFAULT_MAX_QUEUED,
+) -> AsyncIterator[StreamEvent]:
+    """
+    Normalize and coalesce a chunk stream into text and reasoning events.
+
+    Consecutive pieces of the same kind are joined until `flush_interval` has passed
+    since the first of them, they reach `flush_size` characters, or the kind changes.
+    Chunks are read by a background task into a queue of at most `max_queued` chunks; when
+    the consumer falls behind, the task stops reading and the provider connection is
+    throttled by TCP flow control instead of buffering the response in memory.
+
+    Args:
+        chunks: The `astream` (or `astream` like iterator) of a chat model
+        flush_interval: Seconds a piece is held back to be joined with the following ones;
+            0 only joins pieces that arrived while the consumer was busy
+        flush_size: Characters after which an event is emitted without waiting
+        max_queued: Chunks read ahead of the consumer
+
+    Yields:
+        Coalesced events in stream order
+
+    Raises:
+        Exception: Whatever the chunk stream raised, after the events before it
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+    producer = asyncio.create_task(_read_chunks(chunks, queue))
+
+    kind, parts, size, deadline = None, [], 0, 0.0
+    try:
+        while True:
+            if parts and queue.empty():
+                remaining = deadline - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    yield StreamEvent(kind, "".join(parts))
+                    parts, size = [], 0
+                    continue
+            else:
+                item = await queue.get()
+
+            if item is _END:
+                break
+            if isinstance(item, BaseException):
+                if parts:
+                    yield StreamEvent(kind, "".join(parts))
+                raise item
+
+            for event in item:
+                if event.kind != kind and parts:
+                    yield StreamEvent(kind, "".join(parts))
+                    parts, size = [], 0
+                if not parts:
+                    kind, deadline = event.kind, loop.time() + flush_interval
+                parts.append(event.text)
+                size += len(event.text)
+                if size >= flush_size:
+                    yield StreamEvent(kind, "".join(parts))
+                    parts, size = [], 0
+
+        if parts:
+            yield StreamEvent(kind, "".join(parts))
+    finally:
+        producer.cancel()
+        with suppress(asyncio.CancelledError):
+            await producer
+
+
+async def _read_chunks(chunks: AsyncIterator["BaseMessageChunk"], queue: asyncio.Queue) -> None:
+    try:
+        async for chunk in chunks:
+            events = chunk_events(chunk)
+            if events:
+                await queue.put(events)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(_END)
+
+
+def encode_sse(event: str, data: Any) -> bytes:
+    """Encode one Server-Sent Event with a JSON payload."""
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+async def sse_stream(
+    chunks: AsyncIterator["BaseMessageChunk"],
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    flush_size: int = DEFAULT_FLUSH_SIZE,
+    max_queued: int = DEFAULT_MAX_QUEUED,
+) -> AsyncIterator[bytes]:
+    """
+    Encode a chunk stream as Server-Sent Events.
+
+    Every coalesced piece becomes a `text` or `reasoning` event with data `{"text": ...}`.
+    The stream ends with a `done` event, or with an `error` event carrying the exception
+    type, after which the exception is re-raised so the server logs it.
+
+    Args:
+        chunks: The `astream` of a chat model
+        flush_interval: See `normalized_stream`
+        flush_size: See `normalized_stream`
+        max_queued: See `normalized_stream`
+
+    Yields:
+        Encoded events
+    """
+    try:
+        async for event in normalized_stream(chunks, flush_interval, flush_size, max_queued):
+            yield encode_sse(event.kind, {"text": event.text})
+    except Exception as e:
+        yield encode_sse("error", {"error": type(e).__name__})
+        raise
+    yield encode_sse("done", {})
+
+
+def sse_response(
+    chunks: AsyncIterator["BaseMessageChunk"],
+    flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    flush_size: int = DEFAULT_FLUSH_SIZE,
+    max_queued: int = DEFAULT_MAX_QUEUED,
+    headers: Mapping[str, str] | None = None,
+) -> "StreamingResponse":
+    """
+    Return a FastAPI response streaming `chunks` as Server-Sent Events, see `sse_stream`.
+
+    Example:
+        @app.post("/chat")
+        async def chat(request: ChatRequest):
+            llm, _ = get_llm(model_string="openai:gpt-5.1:low", cache=True)
+            return sse_response(llm.astream(request.messages))
+
+    Args:
+        chunks: The `astream` of a chat model
+        flush_interval: See `normalized_stream`
+        flush_size: See `normalized_stream`
+        max_queued: See `normalized_stream`
+        headers: Additional response headers
+
+    Returns:
+        A `StreamingResponse` with media type `text/event-stream`
+    """
+    from fastapi.responses import StreamingResponse
+
+    return StreamingResponse(
+        sse_stream(chunks, flush_interval, flush_size, max_queued),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, **(headers or {})},
+    )
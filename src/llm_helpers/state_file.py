@@ -0,0 +1,91 @@
+"""JSON state files that let long-running jobs (`bulk_invoke`, `map_reduce`) resume.
+
+A state file records the progress of a job together with a digest of its inputs, so a
+second call with the same inputs continues where the first one stopped, and a call with
+different inputs does not pick up progress that does not belong to it.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any
+
+# Seconds between two writes of a state file by `StateCheckpoints`
+DEFAULT_CHECKPOINT_INTERVAL = 1.0
+
+
+def load_state(
+    state_path: str | os.PathLike | None, digest: str, empty: dict[str, Any], mismatch: str
+) -> dict:
+    """
+    Load the state recorded in `state_path`, or start a new one.
+
+    Args:
+        state_path: The state file; None keeps the state in memory only
+        digest: Digest of the job's inputs
+        empty: The progress of a job that has not started yet
+        mismatch: What the file records if its digest differs, for the error message
+
+    Returns:
+        The recorded state, or `empty` with the digest if there is no file yet
+
+    Raises:
+        ValueError: If the file was written for inputs with a different digest
+    """
+    if state_path is None or not os.path.exists(state_path):
+        return {"digest": digest, **empty}
+    with open(state_path) as f:
+        state = json.load(f)
+    if state["digest"] != digest:
+        raise ValueError(f"{os.fspath(state_path)} records {mismatch}")
+    return state
+
+
+class StateCheckpoints:
+    """
+    Saves a state file from async code without blocking the event loop for the write.
+
+    `save` is called after every change but writes at most every `interval` seconds, so a
+    job with many small steps does not rewrite a growing file after each of them. `flush`
+    writes the changes not saved yet and must be called when the job stops. Calls must
+    not overlap; one coroutine should own the checkpoints.
+
+    Args:
+        state_path: The state file; None makes saving a no-op
+        interval: Minimum seconds between two writes; 0 writes on every `save`
+    """
+
+    def __init__(
+        self, state_path: str | os.PathLike | None, interval: float = DEFAULT_CHECKPOINT_INTERVAL
+    ) -> None:
+        self.state_path = state_path
+        self.interval = interval
+        self._saved_at = float("-inf")
+        self._pending = False
+
+    async def save(self, state: dict) -> None:
+        """Record that `state` changed, and write it if the last write is `interval` ago."""
+        if self.state_path is None:
+            return
+        self._pending = True
+        if time.monotonic() - self._saved_at >= self.interval:
+            await self.flush(state)
+
+    async def flush(self, state: dict) -> None:
+        """Write `state` if it changed since the last write."""
+        if not self._pending:
+            return
+        # Serialize here: the state may change while the worker thread writes
+        data = json.dumps(state)
+        self._pending = False
+        await asyncio.to_thread(_write, self.state_path, data)
+        self._saved_at = time.monotonic()
+
+
+def _write(state_path: str | os.PathLike, data: str) -> None:
+    # Atomic, so an interrupted write leaves the previous state intact
+    tmp_path = f"{os.fspath(state_path)}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+    os.replace(tmp_path, state_path)
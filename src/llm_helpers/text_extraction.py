@@ -0,0 +1,156 @@
+"""Local text extraction for `file_to_message(mode="text")`.
+
+Extracts the text of PDFs (their text layer), DOCX, HTML and plain text files, so
+documents can be sent as compact text parts, also to providers without file inputs.
+PDFs require the optional dependency `pypdf`:
+
+    pip install "llm-helpers[pdf]"
+"""
+
+import io
+import mimetypes
+import re
+import zipfile
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+PDF_CONTENT_TYPE = "application/pdf"
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+# Text formats besides `text/*`
+TEXT_CONTENT_TYPES = ("application/json", "application/xml", "application/x-yaml", "application/yaml")
+
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Tags whose content is not text, and tags that start a new line
+_SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav",
+    "ol", "p", "pre", "section", "table", "td", "th", "title", "tr", "ul",
+}
+
+
+class TextExtractionError(ValueError):
+    """Raised when no text can be extracted from a file."""
+
+
+def text_content_type(content_type: str | None, filename: str | None) -> str | None:
+    """The content type to extract by, guessed from `filename` if the upload has none."""
+    if content_type in (None, "", "application/octet-stream") and filename:
+        return mimetypes.guess_type(filename)[0] or content_type
+    return content_type
+
+
+def can_extract_text(content_type: str | None) -> bool:
+    return content_type is not None and (
+        content_type in (PDF_CONTENT_TYPE, DOCX_CONTENT_TYPE, *HTML_CONTENT_TYPES, *TEXT_CONTENT_TYPES)
+        or content_type.startswith("text/")
+    )
+
+
+def extract_text(content: bytes, content_type: str | None) -> str:
+    """
+    Extract the text of a document.
+
+    This is CPU-bound; call it from a worker thread in async code.
+
+    Args:
+        content: The file content
+        content_type: Its content type, see `can_extract_text`
+
+    Returns:
+        The text, with runs of blank lines collapsed. Runs of spaces are collapsed too,
+        except in plain text formats.
+
+    Raises:
+        TextExtractionError: If the content type is not supported, or the file has no
+            text (e.g. a scanned PDF without a text layer)
+        ImportError: If a PDF is given and pypdf is not installed
+    """
+    if content_type == PDF_CONTENT_TYPE:
+        text = _compact(_pdf_text(content))
+    elif content_type == DOCX_CONTENT_TYPE:
+        text = _compact(_docx_text(content))
+    elif content_type in HTML_CONTENT_TYPES:
+        text = _compact(_html_text(content.decode("utf-8", errors="replace")))
+    elif can_extract_text(content_type):
+        # Indentation matters in code, YAML and the like; only drop trailing whitespace
+        lines = content.decode("utf-8-sig", errors="replace").splitlines()
+        text = _collapse_blank_lines("\n".join(line.rstrip() for line in lines))
+    else:
+        raise TextExtractionError(f"Cannot extract text from {content_type} files")
+
+    if not text:
+        raise TextExtractionError(f"The {content_type} file contains no text")
+    return text
+
+
+def _pdf_text(content: bytes) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ImportError('Extracting text from PDFs requires pypdf: pip install "llm-helpers[pdf]"') from e
+
+    reader = PdfReader(io.BytesIO(content))
+    return "\n\n".join(page.extract_text() for page in reader.pages)
+
+
+def _docx_text(content: bytes) -> str:
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            document = ElementTree.fromstring(archive.read("word/document.xml"))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise TextExtractionError(f"Not a valid DOCX file: {e}") from e
+
+    paragraphs = []
+    for paragraph in document.iter(f"{_WORD_NAMESPACE}p"):
+        pieces = []
+        for element in paragraph.iter():
+            if element.tag == f"{_WORD_NAMESPACE}t":
+                pieces.append(element.text or "")
+            elif element.tag == f"{_WORD_NAMESPACE}tab":
+                pieces.append("\t")
+            elif element.tag in (f"{_WORD_NAMESPACE}br", f"{_WORD_NAMESPACE}cr"):
+                pieces.append("\n")
+        paragraphs.append("".join(pieces))
+    return "\n".join(paragraphs)
+
+
+class _HTMLText(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.pieces: list[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in _SKIPPED_TAGS:
+            self._skipping += 1
+        elif tag in _BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _SKIPPED_TAGS:
+            self._skipping = max(self._skipping - 1, 0)
+        elif tag in _BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skipping:
+            self.pieces.append(data)
+
+
+def _html_text(html: str) -> str:
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.pieces)
+
+
+def _compact(text: str) -> str:
+    lines = (re.sub(r"[ \t\u00a0]+", " ", line).strip() for line in text.splitlines())
+    return _collapse_blank_lines("\n".join(lines))
+
+
+def _collapse_blank_lines(text: str) -> str:
+    return re.sub(r"\n{3,}", "\n\n", text).strip("\n")
@@ -0,0 +1,286 @@
+"""Local token estimates and context-budget trimming for message lists.
+
+Text is counted with a `tiktoken` encoding that is loaded once per process. It is exact for
+OpenAI models and a close estimate for the other providers. Where the encoding cannot be
+loaded (tiktoken downloads it on first use), text falls back to 4 characters per token.
+Files and images from `file_to_message` are estimated from their type and, for PDFs, their
+page count. Lazy parts are estimated from their size, so counting does not read the file.
+"""
+
+import base64
+import binascii
+import json
+import math
+import re
+import threading
+from collections.abc import Sequence
+from typing import Any
+
+from langchain_core.messages import AIMessage, BaseMessage, trim_messages
+
+from .const import MODEL_CONTEXT_BUDGETS, MODEL_PROVIDERS, ContextBudget
+from .lazy_parts import LazyFileData
+from .parse_model_string import parse_model_string
+
+ENCODING_NAME = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+# Chat formatting added per message and once for the reply (OpenAI's published counts)
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+# Google bills a fixed 258 tokens per image and PDF page. OpenAI sends PDF pages as text
+# plus a page image; 765 tokens is a 1024x1024 image at high detail.
+IMAGE_TOKENS: dict[str, int] = {"google": 258}
+PDF_PAGE_TOKENS: dict[str, int] = {"google": 258}
+DEFAULT_IMAGE_TOKENS = 765
+DEFAULT_PDF_PAGE_TOKENS = 1500
+
+# Typical size of a PDF page, for lazy parts whose pages are not counted to avoid
+# reading the whole file
+PDF_BYTES_PER_PAGE = 100 * 1024
+
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?!s)")
+
+_encodings: dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(name: str = ENCODING_NAME) -> Any:
+    """
+    Return the process-wide `tiktoken` encoding `name`, loading it on first use.
+
+    Returns:
+        The encoding, or None if tiktoken is not installed or the encoding cannot be
+        loaded. A failed load is not retried.
+    """
+    try:
+        return _encodings[name]
+    except KeyError:
+        pass
+    with _encodings_lock:
+        if name not in _encodings:
+            try:
+                import tiktoken
+
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception:
+                _encodings[name] = None
+    return _encodings[name]
+
+
+def count_text_tokens(text: str) -> int:
+    """Count the tokens of `text`, estimating from its length if no encoding is available."""
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+
+def count_message_tokens(message: BaseMessage, provider: MODEL_PROVIDERS = "openai") -> int:
+    """
+    Estimate the input tokens of one message, including its text, files and tool calls.
+
+    Files referenced by ID or URI (`mode="reference"`) are not counted, since their
+    content is not available locally.
+
+    Args:
+        message: The message
+        provider: The provider the message is sent to; file and image costs differ
+    """
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    content = message.content
+    if isinstance(content, str):
+        tokens += count_text_tokens(content)
+    else:
+        for part in content:
+            if isinstance(part, str):
+                tokens += count_text_tokens(part)
+            else:
+                tokens += _count_part_tokens(part, provider)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += count_text_tokens(json.dumps([[call["name"], call["args"]] for call in message.tool_calls]))
+    return tokens
+
+
+def count_tokens(
+    messages: str | Sequence[BaseMessage],
+    model_env: str | None = None,
+    model_string: str | None = None,
+) -> int:
+    """
+    Estimate the input tokens of a prompt for a model specification.
+
+    Args:
+        messages: The prompt, a string or a message list
+        model_env: Environment variable name containing the model specification
+        model_string: Direct model specification string, see `parse_model_string`
+
+    Returns:
+        The estimated number of input tokens
+
+    Raises:
+        ValueError: If the model specification is invalid
+    """
+    provider, _, _ = parse_model_string(model_env, model_string)
+    if isinstance(messages, str):
+        return MESSAGE_OVERHEAD_TOKENS + count_text_tokens(messages) + REPLY_PRIMING_TOKENS
+    return sum(count_message_tokens(message, provider) for message in messages) + REPLY_PRIMING_TOKENS
+
+
+def get_context_budget(model_env: str | None = None, model_string: str | None = None) -> ContextBudget:
+    """
+    Look up the context window and output limit of a model in `MODEL_CONTEXT_BUDGETS`.
+
+    Raises:
+        ValueError: If the model specification is invalid or the model is not listed
+    """
+    _, model_name, _ = parse_model_string(model_env, model_string)
+    matches = [prefix for prefix in MODEL_CONTEXT_BUDGETS if model_name.startswith(prefix)]
+    if not matches:
+        raise ValueError(f"Unknown context window for model {model_name}, pass context_window explicitly")
+    return MODEL_CONTEXT_BUDGETS[max(matches, key=len)]
+
+
+def input_token_budget(
+    model_env: str | None = None,
+    model_string: str | None = None,
+    max_output_tokens: int | None = None,
+    context_window: int | None = None,
+) -> int:
+    """
+    Tokens left for the prompt once the output is reserved.
+
+    Args:
+        model_env: Environment variable name containing the model specification
+        model_string: Direct model specification string
+        max_output_tokens: Output tokens to reserve; the model's maximum by default
+        context_window: Context window to use instead of the one in `MODEL_CONTEXT_BUDGETS`
+
+    Raises:
+        ValueError: If the model specification is invalid or its limits are unknown
+    """
+    if context_window is None or max_output_tokens is None:
+        budget = get_context_budget(model_env, model_string)
+        context_window = context_window if context_window is not None else budget.context_window
+        max_output_tokens = max_output_tokens if max_output_tokens is not None else budget.max_output_tokens
+    return context_window - max_output_tokens
+
+
+def fits_context(
+    messages: str | Sequence[BaseMessage],
+    model_env: str | None = None,
+    model_string: str | None = None,
+    max_output_tokens: int | None = None,
+    context_window: int | None = None,
+) -> bool:
+    """Whether the prompt and `max_output_tokens` fit the model's context, see `input_token_budget`."""
+    budget = input_token_budget(model_env, model_string, max_output_tokens, context_window)
+    return count_tokens(messages, model_env, model_string) <= budget
+
+
+def trim_to_budget(
+    messages: Sequence[BaseMessage],
+    model_env: str | None = None,
+    model_string: str | None = None,
+    max_output_tokens: int | None = None,
+    context_window: int | None = None,
+) -> list[BaseMessage]:
+    """
+    Drop the oldest messages until the prompt fits the model's context and output budget.
+
+    The system message is always kept, and the kept history starts with a human message,
+    so no tool result or reply is left without the message it answers.
+
+    Args:
+        messages: The prompt
+        model_env: Environment variable name containing the model specification
+        model_string: Direct model specification string
+        max_output_tokens: Output tokens to reserve; the model's maximum by default
+        context_window: Context window to use instead of the one in `MODEL_CONTEXT_BUDGETS`
+
+    Returns:
+        The most recent messages that fit, unchanged if the whole prompt fits
+
+    Raises:
+        ValueError: If the model's limits are unknown, or the system message and the last
+            message alone do not fit
+    """
+    provider, _, _ = parse_model_string(model_env, model_string)
+    budget = input_token_budget(model_env, model_string, max_output_tokens, context_window)
+    counts: dict[int, int] = {}
+
+    # trim_messages counts messages repeatedly; files are expensive to count
+    def token_counter(message: BaseMessage) -> int:
+        count = counts.get(id(message))
+        if count is None:
+            count = counts[id(message)] = count_message_tokens(message, provider)
+        return count
+
+    if sum(map(token_counter, messages)) <= budget - REPLY_PRIMING_TOKENS:
+        return list(messages)
+
+    trimmed = trim_messages(
+        messages,
+        max_tokens=budget - REPLY_PRIMING_TOKENS,
+        token_counter=token_counter,
+        strategy="last",
+        include_system=True,
+        start_on="human",
+    )
+    if not messages or not trimmed or trimmed[-1] is not messages[-1]:
+        raise ValueError(f"The last message does not fit the input budget of {budget} tokens")
+    return trimmed
+
+
+def _count_part_tokens(part: dict, provider: str) -> int:
+    match part.get("type"):
+        case "text" | "input_text" | "output_text":
+            return count_text_tokens(part.get("text", ""))
+        case "image_url" | "input_image" | "image":
+            return IMAGE_TOKENS.get(provider, DEFAULT_IMAGE_TOKENS)
+        case "input_file" | "file" | "media":
+            mime_type, data = _file_payload(part)
+            return _count_file_tokens(mime_type, data, provider)
+        case _:
+            return 0
+
+
+def _file_payload(part: dict) -> tuple[str | None, str | None]:
+    """Return the MIME type and base64 data of a file part, in any of the rendered formats."""
+    if isinstance(part.get("file"), dict):
+        part = part["file"]
+    file_data = part.get("file_data")
+    if isinstance(file_data, LazyFileData):
+        return file_data.removeprefix("data:").split(";")[0] or None, file_data
+    if file_data:
+        header, _, data = file_data.partition(",")
+        return header.removeprefix("data:").split(";")[0] or None, data
+    return part.get("mime_type"), part.get("data") or part.get("base64")
+
+
+def _count_file_tokens(mime_type: str | None, data: str | None, provider: str) -> int:
+    if not data:
+        return 0
+    if mime_type and mime_type.startswith("image/"):
+        return IMAGE_TOKENS.get(provider, DEFAULT_IMAGE_TOKENS)
+    if isinstance(data, LazyFileData):
+        return _estimate_file_tokens(mime_type, data.file.size, provider)
+    try:
+        content = base64.b64decode(data)
+    except (binascii.Error, ValueError):
+        return 0
+    if mime_type == "application/pdf":
+        pages = max(len(_PDF_PAGE.findall(content)), 1)
+        return pages * PDF_PAGE_TOKENS.get(provider, DEFAULT_PDF_PAGE_TOKENS)
+    if mime_type and (mime_type.startswith("text/") or mime_type in ("application/json", "application/xml")):
+        return count_text_tokens(content.decode("utf-8", errors="replace"))
+    return math.ceil(len(content) / CHARS_PER_TOKEN)
+
+
+def _estimate_file_tokens(mime_type: str | None, size: int, provider: str) -> int:
+    """Estimate the tokens of a file from its size alone, without reading its content."""
+    if mime_type == "application/pdf":
+        pages = max(math.ceil(size / PDF_BYTES_PER_PAGE), 1)
+        return pages * PDF_PAGE_TOKENS.get(provider, DEFAULT_PDF_PAGE_TOKENS)
+    return math.ceil(size / CHARS_PER_TOKEN)
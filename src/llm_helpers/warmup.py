@@ -0,0 +1,108 @@
+"""Warm up `get_llm` clients and their connections before the first request."""
+
+import asyncio
+import importlib
+import time
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from .get_llm import get_llm
+from .parse_model_string import parse_model_string
+from .response_cache import CachedChatModel
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+PROVIDER_MODULES = {
+    "openai": "langchain_openai",
+    "azure": "langchain_openai",
+    "groq": "langchain_groq",
+    "mistralai": "langchain_mistralai",
+    "google": "langchain_google_genai",
+}
+
+
+class WarmupTiming(NamedTuple):
+    """How long each warmup step took for one model specification, in seconds."""
+
+    model_string: str
+    provider: str
+    parse_seconds: float
+    import_seconds: float
+    build_seconds: float
+    connect_seconds: float | None
+    error: str | None = None
+
+
+async def warmup(
+    model_strings: Sequence[str],
+    connections: int = 1,
+    **llm_options: Any,
+) -> list[WarmupTiming]:
+    """
+    Build and cache the clients for `model_strings` and open connections to their endpoints.
+
+    Meant for the FastAPI lifespan, so the first request after startup does not pay for
+    module imports, client construction, DNS lookups and TCP/TLS handshakes. Connections
+    are opened by listing the provider's models, which costs no tokens, and stay in the
+    client's keep-alive pool. Failing connections are reported, not raised.
+
+    Args:
+        model_strings: Model specifications, see `parse_model_string`
+        connections: Keep-alive connections to open per client
+        **llm_options: Options for `get_llm` (`streaming`, `http_clients`, ...). Use the
+            same options as the request handlers, so they get the warmed clients from
+            the client cache.
+
+    Returns:
+        The timings of every model specification, in input order
+
+    Raises:
+        ValueError: If a model specification is invalid
+    """
+    llm_options["cache"] = True
+    timings = []
+    clients = []
+    for model_string in model_strings:
+        start = time.perf_counter()
+        provider, _, _ = parse_model_string(model_string=model_string)
+        parsed = time.perf_counter()
+        importlib.import_module(PROVIDER_MODULES[provider])
+        imported = time.perf_counter()
+        llm, _ = get_llm(model_string=model_string, **llm_options)
+        built = time.perf_counter()
+
+        timings.append((model_string, provider, parsed - start, imported - parsed, built - imported))
+        clients.append((provider, llm))
+
+    connects = await asyncio.gather(
+        *(_timed_connect(provider, llm, connections) for provider, llm in clients)
+    )
+    return [WarmupTiming(*timing, *connect) for timing, connect in zip(timings, connects)]
+
+
+async def _timed_connect(provider: str, llm: "BaseChatModel", connections: int) -> tuple[float | None, str | None]:
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_connect(provider, llm) for _ in range(connections)))
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    return time.perf_counter() - start, None
+
+
+async def _connect(provider: str, llm: Any) -> None:
+    """Send a free request through the async HTTP client `llm` uses for its calls."""
+    if isinstance(llm, CachedChatModel):
+        llm = llm.llm
+    match provider:
+        case "openai" | "azure":
+            await llm.root_async_client.models.list()
+        case "groq":
+            await llm.async_client._client.models.list()
+        case "mistralai":
+            response = await llm.async_client.get("models")
+            response.raise_for_status()
+        case "google":
+            await llm.client.aio.models.list(config={"page_size": 1})
+        case _:
+            raise ValueError(f"Unsupported model provider: {provider}")
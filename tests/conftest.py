@@ -0,0 +1,50 @@
+"""Shared fixtures: a local stub server the providers are pointed at, and HTTP pools."""
+
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
+from typing import Any
+
+import pytest
+import pytest_asyncio
+from src.llm_helpers.get_llm import clear_llm_cache
+from src.llm_helpers.http_clients import HttpClients
+from tests.stub_server import STUB_PROVIDERS, StubOpenAIServer
+
+
+@pytest.fixture
+def stub_server_factory(monkeypatch) -> Iterator[Callable[..., StubOpenAIServer]]:
+    """
+    Start stub servers and point providers at them: `start(providers=..., **options)`.
+
+    `options` are passed to `StubOpenAIServer`. The servers are stopped and the client
+    cache is cleared after the test.
+    """
+    with ExitStack() as servers:
+
+        def start(providers: tuple[str, ...] = STUB_PROVIDERS, **options: Any) -> StubOpenAIServer:
+            server = servers.enter_context(StubOpenAIServer(**options))
+            for name, value in server.environment(providers).items():
+                monkeypatch.setenv(name, value)
+            return server
+
+        yield start
+    clear_llm_cache()
+
+
+@pytest.fixture
+def stub_server_options() -> dict[str, Any]:
+    """Options of the `stub_server`; override this fixture in a test module to change them."""
+    return {}
+
+
+@pytest.fixture
+def stub_server(stub_server_factory, stub_server_options) -> StubOpenAIServer:
+    """A stub server every OpenAI-compatible provider is pointed at."""
+    return stub_server_factory(**stub_server_options)
+
+
+@pytest_asyncio.fixture
+async def http_clients():
+    clients = HttpClients()
+    yield clients
+    await clients.aclose()
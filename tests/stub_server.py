@@ -0,0 +1,435 @@
+"""A local OpenAI-compatible stub server for offline tests.
+
+Serves the Responses API (`/v1/responses`) and Chat Completions (`*/chat/completions`,
+which also covers Groq and MistralAI) with and without streaming, plus the embeddings
+(`*/embeddings`), files (`/v1/files`) and batch (`/v1/batches`) endpoints, and records
+the requests and client connections it sees.
+"""
+
+import base64
+import email.parser
+import json
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+
+# Providers with an OpenAI-compatible API that can be pointed at the server
+STUB_PROVIDERS = ("openai", "azure", "groq", "mistralai")
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections under concurrent load
+    request_queue_size = 256
+
+
+class StubOpenAIServer:
+    """
+    OpenAI-compatible HTTP server running in a background thread.
+
+    Args:
+        reply: Text returned by every completion
+        latency: Seconds to wait before sending the response headers
+        token_interval: Seconds to wait between streamed tokens
+        headers: Extra headers sent with every response, e.g. rate limit headers
+        batch_polls: How many times a batch is reported as in progress before it completes
+        cached_tokens: Input tokens reported as read from the prompt cache
+    """
+
+    def __init__(
+        self,
+        reply: str = "Hello world",
+        latency: float = 0.0,
+        token_interval: float = 0.0,
+        headers: dict[str, str] | None = None,
+        batch_polls: int = 0,
+        cached_tokens: int = 0,
+    ):
+        self.reply = reply
+        self.latency = latency
+        self.token_interval = token_interval
+        self.headers = dict(headers or {})
+        self.batch_polls = batch_polls
+        self.cached_tokens = cached_tokens
+        self.requests: list[tuple[str, str, Any]] = []
+        self.connections: set[tuple[str, int]] = set()
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def start(self) -> "StubOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def environment(self, providers: tuple[str, ...] = STUB_PROVIDERS) -> dict[str, str]:
+        """Environment variables with fake credentials that point `providers` at this server."""
+        environment = {}
+        for provider in providers:
+            match provider:
+                case "openai":
+                    environment.update(OPENAI_API_KEY="test-key", OPENAI_BASE_URL=self.base_url)
+                case "azure":
+                    environment.update(AZURE_OPENAI_API_KEY="test-key", AZURE_BASE_URL=self.base_url)
+                case "groq":
+                    # The Groq SDK appends /openai/v1 itself, which the server accepts too
+                    environment.update(GROQ_API_KEY="test-key", GROQ_API_BASE=self.url)
+                case "mistralai":
+                    environment.update(MISTRAL_API_KEY="test-key", MISTRAL_BASE_URL=self.base_url)
+                case "google":
+                    # Only the credentials: Google clients cannot be pointed at this server
+                    environment.update(GOOGLE_API_KEY="test-key")
+                case _:
+                    raise ValueError(f"Unknown provider: {provider}")
+        return environment
+
+    def tokens(self) -> list[str]:
+        words = self.reply.split(" ")
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    def add_file(self, content: bytes) -> str:
+        with self._lock:
+            file_id = f"file-{len(self.files) + 1}"
+            self.files[file_id] = content
+            return file_id
+
+    def add_batch(self, body: dict) -> dict:
+        with self._lock:
+            batch_id = f"batch_{len(self.batches) + 1}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": body["endpoint"],
+                "input_file_id": body["input_file_id"],
+                "completion_window": body["completion_window"],
+                "status": "in_progress",
+                "created_at": int(time.time()),
+                "polls": 0,
+            }
+            return self.batches[batch_id]
+
+    def poll_batch(self, batch_id: str) -> dict:
+        """Return the batch, completing it once it has been polled `batch_polls` times."""
+        with self._lock:
+            batch = self.batches[batch_id]
+            batch["polls"] += 1
+            if batch["status"] != "in_progress" or batch["polls"] <= self.batch_polls:
+                return batch
+        output = "".join(
+            json.dumps(self.batch_result(json.loads(line))) + "\n"
+            for line in self.files[batch["input_file_id"]].decode().splitlines()
+            if line.strip()
+        )
+        output_file_id = self.add_file(output.encode())
+        with self._lock:
+            batch.update(status="completed", output_file_id=output_file_id)
+            return batch
+
+    def batch_result(self, request: dict) -> dict:
+        model = request["body"].get("model", "stub-model")
+        if request["url"].endswith("/responses"):
+            body = _response_object(model, self.reply, "completed", len(self.tokens()), self.cached_tokens)
+        else:
+            body = _chat_completion(model, self.reply, len(self.tokens()))
+        return {
+            "id": f"batch_req_{request['custom_id']}",
+            "custom_id": request["custom_id"],
+            "response": {"status_code": 200, "request_id": "req_stub", "body": body},
+            "error": None,
+        }
+
+    def record(self, method: str, path: str, body: Any, client_address: tuple[str, int]) -> None:
+        with self._lock:
+            self.requests.append((method, path, body))
+            self.connections.add(client_address)
+
+
+def _usage(output_tokens: int, cached_tokens: int = 0) -> dict:
+    return {
+        "input_tokens": 10,
+        "output_tokens": output_tokens,
+        "total_tokens": 10 + output_tokens,
+        "input_tokens_details": {"cached_tokens": cached_tokens},
+        "output_tokens_details": {"reasoning_tokens": 0},
+    }
+
+
+def _response_object(model: str, text: str, status: str, output_tokens: int, cached_tokens: int = 0) -> dict:
+    output = []
+    if status == "completed":
+        output = [_message_item(text, "completed")]
+    return {
+        "id": "resp_stub",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": status,
+        "output": output,
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": _usage(output_tokens, cached_tokens) if status == "completed" else None,
+    }
+
+
+def _message_item(text: str, status: str) -> dict:
+    content = [{"type": "output_text", "text": text, "annotations": []}] if text else []
+    return {
+        "type": "message",
+        "id": "msg_stub",
+        "role": "assistant",
+        "status": status,
+        "content": content,
+    }
+
+
+def _chat_completion(model: str, text: str, output_tokens: int) -> dict:
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 10,
+            "completion_tokens": output_tokens,
+            "total_tokens": 10 + output_tokens,
+        },
+    }
+
+
+def _embedding(text: str) -> list[float]:
+    """A deterministic vector: the text length and the sum of its code points."""
+    return [float(len(text)), float(sum(map(ord, text)) % 1000), 1.0]
+
+
+def _embeddings(model: str, inputs: str | list[str], encoding_format: str | None) -> dict:
+    inputs = [inputs] if isinstance(inputs, str) else inputs
+    data = []
+    for index, text in enumerate(inputs):
+        vector: Any = _embedding(text)
+        if encoding_format == "base64":
+            vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode()
+        data.append({"object": "embedding", "index": index, "embedding": vector})
+    tokens = sum(len(text.split()) for text in inputs)
+    return {
+        "object": "list",
+        "model": model,
+        "data": data,
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+def _chat_chunk(model: str, delta: dict, finish_reason: str | None = None, usage: dict | None = None) -> dict:
+    chunk = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage is not None:
+        chunk["usage"] = usage
+    return chunk
+
+
+def _file_object(file_id: str, size: int, purpose: str = "user_data") -> dict:
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": size,
+        "created_at": int(time.time()),
+        "filename": "upload",
+        "purpose": purpose,
+        "status": "processed",
+    }
+
+
+def _multipart_file(raw: bytes, content_type: str) -> bytes:
+    """Return the content of the file field of a multipart/form-data body."""
+    message = email.parser.BytesParser().parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + raw
+    )
+    for part in message.get_payload():
+        if part.get_filename() is not None:
+            return part.get_payload(decode=True)
+    return raw
+
+
+def _make_handler(server: StubOpenAIServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            # Send small event stream writes immediately, as production servers do
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            server.record("GET", self.path, None, self.client_address)
+            path = self.path.split("?")[0].rstrip("/")
+            parts = path.split("/")
+            if path.endswith("/models"):
+                self._send_json({"object": "list", "data": [{"id": "stub-model", "object": "model"}]})
+            elif len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+                self._send_bytes(server.files[parts[-2]])
+            elif len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in server.batches:
+                self._send_json(server.poll_batch(parts[-1]))
+            else:
+                self._send_json({"error": {"message": "not found"}}, status=404)
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length)
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                body = json.loads(raw or b"{}")
+            else:
+                body = raw
+            server.record("POST", self.path, body, self.client_address)
+            if server.latency:
+                time.sleep(server.latency)
+
+            path = self.path.split("?")[0].rstrip("/")
+            if path.endswith("/files"):
+                content = _multipart_file(raw, self.headers.get("Content-Type", ""))
+                file_id = server.add_file(content)
+                self._send_json(_file_object(file_id, len(content)))
+                return
+            if path.endswith("/batches"):
+                self._send_json(server.add_batch(body))
+                return
+
+            model = body.get("model", "stub-model")
+            if path.endswith("/responses"):
+                if body.get("stream"):
+                    self._stream_response(model)
+                else:
+                    text = server.reply
+                    self._send_json(_response_object(model, text, "completed", len(server.tokens()), server.cached_tokens))
+            elif path.endswith("/embeddings"):
+                self._send_json(_embeddings(model, body["input"], body.get("encoding_format")))
+            elif path.endswith("/chat/completions"):
+                if body.get("stream"):
+                    self._stream_chat_completion(model)
+                else:
+                    self._send_json(_chat_completion(model, server.reply, len(server.tokens())))
+            else:
+                self._send_json({"error": {"message": f"unknown path {self.path}"}}, status=404)
+
+        def _send_json(self, payload: dict, status: int = 200) -> None:
+            self._send_bytes(json.dumps(payload).encode(), status, "application/json")
+
+        def _send_bytes(self, data: bytes, status: int = 200, content_type: str = "application/octet-stream") -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self._send_extra_headers()
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _start_stream(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self._send_extra_headers()
+            self.end_headers()
+
+        def _send_extra_headers(self) -> None:
+            for name, value in server.headers.items():
+                self.send_header(name, value)
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _end_stream(self) -> None:
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def _stream_response(self, model: str) -> None:
+            self._start_stream()
+            sequence = 0
+
+            def event(event_type: str, **payload: Any) -> None:
+                nonlocal sequence
+                data = {"type": event_type, "sequence_number": sequence, **payload}
+                sequence += 1
+                self._write_chunk(f"event: {event_type}\ndata: {json.dumps(data)}\n\n".encode())
+
+            tokens = server.tokens()
+            event("response.created", response=_response_object(model, "", "in_progress", 0))
+            event("response.output_item.added", output_index=0, item=_message_item("", "in_progress"))
+            part = {"type": "output_text", "text": "", "annotations": []}
+            event("response.content_part.added", item_id="msg_stub", output_index=0, content_index=0, part=part)
+            for token in tokens:
+                if server.token_interval:
+                    time.sleep(server.token_interval)
+                event(
+                    "response.output_text.delta",
+                    item_id="msg_stub",
+                    output_index=0,
+                    content_index=0,
+                    delta=token,
+                    logprobs=[],
+                )
+            text = "".join(tokens)
+            event("response.output_text.done", item_id="msg_stub", output_index=0, content_index=0, text=text, logprobs=[])
+            part = {"type": "output_text", "text": text, "annotations": []}
+            event("response.content_part.done", item_id="msg_stub", output_index=0, content_index=0, part=part)
+            event("response.output_item.done", output_index=0, item=_message_item(text, "completed"))
+            completed = _response_object(model, text, "completed", len(tokens), server.cached_tokens)
+            event("response.completed", response=completed)
+            self._end_stream()
+
+        def _stream_chat_completion(self, model: str) -> None:
+            self._start_stream()
+
+            def send(chunk: dict | str) -> None:
+                data = chunk if isinstance(chunk, str) else json.dumps(chunk)
+                self._write_chunk(f"data: {data}\n\n".encode())
+
+            tokens = server.tokens()
+            send(_chat_chunk(model, {"role": "assistant", "content": ""}))
+            for token in tokens:
+                if server.token_interval:
+                    time.sleep(server.token_interval)
+                send(_chat_chunk(model, {"content": token}))
+            usage = {"prompt_tokens": 10, "completion_tokens": len(tokens), "total_tokens": 10 + len(tokens)}
+            send(_chat_chunk(model, {}, finish_reason="stop", usage=usage))
+            send("[DONE]")
+            self._end_stream()
+
+    return Handler
@@ -0,0 +1,91 @@
+"""Tests for bulk processing, against the batch endpoints of a local stub server."""
+
+import json
+
+import openai
+import pytest
+from langchain_core.messages import HumanMessage
+from src.llm_helpers.bulk import bulk_invoke
+
+REQUESTS = [[HumanMessage(content=f"Classify item {i}")] for i in range(5)]
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "positive", "batch_polls": 2}
+
+
+def _paths(server, method):
+    return [path for request_method, path, _ in server.requests if request_method == method]
+
+
+@pytest.mark.asyncio
+async def test_bulk_invoke_uses_batch_api(stub_server):
+    """Test that requests are submitted as batch jobs and answered in input order."""
+    results = [
+        result
+        async for result in bulk_invoke(
+            "openai:gpt-5.1:none", REQUESTS, poll_interval=0.01, max_batch_size=2
+        )
+    ]
+
+    assert [result.index for result in results] == list(range(5))
+    assert all(result.error is None and result.message.text == "positive" for result in results)
+    assert len(stub_server.batches) == 3
+    assert not any(path.endswith("/responses") for path in _paths(stub_server, "POST"))
+
+    first_batch = stub_server.files[stub_server.batches["batch_1"]["input_file_id"]]
+    lines = [json.loads(line) for line in first_batch.decode().splitlines()]
+    assert [line["custom_id"] for line in lines] == ["request-0", "request-1"]
+    assert lines[0]["url"] == "/v1/responses"
+    assert lines[0]["body"]["model"] == "gpt-5.1"
+    assert "stream" not in lines[0]["body"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_invoke_closes_its_default_client(stub_server, monkeypatch):
+    closed = []
+    close = openai.AsyncOpenAI.close
+
+    async def recording_close(self):
+        closed.append(self)
+        await close(self)
+
+    monkeypatch.setattr(openai.AsyncOpenAI, "close", recording_close)
+    results = bulk_invoke("openai:gpt-5.1:none", REQUESTS, poll_interval=0.01)
+    await anext(results)
+    await results.aclose()
+
+    assert len(closed) == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_invoke_resumes_recorded_jobs(stub_server, tmp_path):
+    state_path = tmp_path / "job.json"
+
+    first = [r async for r in bulk_invoke("openai:gpt-5.1:none", REQUESTS, state_path=state_path, poll_interval=0.01)]
+    second = [r async for r in bulk_invoke("openai:gpt-5.1:none", REQUESTS, state_path=state_path, poll_interval=0.01)]
+
+    assert len(stub_server.batches) == 1
+    assert [r.message.text for r in second] == [r.message.text for r in first]
+    assert json.loads(state_path.read_text())["jobs"][0]["batch_id"] == "batch_1"
+
+
+@pytest.mark.asyncio
+async def test_bulk_invoke_rejects_state_of_other_requests(stub_server, tmp_path):
+    state_path = tmp_path / "job.json"
+    [r async for r in bulk_invoke("openai:gpt-5.1:none", REQUESTS, state_path=state_path, poll_interval=0.01)]
+
+    with pytest.raises(ValueError, match="different requests"):
+        [r async for r in bulk_invoke("openai:gpt-5.1:none", REQUESTS[:2], state_path=state_path)]
+
+
+@pytest.mark.asyncio
+async def test_bulk_invoke_falls_back_to_direct_calls(stub_server):
+    """Test that providers without a batch API are called directly, in input order."""
+    results = [r async for r in bulk_invoke("groq:openai/gpt-oss-120b", REQUESTS, max_concurrency=2)]
+
+    assert [r.index for r in results] == list(range(5))
+    assert all(r.message.text == "positive" for r in results)
+    assert len(_paths(stub_server, "POST")) == 5
+    assert not stub_server.batches
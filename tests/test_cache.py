@@ -0,0 +1,95 @@
+"""Tests for the LRU cache module."""
+
+import pytest
+from src.llm_helpers.cache import LRUCache
+
+
+def test_lru_cache_get_put():
+    """Test that stored values are returned and misses return the default."""
+    cache: LRUCache[str, int] = LRUCache(maxsize=2)
+    cache.put("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("b", 0) == 0
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted first."""
+    cache: LRUCache[str, int] = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.info().evictions == 1
+
+
+def test_lru_cache_weigher_bounds_total_weight():
+    """Test that a weigher bounds the cache by total weight instead of entry count."""
+    cache: LRUCache[str, bytes] = LRUCache(maxsize=10, weigher=len)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"1")
+
+    assert "a" not in cache
+    assert cache.info().currsize == 6
+
+
+def test_lru_cache_skips_values_larger_than_maxsize():
+    """Test that a value heavier than the whole cache is not stored."""
+    cache: LRUCache[str, bytes] = LRUCache(maxsize=4, weigher=len)
+    cache.put("a", b"123")
+    cache.put("b", b"12345")
+
+    assert "a" in cache
+    assert "b" not in cache
+
+
+def test_lru_cache_info_counts_hits_and_misses():
+    """Test the hit and miss counters."""
+    cache: LRUCache[str, int] = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+
+    info = cache.info()
+    assert info.hits == 2
+    assert info.misses == 1
+    assert info.currsize == 1
+
+
+def test_lru_cache_invalidation():
+    """Test single-key, predicate-based and full invalidation."""
+    cache: LRUCache[tuple[str, int], int] = LRUCache(maxsize=10)
+    for i in range(4):
+        cache.put(("x" if i % 2 else "y", i), i)
+
+    assert cache.invalidate(("y", 0))
+    assert not cache.invalidate(("y", 0))
+    assert cache.invalidate_where(lambda key: key[0] == "x") == 2
+    assert len(cache) == 1
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.info().hits == 0
+
+
+def test_lru_cache_resize():
+    """Test that shrinking the cache evicts the oldest entries."""
+    cache: LRUCache[int, int] = LRUCache(maxsize=3)
+    for i in range(3):
+        cache.put(i, i)
+    cache.resize(1)
+
+    assert list(cache) == [2]
+
+
+def test_lru_cache_negative_maxsize():
+    """Test that a negative maxsize raises ValueError."""
+    with pytest.raises(ValueError, match="maxsize must be >= 0"):
+        LRUCache(maxsize=-1)
@@ -2,7 +2,13 @@
 
 import pytest
 from langchain_core.messages import HumanMessage, AIMessage
-from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers.get_llm import (
+    LLM_CACHE_MAXSIZE,
+    clear_llm_cache,
+    get_llm,
+    get_llm_cache_info,
+    set_llm_cache_maxsize,
+)
 from dotenv import load_dotenv
 from src.llm_helpers.const import DEFAULT_MODEL_STRINGS
 
@@ -131,4 +137,75 @@ def test_get_llm_unsupported_provider():
 def test_get_llm_invalid_format():
     """Test that invalid model string format raises ValueError."""
     with pytest.raises(ValueError, match="is not valid"):
-        get_llm(model_string="invalid_format")
\ No newline at end of file
+        get_llm(model_string="invalid_format")
+
+@pytest.fixture
+def fake_credentials(monkeypatch):
+    """Provide placeholder credentials so clients can be built without network access."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    clear_llm_cache()
+    yield monkeypatch
+    clear_llm_cache()
+
+
+def test_get_llm_cache_returns_same_client(fake_credentials):
+    """Test that get_llm(cache=True) reuses the client for the same specification."""
+    llm1, _ = get_llm(model_string="openai:gpt-5.1:none", cache=True)
+    llm2, _ = get_llm(model_string="openai:gpt-5.1:none", cache=True)
+
+    assert llm1 is llm2
+    info = get_llm_cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
+
+
+def test_get_llm_without_cache_builds_new_client(fake_credentials):
+    """Test that clients are not cached by default."""
+    llm1, _ = get_llm(model_string="openai:gpt-5.1:none")
+    llm2, _ = get_llm(model_string="openai:gpt-5.1:none")
+
+    assert llm1 is not llm2
+    assert get_llm_cache_info().currsize == 0
+
+
+def test_get_llm_cache_key_includes_spec_and_streaming(fake_credentials):
+    """Test that reasoning effort and streaming are part of the cache key."""
+    llm1, _ = get_llm(model_string="openai:gpt-5.1:none", cache=True)
+    llm2, _ = get_llm(model_string="openai:gpt-5.1:low", cache=True)
+    llm3, _ = get_llm(model_string="openai:gpt-5.1:none", streaming=False, cache=True)
+
+    assert len({id(llm1), id(llm2), id(llm3)}) == 3
+
+
+def test_get_llm_cache_key_includes_credentials(fake_credentials):
+    """Test that rotating the API key yields a new client."""
+    llm1, _ = get_llm(model_string="openai:gpt-5.1:none", cache=True)
+    fake_credentials.setenv("OPENAI_API_KEY", "rotated-key")
+    llm2, _ = get_llm(model_string="openai:gpt-5.1:none", cache=True)
+
+    assert llm1 is not llm2
+
+
+def test_clear_llm_cache_for_spec(fake_credentials):
+    """Test that clear_llm_cache only drops clients of the given specification."""
+    get_llm(model_string="openai:gpt-5.1:none", cache=True)
+    get_llm(model_string="openai:gpt-5.1:none", streaming=False, cache=True)
+    groq_llm, _ = get_llm(model_string="groq:openai/gpt-oss-120b", cache=True)
+
+    assert clear_llm_cache(model_string="openai:gpt-5.1:none") == 2
+    assert get_llm(model_string="groq:openai/gpt-oss-120b", cache=True)[0] is groq_llm
+
+
+def test_set_llm_cache_maxsize_evicts(fake_credentials):
+    """Test that the client cache is bounded."""
+    set_llm_cache_maxsize(1)
+    try:
+        get_llm(model_string="openai:gpt-5.1:none", cache=True)
+        get_llm(model_string="openai:gpt-5.1:low", cache=True)
+
+        info = get_llm_cache_info()
+        assert info.currsize == 1
+        assert info.evictions == 1
+    finally:
+        set_llm_cache_maxsize(LLM_CACHE_MAXSIZE)
@@ -0,0 +1,208 @@
+"""Tests for embedding clients, their micro-batching and the embedding cache."""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+from langchain_core.embeddings import Embeddings
+from src.llm_helpers.const import EmbeddingBatchLimits
+from src.llm_helpers.embeddings import BatchedEmbeddings, EmbeddingCache, get_embeddings
+from src.llm_helpers.tokens import count_text_tokens
+from tests.stub_server import StubOpenAIServer, _embedding
+
+
+def _inputs(server: StubOpenAIServer) -> list[list[str]]:
+    return [body["input"] for method, path, body in server.requests if path.endswith("/embeddings")]
+
+
+class RecordingEmbeddings(Embeddings):
+    """Embeds like the stub server and records every call, optionally failing it."""
+
+    def __init__(self, error: Exception | None = None):
+        self.calls = []
+        self.error = error
+
+    def embed_documents(self, texts, **kwargs):
+        self.calls.append((list(texts), kwargs))
+        if self.error is not None:
+            raise self.error
+        return [_embedding(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts, **kwargs):
+        await asyncio.sleep(0)
+        return self.embed_documents(texts, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_request(stub_server, http_clients):
+    embeddings, provider = get_embeddings(model_string="openai:text-embedding-3-small", http_clients=http_clients)
+    texts = [f"query {index}" for index in range(50)]
+
+    vectors = await asyncio.gather(*(embeddings.aembed_query(text) for text in texts))
+
+    assert provider == "openai"
+    assert vectors == [_embedding(text) for text in texts]
+    assert _inputs(stub_server) == [texts]
+
+
+@pytest.mark.asyncio
+async def test_mistral_embeddings_use_configured_endpoint(stub_server, http_clients, monkeypatch):
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+    monkeypatch.setenv("MISTRAL_BASE_URL", stub_server.base_url)
+    embeddings, provider = get_embeddings(model_string="mistralai:mistral-embed", http_clients=http_clients)
+
+    vectors = await asyncio.gather(embeddings.aembed_query("a"), embeddings.aembed_query("b"))
+
+    assert provider == "mistralai"
+    assert vectors == [_embedding("a"), _embedding("b")]
+    assert _inputs(stub_server) == [["a", "b"]]
+    # The client's own batching counts tokens like the rest of the package
+    assert [len(batch) for batch in embeddings.embeddings._get_batches(["a"] * 600)] == [512, 88]
+
+
+def test_mistral_embeddings_build_no_async_client_of_their_own(stub_server, http_clients, monkeypatch):
+    """Test that MistralAIEmbeddings does not leave an unused, unclosed async client behind."""
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+    monkeypatch.setenv("MISTRAL_BASE_URL", stub_server.base_url)
+    created = []
+    init = httpx.AsyncClient.__init__
+
+    def recording_init(self, **kwargs):
+        created.append(kwargs)
+        init(self, **kwargs)
+
+    monkeypatch.setattr(httpx.AsyncClient, "__init__", recording_init)
+
+    embeddings, _ = get_embeddings(model_string="mistralai:mistral-embed", http_clients=http_clients)
+
+    # Only the shared client, derived from the sync one MistralAIEmbeddings configured
+    client = embeddings.embeddings.client
+    assert [kwargs["base_url"] for kwargs in created] == [client.base_url]
+    assert embeddings.embeddings.async_client.headers["Authorization"] == "Bearer test-key"
+
+
+@pytest.mark.asyncio
+async def test_batches_respect_provider_limits(stub_server, http_clients):
+    embeddings, _ = get_embeddings(model_string="openai:text-embedding-3-small", http_clients=http_clients)
+    texts = [f"document number {index} " * (1 + index % 3) for index in range(10)]
+    max_tokens = 2 * max(count_text_tokens(text) for text in texts)
+
+    embeddings.limits = EmbeddingBatchLimits(max_inputs=4, max_tokens=None)
+    await embeddings.aembed_documents(texts[:5] + texts[:5])
+    assert [len(batch) for batch in _inputs(stub_server)] == [4, 1]
+
+    stub_server.requests.clear()
+    embeddings.limits = EmbeddingBatchLimits(max_inputs=100, max_tokens=max_tokens)
+    vectors = await asyncio.gather(*(embeddings.aembed_query(text) for text in texts))
+
+    batches = _inputs(stub_server)
+    assert sorted(text for batch in batches for text in batch) == sorted(texts)
+    assert all(sum(map(count_text_tokens, batch)) <= max_tokens for batch in batches)
+    assert vectors == [_embedding(text) for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_texts_in_flight_are_embedded_once():
+    inner = RecordingEmbeddings()
+    embeddings = BatchedEmbeddings(inner, "test:model", EmbeddingBatchLimits(10, None))
+
+    results = await asyncio.gather(
+        *(embeddings.aembed_query("same") for _ in range(5)),
+        embeddings.aembed_documents(["same", "other", "same"]),
+    )
+
+    assert inner.calls == [(["same", "other"], {})]
+    assert results[-1] == [_embedding("same"), _embedding("other"), _embedding("same")]
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_reach_every_caller():
+    inner = RecordingEmbeddings(error=ConnectionError("unreachable"))
+    embeddings = BatchedEmbeddings(inner, "test:model", EmbeddingBatchLimits(10, None))
+
+    results = await asyncio.gather(
+        embeddings.aembed_query("a"), embeddings.aembed_query("b"), return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [ConnectionError, ConnectionError]
+    assert len(inner.calls) == 1
+    assert embeddings._futures == {}
+
+
+@pytest.mark.asyncio
+async def test_queries_are_kept_apart_from_documents():
+    inner = RecordingEmbeddings()
+    embeddings = BatchedEmbeddings(
+        inner, "google:model", EmbeddingBatchLimits(10, None), query_kwargs={"task_type": "RETRIEVAL_QUERY"}
+    )
+
+    await asyncio.gather(embeddings.aembed_query("text"), embeddings.aembed_documents(["text"]))
+
+    assert len(inner.calls) == 2
+    assert (["text"], {}) in inner.calls and (["text"], {"task_type": "RETRIEVAL_QUERY"}) in inner.calls
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_skips_unchanged_texts(stub_server, http_clients, tmp_path):
+    texts = ["unchanged", "also unchanged"]
+    first_cache = EmbeddingCache(path=tmp_path / "embeddings.sqlite")
+    embeddings, _ = get_embeddings(
+        model_string="openai:text-embedding-3-small", http_clients=http_clients, embedding_cache=first_cache
+    )
+    expected = await embeddings.aembed_documents(texts)
+    first_cache.close()
+    stub_server.requests.clear()
+
+    # A new process re-indexing the same documents, plus one new text
+    cache = EmbeddingCache(path=tmp_path / "embeddings.sqlite")
+    embeddings, _ = get_embeddings(
+        model_string="openai:text-embedding-3-small", http_clients=http_clients, embedding_cache=cache
+    )
+    vectors = await embeddings.aembed_documents([*texts, "new"])
+
+    assert vectors == [*expected, _embedding("new")]
+    assert _inputs(stub_server) == [["new"]]
+    assert cache.info()[:3] == (0, 2, 1)
+
+    assert embeddings.embed_query("unchanged") == expected[0]
+    assert cache.info().hits == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_is_used_off_the_event_loop(monkeypatch, tmp_path):
+    cache = EmbeddingCache(path=tmp_path / "embeddings.sqlite")
+    embeddings = BatchedEmbeddings(RecordingEmbeddings(), "test:model", EmbeddingBatchLimits(10, None), cache=cache)
+    threads = []
+    for name in ("get_many", "put_many"):
+        method = getattr(cache, name)
+        monkeypatch.setattr(
+            cache, name, lambda *args, method=method: threads.append(threading.current_thread()) or method(*args)
+        )
+
+    await embeddings.aembed_documents(["a", "b"])
+
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+    cache.close()
+
+
+def test_sync_calls_are_batched_and_cached(stub_server):
+    cache = EmbeddingCache()
+    embeddings, _ = get_embeddings(model_string="openai:text-embedding-3-small", embedding_cache=cache)
+    embeddings.limits = EmbeddingBatchLimits(max_inputs=2, max_tokens=None)
+
+    assert embeddings.embed_documents(["a", "b", "c"]) == [_embedding(text) for text in "abc"]
+    assert embeddings.embed_documents(["c", "d"]) == [_embedding(text) for text in "cd"]
+    assert _inputs(stub_server) == [["a", "b"], ["c"], ["d"]]
+
+
+def test_unsupported_embedding_specs():
+    with pytest.raises(NotImplementedError):
+        get_embeddings(model_string="groq:openai/gpt-oss-120b")
+    with pytest.raises(ValueError):
+        get_embeddings(model_string="openai:text-embedding-3-small:low")
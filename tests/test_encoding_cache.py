@@ -0,0 +1,51 @@
+"""Tests for the content-addressed encoding cache."""
+
+from src.llm_helpers.encoding_cache import EncodingCache
+
+
+def test_encoding_cache_memory_hit_and_miss():
+    """Test that stored payloads are returned and counted as hits."""
+    cache = EncodingCache()
+    digest = EncodingCache.digest(b"hello")
+
+    assert cache.get(digest) is None
+    cache.put(digest, "aGVsbG8=")
+    assert cache.get(digest) == "aGVsbG8="
+
+    info = cache.info()
+    assert (info.hits, info.disk_hits, info.misses) == (1, 0, 1)
+    assert info.currsize == len("aGVsbG8=")
+
+
+def test_encoding_cache_bounded_by_bytes():
+    """Test that the in-memory tier is bounded by the total payload size."""
+    cache = EncodingCache(max_bytes=10)
+    cache.put("a", "x" * 6)
+    cache.put("b", "y" * 6)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    assert cache.info().currsize == 6
+
+
+def test_encoding_cache_disk_tier(tmp_path):
+    """Test that payloads survive in the on-disk tier and are promoted to memory."""
+    EncodingCache(directory=tmp_path).put("abcdef", "cGF5bG9hZA==")
+
+    cache = EncodingCache(directory=tmp_path)
+    assert cache.get("abcdef") == "cGF5bG9hZA=="
+    assert cache.get("abcdef") == "cGF5bG9hZA=="
+
+    info = cache.info()
+    assert (info.hits, info.disk_hits, info.misses) == (1, 1, 0)
+    assert (tmp_path / "ab" / "abcdef.b64").exists()
+
+
+def test_encoding_cache_clear_keeps_disk_tier(tmp_path):
+    """Test that clear() resets memory and statistics but keeps the disk tier."""
+    cache = EncodingCache(directory=tmp_path)
+    cache.put("abcdef", "eA==")
+    cache.clear()
+
+    assert cache.info().currsize == 0
+    assert cache.get("abcdef") == "eA=="
@@ -0,0 +1,133 @@
+"""Tests for fanning one prompt out to several models, against local stub servers."""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from src.llm_helpers.fan_out import fan_out
+
+SLOW, FAST = "openai:gpt-5.1:none", "groq:openai/gpt-oss-120b"
+
+
+@pytest.fixture
+def stub_servers(stub_server_factory):
+    slow = stub_server_factory(providers=("openai",), reply="slow answer", latency=0.5)
+    fast = stub_server_factory(providers=("groq",), reply="fast answer")
+    return slow, fast
+
+
+class FakeModel:
+    """Streams `words` with a delay before each, then optionally fails."""
+
+    def __init__(self, words, delay=0.0, error=None):
+        self.words = words
+        self.delay = delay
+        self.error = error
+        self.closed = False
+
+    async def astream(self, messages):
+        try:
+            for word in self.words:
+                await asyncio.sleep(self.delay)
+                yield AIMessageChunk(content=word)
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+
+def _patch_models(monkeypatch, models):
+    monkeypatch.setattr(
+        "src.llm_helpers.fan_out.get_llm", lambda model_string, **kwargs: (models[model_string], "openai")
+    )
+
+
+@pytest.mark.asyncio
+async def test_streams_all_models_concurrently(stub_servers, http_clients):
+    slow, fast = stub_servers
+
+    events = [event async for event in fan_out([SLOW, FAST], [HumanMessage(content="Hi")], http_clients=http_clients)]
+
+    done = [event for event in events if event.kind == "done"]
+    assert [event.model_string for event in done] == [FAST, SLOW]
+    assert [event.message.text for event in done] == ["fast answer", "slow answer"]
+    for model_string, reply in ((SLOW, "slow answer"), (FAST, "fast answer")):
+        text = "".join(event.text for event in events if event.model_string == model_string and event.kind == "text")
+        assert text == reply
+    fast_timing, slow_timing = (event.timing for event in done)
+    assert fast_timing.latency < 0.5 <= slow_timing.time_to_first_token <= slow_timing.latency
+    assert len(slow.requests) == len(fast.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_first_success_cancels_the_others(stub_servers, http_clients):
+    events = [
+        event
+        async for event in fan_out([SLOW, FAST], [HumanMessage(content="Hi")], quorum=1, http_clients=http_clients)
+    ]
+
+    assert [(event.model_string, event.kind) for event in events if event.kind not in ("text", "reasoning")] == [
+        (FAST, "done"),
+        (SLOW, "cancelled"),
+    ]
+    assert events[-1].timing.latency < 0.5
+    assert all(event.model_string == FAST for event in events[:-1])
+
+
+@pytest.mark.asyncio
+async def test_errors_do_not_count_towards_the_quorum(monkeypatch):
+    models = {
+        "a": FakeModel(["partial"], error=ConnectionError("reset")),
+        "b": FakeModel(["b"], delay=0.05),
+        "c": FakeModel(["c"], delay=0.1),
+        "d": FakeModel(["d"], delay=5),
+    }
+    _patch_models(monkeypatch, models)
+
+    events = [event async for event in fan_out(list(models), [HumanMessage(content="Hi")], quorum=2)]
+
+    assert [(event.model_string, event.kind, event.text) for event in events if event.kind != "text"] == [
+        ("a", "error", "ConnectionError: reset"),
+        ("b", "done", ""),
+        ("c", "done", ""),
+        ("d", "cancelled", ""),
+    ]
+    assert events[0] == ("a", "text", "partial", None, None)
+    assert events[-1].timing.time_to_first_token is None
+    assert models["d"].closed
+
+
+@pytest.mark.asyncio
+async def test_answers_queued_with_the_quorum_are_not_cancelled(monkeypatch):
+    models = {"a": FakeModel(["a"]), "b": FakeModel(["b"]), "c": FakeModel(["c"], delay=5)}
+    _patch_models(monkeypatch, models)
+
+    events = [event async for event in fan_out(list(models), [HumanMessage(content="Hi")], quorum=1)]
+
+    assert [(event.model_string, event.kind) for event in events if event.kind != "text"] == [
+        ("a", "done"),
+        ("b", "done"),
+        ("c", "cancelled"),
+    ]
+    assert events[-2].message.text == "b"
+    assert models["c"].closed
+
+
+@pytest.mark.asyncio
+async def test_closing_the_feed_cancels_running_streams(monkeypatch):
+    models = {"a": FakeModel(["a"]), "b": FakeModel(["b"] * 10, delay=0.05)}
+    _patch_models(monkeypatch, models)
+
+    feed = fan_out(list(models), [HumanMessage(content="Hi")])
+    assert (await anext(feed)).model_string == "a"
+    await feed.aclose()
+
+    assert models["b"].closed
+
+
+@pytest.mark.asyncio
+async def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        await anext(fan_out([SLOW, SLOW], [HumanMessage(content="Hi")]))
+    with pytest.raises(ValueError):
+        await anext(fan_out([SLOW], [HumanMessage(content="Hi")], quorum=2))
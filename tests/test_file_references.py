@@ -0,0 +1,133 @@
+"""Tests for the provider file-reference mode of file_to_message."""
+
+import time
+from io import BytesIO
+from types import SimpleNamespace
+
+import openai
+import pytest
+from fastapi import UploadFile
+from langchain_core.messages import HumanMessage
+from src.llm_helpers.file_references import FileReference, FileReferenceCache
+from src.llm_helpers.file_utils import file_to_message
+from src.llm_helpers.get_llm import get_llm
+
+
+def make_upload(content: bytes = b"%PDF-1.4 test document") -> UploadFile:
+    return UploadFile(
+        filename="doc.pdf", file=BytesIO(content), headers={"content-type": "application/pdf"}
+    )
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "a summary"}
+
+
+@pytest.mark.asyncio
+async def test_reference_mode_uploads_once(stub_server):
+    """Test that the same content is uploaded once and then referenced by its file ID."""
+    references = FileReferenceCache()
+
+    first = await file_to_message(make_upload(), "openai", mode="reference", references=references)
+    second = await file_to_message(make_upload(), "openai", mode="reference", references=references)
+
+    assert first == {"type": "input_file", "file_id": "file-1"}
+    assert second == first
+    assert len(stub_server.files) == 1
+    assert b"%PDF-1.4 test document" in stub_server.files["file-1"]
+
+
+@pytest.mark.asyncio
+async def test_reference_mode_azure(stub_server):
+    """Test the Azure reference part and that it is sent by file ID."""
+    references = FileReferenceCache()
+    part = await file_to_message(make_upload(), "azure", mode="reference", references=references)
+
+    assert part == {"type": "file", "file": {"type": "input_file", "file_id": "file-1"}}
+
+    llm, _ = get_llm(model_string="azure:gpt-5-chat", streaming=False)
+    await llm.ainvoke([HumanMessage(content=[{"type": "text", "text": "Summarize"}, part])])
+
+    _, path, body = stub_server.requests[-1]
+    assert path.endswith("/responses")
+    assert "file-1" in str(body["input"])
+    assert "file_data" not in str(body["input"])
+
+
+@pytest.mark.asyncio
+async def test_reference_mode_separate_per_provider(stub_server):
+    """Test that references are not shared between providers."""
+    references = FileReferenceCache()
+    await file_to_message(make_upload(), "openai", mode="reference", references=references)
+    await file_to_message(make_upload(), "azure", mode="reference", references=references)
+
+    assert len(stub_server.files) == 2
+
+
+@pytest.mark.asyncio
+async def test_default_upload_clients_are_closed(stub_server, monkeypatch):
+    """Test that an upload client built from the environment is closed, a given one is not."""
+    closed = []
+    close = openai.AsyncOpenAI.close
+
+    async def recording_close(self):
+        closed.append(self)
+        await close(self)
+
+    monkeypatch.setattr(openai.AsyncOpenAI, "close", recording_close)
+    await file_to_message(make_upload(), "openai", mode="reference", references=FileReferenceCache())
+    assert len(closed) == 1
+
+    client = openai.AsyncOpenAI()
+    references = FileReferenceCache()
+    await file_to_message(make_upload(), "openai", mode="reference", references=references, upload_client=client)
+    assert len(closed) == 1 and not client.is_closed()
+    await client.close()
+
+
+class FakeGoogleFiles:
+    """Stand-in for `google.genai.Client().aio.files`."""
+
+    def __init__(self):
+        self.uploads = []
+
+    async def upload(self, file, config):
+        self.uploads.append((file.read(), config))
+        return SimpleNamespace(uri=f"https://files.example/{len(self.uploads)}", state=None)
+
+
+@pytest.mark.asyncio
+async def test_reference_mode_google():
+    """Test the Google file URI part."""
+    files = FakeGoogleFiles()
+    client = SimpleNamespace(aio=SimpleNamespace(files=files))
+
+    part = await file_to_message(
+        make_upload(), "google", mode="reference", references=FileReferenceCache(), upload_client=client
+    )
+
+    assert part == {"type": "media", "file_uri": "https://files.example/1", "mime_type": "application/pdf"}
+    assert files.uploads[0][1]["mime_type"] == "application/pdf"
+
+
+def test_reference_cache_expires_google_references():
+    """Test that expired references are not returned."""
+    references = FileReferenceCache()
+    references.put("google", "digest", FileReference("uri", expires_at=time.time() - 1))
+    references.put("openai", "digest", FileReference("file-1"))
+
+    assert references.get("google", "digest") is None
+    assert references.get("openai", "digest") == FileReference("file-1")
+
+
+@pytest.mark.asyncio
+async def test_reference_mode_not_implemented_for_groq():
+    with pytest.raises(NotImplementedError, match="File upload not supported for Groq"):
+        await file_to_message(make_upload(), "groq", mode="reference")
+
+
+@pytest.mark.asyncio
+async def test_file_to_message_unsupported_mode():
+    with pytest.raises(ValueError, match="Unsupported mode: invalid"):
+        await file_to_message(make_upload(), "openai", mode="invalid")
@@ -1,10 +1,14 @@
 """Tests for file_utils module."""
 
+import asyncio
+import base64
+import time
 import pytest
 from pathlib import Path
 from fastapi import UploadFile
 from io import BytesIO
-from src.llm_helpers.file_utils import file_to_message
+from src.llm_helpers.encoding_cache import EncodingCache
+from src.llm_helpers.file_utils import FileTooLargeError, file_to_message, file_to_messages
 from src.llm_helpers.get_llm import get_llm
 from langchain_core.messages import HumanMessage
 from dotenv import load_dotenv
@@ -86,3 +90,174 @@ async def test_file_to_message_unsupported_provider():
         await file_to_message(file, "invalid")
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider", ["openai", "azure", "google"])
+@pytest.mark.parametrize("chunk_size", [1, 4, 1000, 3 * 1024])
+async def test_file_to_message_streaming_matches_read_all(provider, chunk_size):
+    """Test that streaming mode produces the same part as reading the whole file."""
+    pdf_path = get_test_pdf_path()
+    expected = await file_to_message(create_upload_file_from_pdf(pdf_path), provider)
+
+    file = create_upload_file_from_pdf(pdf_path)
+    message = await file_to_message(file, provider, streaming=True, chunk_size=chunk_size)
+
+    assert message == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 4, 5, 6, 7])
+async def test_file_to_message_streaming_padding(size):
+    """Test base64 padding for files whose size is not a multiple of 3."""
+    content = bytes(range(size))
+    file = UploadFile(filename="f.bin", file=BytesIO(content), headers={"content-type": "application/octet-stream"})
+
+    message = await file_to_message(file, "google", streaming=True, chunk_size=3)
+
+    assert message["data"] == base64.b64encode(content).decode()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_file_to_message_max_size_from_reported_size(streaming):
+    """Test that a file whose reported size exceeds max_size is rejected before reading."""
+    file = UploadFile(filename="f.bin", file=BytesIO(b"x" * 10), size=10)
+
+    with pytest.raises(FileTooLargeError, match="maximum of 5 bytes"):
+        await file_to_message(file, "openai", streaming=streaming, max_size=5)
+    assert file.file.tell() == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_file_to_message_max_size_while_reading(streaming):
+    """Test that max_size is enforced on the bytes read when the size is not reported."""
+    file = UploadFile(filename="f.bin", file=BytesIO(b"x" * 10))
+
+    with pytest.raises(FileTooLargeError):
+        await file_to_message(file, "openai", streaming=streaming, chunk_size=3, max_size=5)
+
+
+@pytest.mark.asyncio
+async def test_file_to_message_max_size_allows_smaller_files():
+    """Test that files within max_size are converted."""
+    file = UploadFile(filename="f.bin", file=BytesIO(b"x" * 5), size=5)
+
+    message = await file_to_message(file, "google", streaming=True, max_size=5)
+
+    assert message["data"] == base64.b64encode(b"x" * 5).decode()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_file_to_message_cache_skips_encoding(monkeypatch, streaming):
+    """Test that a repeated upload is served from the cache for every provider."""
+    from src.llm_helpers import file_utils
+
+    encoded = []
+    original_encode = file_utils._encode
+    monkeypatch.setattr(file_utils, "_encode", lambda data: encoded.append(data) or original_encode(data))
+
+    pdf_path = get_test_pdf_path()
+    cache = EncodingCache()
+    for provider in ["openai", "azure", "google", "openai"]:
+        message = await file_to_message(
+            create_upload_file_from_pdf(pdf_path), provider, streaming=streaming, cache=cache
+        )
+        assert message == await file_to_message(create_upload_file_from_pdf(pdf_path), provider)
+
+    assert sum(len(data) for data in encoded) == pdf_path.stat().st_size
+    info = cache.info()
+    assert (info.hits, info.misses) == (3, 1)
+
+
+@pytest.mark.asyncio
+async def test_file_to_message_cache_with_disk_tier(tmp_path):
+    """Test that the disk tier serves uploads after the in-memory tier was cleared."""
+    pdf_path = get_test_pdf_path()
+    cache = EncodingCache(directory=tmp_path)
+    first = await file_to_message(create_upload_file_from_pdf(pdf_path), "google", cache=cache)
+    cache.clear()
+
+    second = await file_to_message(create_upload_file_from_pdf(pdf_path), "google", cache=cache)
+
+    assert first == second
+    assert cache.info().disk_hits == 1
+
+
+class SlowUploadFile(UploadFile):
+    """UploadFile whose reads take a while, and that tracks concurrent readers."""
+
+    in_flight = 0
+    max_in_flight = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        SlowUploadFile.in_flight += 1
+        SlowUploadFile.max_in_flight = max(SlowUploadFile.max_in_flight, SlowUploadFile.in_flight)
+        try:
+            await asyncio.sleep(0.2)
+            return await super().read(size)
+        finally:
+            SlowUploadFile.in_flight -= 1
+
+
+def make_slow_files(count: int) -> list[UploadFile]:
+    SlowUploadFile.in_flight = SlowUploadFile.max_in_flight = 0
+    return [
+        SlowUploadFile(filename=f"{i}.txt", file=BytesIO(f"file {i}".encode()), headers={"content-type": "text/plain"})
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_file_to_messages_keeps_order_and_runs_concurrently():
+    """Test that many files take about as long as one and keep their order."""
+    files = make_slow_files(10)
+
+    start = time.perf_counter()
+    messages = await file_to_messages(files, "google", max_concurrency=10)
+    elapsed = time.perf_counter() - start
+
+    assert [base64.b64decode(m["data"]) for m in messages] == [f"file {i}".encode() for i in range(10)]
+    assert elapsed < 1.0
+    assert SlowUploadFile.max_in_flight == 10
+
+
+@pytest.mark.asyncio
+async def test_file_to_messages_respects_max_concurrency():
+    """Test that no more than max_concurrency files are read at the same time."""
+    files = make_slow_files(6)
+
+    await file_to_messages(files, "openai", max_concurrency=2)
+
+    assert SlowUploadFile.max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_file_to_messages_passes_options():
+    """Test that options are passed through to file_to_message."""
+    files = make_slow_files(2)
+
+    with pytest.raises(FileTooLargeError):
+        await file_to_messages(files, "openai", max_size=3)
+
+
+@pytest.mark.asyncio
+async def test_file_to_messages_cancels_the_rest_on_the_first_error():
+    """Test that the first error is raised as-is, without waiting for the other files."""
+    files = make_slow_files(3)
+    files.append(UploadFile(filename="big.txt", file=BytesIO(b"x" * 100), size=100, headers={"content-type": "text/plain"}))
+
+    start = time.perf_counter()
+    with pytest.raises(FileTooLargeError):
+        await file_to_messages(files, "openai", max_size=50)
+
+    assert time.perf_counter() - start < 0.2
+    assert SlowUploadFile.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_file_to_messages_validates_arguments():
+    with pytest.raises(NotImplementedError, match="Groq"):
+        await file_to_messages(make_slow_files(1), "groq")
+    with pytest.raises(ValueError, match="max_concurrency"):
+        await file_to_messages(make_slow_files(1), "openai", max_concurrency=0)
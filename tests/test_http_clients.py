@@ -0,0 +1,145 @@
+"""Tests for shared HTTP connection pools, verified against a local stub server."""
+
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage
+from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers.http_clients import (
+    HttpClients,
+    HttpPoolConfig,
+    close_shared_http_clients,
+    get_shared_http_clients,
+)
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "hello"}
+
+
+MODEL_STRINGS = [
+    "openai:gpt-5.1:none",
+    "azure:gpt-5-chat",
+    "groq:openai/gpt-oss-120b",
+    "mistralai:mistral-large-latest",
+]
+
+
+@pytest.mark.asyncio
+async def test_shared_pool_reuses_one_connection_across_providers(stub_server):
+    """Test that clients of different providers share one keep-alive connection."""
+    clients = HttpClients(HttpPoolConfig(max_connections=1))
+
+    for model_string in MODEL_STRINGS:
+        llm, _ = get_llm(model_string=model_string, streaming=False, http_clients=clients)
+        response = await llm.ainvoke([HumanMessage(content="Say hello")])
+        assert "hello" in str(response.content)
+
+    assert len(stub_server.requests) == len(MODEL_STRINGS)
+    assert len(stub_server.connections) == 1
+    await clients.aclose()
+
+
+@pytest.mark.asyncio
+async def test_shared_pool_streaming(stub_server):
+    """Test streaming through the shared pool."""
+    clients = HttpClients()
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", http_clients=clients)
+
+    chunks = [chunk async for chunk in llm.astream([HumanMessage(content="Say hello")])]
+
+    assert len(chunks) > 1
+    await clients.aclose()
+
+
+@pytest.mark.asyncio
+async def test_default_pools_open_a_connection_per_client(stub_server):
+    """Test the baseline: without shared pools every client opens its own connection."""
+    for model_string in MODEL_STRINGS[:2]:
+        llm, _ = get_llm(model_string=model_string, streaming=False)
+        await llm.ainvoke([HumanMessage(content="Say hello")])
+
+    assert len(stub_server.connections) == 2
+
+
+def test_sync_clients_share_pool(stub_server):
+    """Test that sync invocations also go through the shared pool."""
+    clients = HttpClients()
+    for model_string in MODEL_STRINGS[:2]:
+        llm, _ = get_llm(model_string=model_string, streaming=False, http_clients=clients)
+        llm.invoke([HumanMessage(content="Say hello")])
+
+    assert len(stub_server.connections) == 1
+    clients.close()
+
+
+def test_google_uses_shared_clients(monkeypatch):
+    """Test that the google-genai client is rebuilt on top of the shared httpx clients."""
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    clients = HttpClients()
+
+    llm, _ = get_llm(model_string="google:gemini-3-flash-preview:minimal", http_clients=clients)
+
+    api_client = llm.client._api_client
+    assert api_client._httpx_client is clients.client
+    assert api_client._async_httpx_client is clients.async_client
+
+
+@pytest.mark.asyncio
+async def test_close_reports_open_async_connections(stub_server):
+    """Test that close() cannot release async connections, and aclose() closes everything."""
+    clients = HttpClients()
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", streaming=False, http_clients=clients)
+    await llm.ainvoke([HumanMessage(content="Say hello")])
+
+    with pytest.warns(ResourceWarning, match="aclose"):
+        clients.close()
+    await clients.aclose()
+
+    assert clients.client.is_closed and clients.async_client.is_closed
+    assert not clients.async_transport._pool.connections
+
+
+def test_mistral_builds_no_async_client_of_its_own(stub_server, monkeypatch):
+    """Test that ChatMistralAI does not leave an unused, unclosed async client behind."""
+    clients = HttpClients()
+    created = []
+    init = httpx.AsyncClient.__init__
+
+    def recording_init(self, **kwargs):
+        created.append(kwargs)
+        init(self, **kwargs)
+
+    monkeypatch.setattr(httpx.AsyncClient, "__init__", recording_init)
+
+    llm, _ = get_llm(model_string="mistralai:mistral-large-latest", http_clients=clients)
+
+    # Only the shared client, derived from the sync one ChatMistralAI configured
+    assert [kwargs["base_url"] for kwargs in created] == [llm.client.base_url]
+    assert llm.async_client.base_url == llm.client.base_url == stub_server.base_url + "/"
+    assert llm.async_client.headers["Authorization"] == "Bearer test-key"
+    clients.close()
+
+
+@pytest.mark.asyncio
+async def test_process_wide_shared_clients(stub_server):
+    """Test that http_clients=True uses the process-wide pools."""
+    try:
+        llm, _ = get_llm(model_string="openai:gpt-5.1:none", http_clients=True)
+        assert llm.http_async_client is get_shared_http_clients().async_client
+
+        with pytest.raises(ValueError, match="different config"):
+            get_shared_http_clients(HttpPoolConfig(max_connections=1))
+    finally:
+        await close_shared_http_clients()
+
+
+def test_pool_config_applies_limits():
+    """Test that pool limits are passed to the transports."""
+    clients = HttpClients(HttpPoolConfig(max_connections=7, keepalive_expiry=5.0, timeout=3.0))
+
+    pool = clients.transport._pool
+    assert pool._max_connections == 7
+    assert pool._keepalive_expiry == 5.0
+    assert clients.client.timeout.read == 3.0
+    clients.close()
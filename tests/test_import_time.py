@@ -0,0 +1,84 @@
+"""Import-time regression tests for llm-helpers.
+
+Each test runs a fresh interpreter with ``python -X importtime`` so that modules already
+imported by the test session do not hide what the package pulls in at cold start.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+PROVIDER_PACKAGES = [
+    "langchain_openai",
+    "langchain_groq",
+    "langchain_mistralai",
+    "langchain_google_genai",
+]
+
+# Generous upper bound for `import llm_helpers` on a cold interpreter. Importing any of
+# the provider SDKs alone takes several times this long.
+IMPORT_BUDGET_US = 250_000
+
+
+def run_with_importtime(code: str) -> tuple[dict[str, int], str]:
+    """
+    Run `code` in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        Tuple of (cumulative import time in microseconds per module, stdout)
+    """
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "test-key",
+        "GROQ_API_KEY": "test-key",
+        "MISTRAL_API_KEY": "test-key",
+        "GOOGLE_API_KEY": "test-key",
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings, result.stdout
+
+
+def test_package_import_does_not_load_provider_sdks():
+    """Importing the package root must not import any provider integration."""
+    timings, _ = run_with_importtime("import src.llm_helpers")
+
+    for package in PROVIDER_PACKAGES + ["langchain_core", "fastapi", "httpx"]:
+        assert package not in timings, f"{package} is imported by `import llm_helpers`"
+
+
+def test_package_import_time_budget():
+    """Cold import of the package root stays within the import-time budget."""
+    timings, _ = run_with_importtime("import src.llm_helpers")
+
+    assert timings["src.llm_helpers"] < IMPORT_BUDGET_US
+
+
+def test_get_llm_imports_only_requested_provider():
+    """The first get_llm call for a provider imports only that provider's integration."""
+    code = (
+        "import json, sys\n"
+        "from src.llm_helpers import get_llm\n"
+        "get_llm(model_string='groq:openai/gpt-oss-120b')\n"
+        f"print(json.dumps([p for p in {PROVIDER_PACKAGES!r} if p in sys.modules]))\n"
+    )
+    _, stdout = run_with_importtime(code)
+
+    assert json.loads(stdout) == ["langchain_groq"]
@@ -0,0 +1,143 @@
+"""Tests for lazy message parts that are encoded while the request is sent."""
+
+import base64
+import gc
+import io
+import itertools
+import os
+import tracemalloc
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import UploadFile
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+from src.llm_helpers.file_utils import file_to_message
+from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers.http_clients import _SharedAsyncTransport, _SharedTransport, expand_lazy_parts
+from src.llm_helpers.lazy_parts import LazyFile, LazyFileData
+from src.llm_helpers.tokens import count_message_tokens
+from tests.stub_server import _response_object
+
+PDF_PATH = Path(__file__).parent / "data" / "32047_53837_Ergaenzende_Informationen_zu_Ihrer_Abgabe.pdf"
+
+
+class DrainTransport(httpx.AsyncBaseTransport):
+    """Consumes request bodies without keeping them and answers with a Responses API reply."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def handle_async_request(self, request):
+        async for chunk in request.stream:
+            self.sent += len(chunk)
+        return httpx.Response(200, json=_response_object("stub-model", "ok", "completed", 1))
+
+
+def _drain_llm(transport: DrainTransport) -> ChatOpenAI:
+    return ChatOpenAI(
+        model="gpt-5.1",
+        api_key="test-key",
+        output_version="responses/v1",
+        http_client=httpx.Client(transport=_SharedTransport(httpx.MockTransport(None))),
+        http_async_client=httpx.AsyncClient(transport=_SharedAsyncTransport(transport)),
+    )
+
+
+def _upload(content: bytes, filename: str = "document.pdf") -> UploadFile:
+    return UploadFile(
+        filename=filename, file=io.BytesIO(content), size=len(content), headers={"content-type": "application/pdf"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_lazy_part_arrives_encoded(stub_server, http_clients):
+    content = os.urandom(100_000)
+    llm, provider = get_llm(model_string="openai:gpt-5.1:none", streaming=False, http_clients=http_clients)
+    part = await file_to_message(_upload(content), provider, mode="lazy", chunk_size=3000, llm=llm)
+
+    await llm.ainvoke([HumanMessage(content=[{"type": "text", "text": "Summarize"}, part])])
+
+    assert isinstance(part["file_data"], LazyFileData)
+    [(_, _, body)] = stub_server.requests
+    file_data = body["input"][0]["content"][1]["file_data"]
+    assert file_data == f"data:application/pdf;base64,{base64.b64encode(content).decode()}"
+
+
+@pytest.mark.asyncio
+async def test_lazy_part_peak_memory_stays_below_file_size():
+    size = 8 * 1024 * 1024
+    content = os.urandom(size)
+    transport = DrainTransport()
+    llm = _drain_llm(transport)
+    # The first call imports and builds the SDK's response models; keep them out of the peak
+    await llm.ainvoke([HumanMessage(content="Hi")])
+
+    gc.collect()
+    tracemalloc.start()
+    # A few chunks can be in flight at once; keep them small next to the file
+    chunk_size = 3 * 64 * 1024
+    part = await file_to_message(_upload(content), "openai", mode="lazy", chunk_size=chunk_size, llm=llm)
+    await llm.ainvoke([HumanMessage(content=[part])])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert transport.sent > size * 4 / 3
+    assert peak < size / 2
+
+
+def test_requests_without_lazy_parts_are_unchanged():
+    plain = httpx.Request("POST", "http://test", json={"text": "llm-helpers-lazy:" + "0" * 32})
+
+    assert expand_lazy_parts(plain) is plain
+
+
+def test_concurrent_sends_of_one_file_read_their_own_chunks():
+    content = os.urandom(3000)
+    lazy_file = LazyFile(io.BytesIO(content), chunk_size=300)
+    request = httpx.Request("POST", "http://test", json={"file_data": LazyFileData("", lazy_file)})
+    expected = request.content.replace(lazy_file.placeholder.encode(), base64.b64encode(content))
+
+    first, second = expand_lazy_parts(request), expand_lazy_parts(request)
+    bodies = ([], [])
+    for chunks in itertools.zip_longest(first.stream, second.stream):
+        for body, chunk in zip(bodies, chunks):
+            if chunk is not None:
+                body.append(chunk)
+
+    assert [b"".join(body) for body in bodies] == [expected, expected]
+    assert first.headers["Content-Length"] == str(len(expected))
+
+
+@pytest.mark.asyncio
+async def test_lazy_mode_is_not_supported_for_google():
+    with pytest.raises(NotImplementedError):
+        await file_to_message(_upload(b"%PDF"), "google", mode="lazy")
+
+
+@pytest.mark.asyncio
+async def test_lazy_mode_needs_a_client_that_expands_the_parts(stub_server):
+    llm, provider = get_llm(model_string="openai:gpt-5.1:none")
+
+    for lazy_llm in (None, llm):
+        with pytest.raises(ValueError, match="http_clients"):
+            await file_to_message(_upload(b"%PDF"), provider, mode="lazy", llm=lazy_llm)
+
+
+@pytest.mark.asyncio
+async def test_lazy_parts_are_counted():
+    part = await file_to_message(
+        _upload(PDF_PATH.read_bytes()), "openai", mode="lazy", llm=_drain_llm(DrainTransport())
+    )
+
+    assert count_message_tokens(HumanMessage(content=[part])) == 4 + 1500
+
+
+def test_lazy_parts_are_counted_without_reading_the_file():
+    source = io.BytesIO(bytes(250 * 1024))
+    source.read = None
+    data = LazyFileData("data:application/pdf;base64,", LazyFile(source))
+    part = {"type": "file", "file": {"filename": "document.pdf", "file_data": data}}
+
+    assert count_message_tokens(HumanMessage(content=[part])) == 4 + 3 * 1500
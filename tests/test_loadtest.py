@@ -0,0 +1,117 @@
+"""Tests for load tests and the `llm-helpers bench` command, against a local stub server."""
+
+import json
+import os
+
+import pytest
+from langchain_core.messages import HumanMessage
+from src.llm_helpers.cli import BASE_URL_ENV_VARS, main
+from src.llm_helpers.get_llm import clear_llm_cache
+from src.llm_helpers.loadtest import Percentiles, _error_name, load_test
+from tests.stub_server import StubOpenAIServer
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "one two three four", "latency": 0.01}
+
+
+@pytest.mark.asyncio
+async def test_load_test_measures_streamed_requests(stub_server, http_clients):
+    result = await load_test(
+        "openai:gpt-5.1:none",
+        [HumanMessage(content="Count")],
+        concurrency=4,
+        duration=10,
+        max_requests=12,
+        http_clients=http_clients,
+    )
+
+    assert result.requests == 12
+    assert result.errors == {}
+    assert len(stub_server.connections) <= 4
+    assert 0.01 <= result.time_to_first_token.p50 <= result.latency.p50 <= result.latency.p99
+    assert result.output_tokens_per_second.p50 > 0
+    assert result.output_token_throughput > 0
+
+
+@pytest.mark.asyncio
+async def test_load_test_stops_after_duration(stub_server, http_clients):
+    result = await load_test(
+        "openai:gpt-5.1:none", [HumanMessage(content="Count")], concurrency=2, duration=0.2, streaming=False, http_clients=http_clients
+    )
+
+    assert result.requests >= 2
+    assert result.duration < 1
+    assert result.time_to_first_token is None
+
+
+def test_percentiles_use_nearest_rank():
+    assert Percentiles.of(list(range(1, 101))) == Percentiles(50, 95, 99)
+    assert Percentiles.of([3.0]) == Percentiles(3.0, 3.0, 3.0)
+    assert Percentiles.of([]) is None
+
+
+def test_error_names_include_http_status():
+    class RateLimitError(Exception):
+        status_code = 429
+
+    assert _error_name(RateLimitError()) == "RateLimitError 429"
+    assert _error_name(TimeoutError()) == "TimeoutError"
+
+
+@pytest.fixture
+def base_url_env(monkeypatch):
+    # `--base-url` sets these; register them so they are restored afterwards
+    for url_var, key_var in BASE_URL_ENV_VARS.values():
+        monkeypatch.setenv(url_var, "")
+        monkeypatch.delenv(key_var, raising=False)
+
+
+def test_bench_command_against_stub(base_url_env, tmp_path, capsys):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("Summarize the attachment")
+    attachment = tmp_path / "notes.pdf"
+    attachment.write_bytes(b"%PDF-1.4")
+
+    with StubOpenAIServer(reply="ok") as server:
+        args = ["bench", "openai:gpt-5.1:none", "--prompt", str(prompt), "--attach", str(attachment)]
+        exit_code = main([*args, "--concurrency", "2", "--max-requests", "4", "--base-url", server.base_url, "--json"])
+    clear_llm_cache()
+
+    [result] = json.loads(capsys.readouterr().out)
+    assert exit_code == 0
+    assert result["requests"] == 4
+    assert result["latency"]["p50"] > 0
+    bodies = [body for method, path, body in server.requests if path.endswith("/responses")]
+    # One unmeasured request after the warmup, then the measured ones
+    assert len(bodies) == 5
+    assert bodies[0]["input"][0]["content"][1]["filename"] == "notes.pdf"
+
+
+def test_bench_command_reports_unsupported_attachments(tmp_path, capsys):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("Hi")
+
+    with pytest.raises(SystemExit):
+        main(["bench", "groq:openai/gpt-oss-120b", "--prompt", str(prompt), "--attach", str(prompt)])
+
+    assert "not supported for Groq" in capsys.readouterr().err
+
+
+def test_bench_command_strips_the_groq_path_from_the_base_url(base_url_env, tmp_path, capsys):
+    prompt = tmp_path / "prompt.txt"
+    prompt.write_text("Hi")
+    args = ["bench", "groq:openai/gpt-oss-120b", "--prompt", str(prompt), "--no-warmup", "--max-requests", "1"]
+
+    with StubOpenAIServer(reply="ok") as server:
+        with pytest.raises(SystemExit):
+            main([*args, "--base-url", server.base_url])
+        assert "must end in /openai/v1" in capsys.readouterr().err
+
+        assert main([*args, "--base-url", f"{server.url}/openai/v1", "--json"]) == 0
+    clear_llm_cache()
+
+    assert os.environ["GROQ_API_BASE"] == server.url
+    assert os.environ["OPENAI_BASE_URL"] == ""
+    assert [path for _, path, _ in server.requests] == ["/openai/v1/chat/completions"]
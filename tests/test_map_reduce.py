@@ -0,0 +1,197 @@
+"""Tests for splitting documents and map-reduce over their chunks, against a local stub server."""
+
+import io
+import json
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+from pypdf import PdfReader, PdfWriter
+from src.llm_helpers import state_file
+from src.llm_helpers.map_reduce import DocumentChunk, map_reduce, split_document
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "partial", "latency": 0.2}
+
+
+def _pdf(pages: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def _text_chunks(count: int) -> list[DocumentChunk]:
+    return [DocumentChunk(index, f"Section {index}", "text/plain") for index in range(count)]
+
+
+def test_split_pdf_into_page_ranges():
+    chunks = split_document(_pdf(7), "application/pdf", pages_per_chunk=3)
+
+    assert [chunk.pages for chunk in chunks] == [(1, 3), (4, 6), (7, 7)]
+    assert [len(PdfReader(io.BytesIO(chunk.content)).pages) for chunk in chunks] == [3, 3, 1]
+    assert [chunk.label for chunk in chunks] == ["Pages 1-3", "Pages 4-6", "Page 7"]
+
+
+def test_split_pdf_by_size():
+    one_page = len(_pdf(1))
+
+    chunks = split_document(_pdf(4), "application/pdf", pages_per_chunk=4, max_chunk_bytes=one_page + 100)
+
+    assert [chunk.pages for chunk in chunks] == [(1, 1), (2, 2), (3, 3), (4, 4)]
+
+
+def test_split_text_at_paragraphs():
+    text = "First paragraph.\n\nSecond paragraph, a bit longer.\n\nThird."
+
+    chunks = split_document(text.encode(), "text/markdown", max_chunk_chars=35)
+
+    assert [chunk.content for chunk in chunks] == [
+        "First paragraph.\n\n",
+        "Second paragraph, a bit longer.\n\n",
+        "Third.",
+    ]
+    assert "".join(chunk.content for chunk in chunks) == text
+
+
+def test_split_rejects_other_types():
+    with pytest.raises(ValueError):
+        split_document(b"\x89PNG", "image/png")
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_answers_chunks_concurrently(stub_server, http_clients):
+    chunks = split_document(_pdf(8), "application/pdf", pages_per_chunk=2)
+
+    results = [
+        result
+        async for result in map_reduce(
+            "openai:gpt-5.1:none", chunks, "Summarize", "Combine", max_concurrency=4, http_clients=http_clients
+        )
+    ]
+
+    assert [result.stage for result in results] == ["map"] * 4 + ["reduce"]
+    assert sorted(result.index for result in results[:4]) == [0, 1, 2, 3]
+    assert all(result.message.text == "partial" and not result.cached for result in results)
+    # All four chunks were in flight at once, each on its own connection
+    assert len(stub_server.connections) == 4
+
+    bodies = [body for method, path, body in stub_server.requests if path.endswith("/responses")]
+    assert bodies[0]["input"][0]["content"][1]["type"] == "input_file"
+    reduce_input = bodies[-1]["input"][0]["content"]
+    assert reduce_input.startswith("Combine") and "Pages 7-8:\npartial" in reduce_input
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_resumes_from_state(stub_server, http_clients, tmp_path):
+    state_path = tmp_path / "state.json"
+    chunks = _text_chunks(4)
+    args = ("openai:gpt-5.1:none", chunks, "Summarize", "Combine")
+
+    # Interrupt the first run after two answers
+    first_run = map_reduce(*args, max_concurrency=1, state_path=state_path, http_clients=http_clients)
+    assert [(await anext(first_run)).index for _ in range(2)] == [0, 1]
+    await first_run.aclose()
+    stub_server.requests.clear()
+
+    results = [
+        result
+        async for result in map_reduce(*args, max_concurrency=1, state_path=state_path, http_clients=http_clients)
+    ]
+
+    assert [(result.index, result.cached) for result in results] == [
+        (0, True),
+        (1, True),
+        (2, False),
+        (3, False),
+        (None, False),
+    ]
+    assert len(stub_server.requests) == 3
+
+    # A finished run is answered from the state file only
+    stub_server.requests.clear()
+    results = [result async for result in map_reduce(*args, state_path=state_path, http_clients=http_clients)]
+
+    assert all(result.cached for result in results)
+    assert stub_server.requests == []
+    with pytest.raises(ValueError):
+        await anext(map_reduce(*args[:2], "Other prompt", "Combine", state_path=state_path))
+
+
+class FlakyModel:
+    """Fails every chunk listed in `failing`, answers everything else."""
+
+    def __init__(self, failing):
+        self.failing = failing
+        self.calls = []
+
+    async def ainvoke(self, messages):
+        text = messages[0].text
+        self.calls.append(text)
+        if any(section in text for section in self.failing):
+            raise ConnectionError("unreachable")
+        return AIMessage(content=f"answer to {text}")
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_retries_failed_chunks(monkeypatch, tmp_path):
+    model = FlakyModel(failing=["Section 1"])
+    monkeypatch.setattr("src.llm_helpers.map_reduce.get_llm", lambda **kwargs: (model, "openai"))
+    args = ("openai:gpt-5.1:none", _text_chunks(3), "Summarize", "Combine")
+
+    results = [result async for result in map_reduce(*args, state_path=tmp_path / "state.json")]
+
+    assert [result.index for result in results if result.stage == "map" and result.error] == [1]
+    assert results[-1] == ("reduce", None, None, "1 of 3 chunks failed; call again to retry them", False)
+
+    model.failing, model.calls = [], []
+    results = [result async for result in map_reduce(*args, state_path=tmp_path / "state.json")]
+
+    assert len(model.calls) == 2  # the failed chunk and the reduce step
+    assert results[-1].message.text.startswith("answer to Combine")
+    assert "Part 2:\nanswer to Summarize" in model.calls[-1]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_throttles_state_writes(monkeypatch, tmp_path):
+    model = FlakyModel(failing=[])
+    monkeypatch.setattr("src.llm_helpers.map_reduce.get_llm", lambda **kwargs: (model, "openai"))
+    writes = []
+    write = state_file._write
+    monkeypatch.setattr("src.llm_helpers.state_file._write", lambda *args: writes.append(1) or write(*args))
+    args = ("openai:gpt-5.1:none", _text_chunks(20), "Summarize", "Combine")
+
+    results = [result async for result in map_reduce(*args, state_path=tmp_path / "state.json")]
+
+    # The first answer, the rest of the map step at its end, and the reduce result
+    assert len(writes) == 3
+    assert len(json.loads((tmp_path / "state.json").read_text())["map"]) == 20
+    assert results[-1].message is not None
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_encodes_only_unanswered_chunks_off_the_loop(monkeypatch, tmp_path):
+    monkeypatch.setattr("src.llm_helpers.map_reduce.get_llm", lambda **kwargs: (FlakyModel([]), "openai"))
+    chunks = [DocumentChunk(index, _pdf(1), "application/pdf", (index + 1,) * 2) for index in range(3)]
+    args = ("openai:gpt-5.1:none", chunks, "Summarize", "Combine")
+    first_run = map_reduce(*args, max_concurrency=1, state_path=tmp_path / "state.json")
+    await anext(first_run)
+    await first_run.aclose()
+
+    encoded = []
+    message_part = DocumentChunk.message_part
+    loop_thread = threading.get_ident()
+
+    def spy(self, model_provider):
+        encoded.append((self.index, threading.get_ident() != loop_thread))
+        return message_part(self, model_provider)
+
+    monkeypatch.setattr(DocumentChunk, "message_part", spy)
+    results = [result async for result in map_reduce(*args, state_path=tmp_path / "state.json")]
+
+    assert results[-1].message is not None
+    assert sorted(encoded) == [(1, True), (2, True)]
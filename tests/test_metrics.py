@@ -0,0 +1,116 @@
+"""Tests for client metrics, measured against a local stub server."""
+
+import pytest
+from langchain_core.messages import HumanMessage
+from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers.metrics import Histogram, Labels, LLMMetrics, MetricsCallbackHandler, get_llm_metrics
+
+LABELS = Labels("openai", "gpt-5.1", "none")
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "one two three four", "latency": 0.05, "token_interval": 0.01}
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram("h", "test", "s", (1, 2))
+    for value in (0.5, 1, 1.5, 5):
+        histogram.observe(LABELS, value)
+
+    snapshot = histogram.snapshot()[LABELS]
+
+    assert snapshot.buckets == (2, 3, 4)
+    assert snapshot.sum == 8
+    assert snapshot.count == 4
+
+
+@pytest.mark.asyncio
+async def test_streaming_call_records_latency_and_tokens(stub_server, http_clients):
+    metrics = LLMMetrics()
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", http_clients=http_clients, metrics=metrics)
+
+    [chunk async for chunk in llm.astream([HumanMessage(content="Count")])]
+
+    duration = metrics.duration.snapshot()[LABELS]
+    ttft = metrics.time_to_first_token.snapshot()[LABELS]
+    assert duration.count == ttft.count == 1
+    assert 0.05 <= ttft.sum < duration.sum
+    assert metrics.input_tokens.snapshot()[LABELS].sum == 10
+    assert metrics.output_tokens.snapshot()[LABELS].sum == 4
+    assert metrics.output_tokens_per_second.snapshot()[LABELS].count == 1
+    assert metrics.requests.snapshot() == {LABELS: 1}
+
+
+@pytest.mark.asyncio
+async def test_invoke_has_no_time_to_first_token(stub_server, http_clients):
+    metrics = LLMMetrics()
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", streaming=False, http_clients=http_clients, metrics=metrics)
+
+    await llm.ainvoke([HumanMessage(content="Count")])
+
+    assert metrics.duration.snapshot()[LABELS].count == 1
+    assert metrics.time_to_first_token.snapshot() == {}
+
+
+def test_errors_and_retries_are_counted():
+    metrics = LLMMetrics()
+    handler = MetricsCallbackHandler(metrics, "groq", "openai/gpt-oss-120b", None)
+    labels = Labels("groq", "openai/gpt-oss-120b", "")
+
+    handler.on_chat_model_start({}, [], run_id=1)
+    handler.on_retry(None, run_id=1)
+    handler.on_llm_error(RuntimeError("boom"), run_id=1)
+
+    assert metrics.errors.snapshot() == {labels: 1}
+    assert metrics.retries.snapshot() == {labels: 1}
+    assert metrics.duration.snapshot() == {}
+
+
+def test_metrics_disabled_attaches_nothing(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none")
+    with_metrics, _ = get_llm(model_string="openai:gpt-5.1:none", metrics=True)
+
+    assert not llm.callbacks
+    [handler] = with_metrics.callbacks
+    assert handler.metrics is get_llm_metrics()
+
+
+def test_render_prometheus():
+    metrics = LLMMetrics()
+    metrics.duration.observe(LABELS, 0.3)
+    metrics.errors.inc(LABELS)
+
+    text = metrics.render_prometheus()
+
+    labels = 'provider="openai",model="gpt-5.1",reasoning_effort="none"'
+    assert "# TYPE llm_request_duration_seconds histogram" in text
+    assert f'llm_request_duration_seconds_bucket{{{labels},le="0.25"}} 0' in text
+    assert f'llm_request_duration_seconds_bucket{{{labels},le="0.5"}} 1' in text
+    assert f'llm_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f"llm_request_duration_seconds_count{{{labels}}} 1" in text
+    assert f"llm_errors_total{{{labels}}} 1" in text
+
+
+def test_opentelemetry_export():
+    sdk_metrics = pytest.importorskip("opentelemetry.sdk.metrics")
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+    reader = InMemoryMetricReader()
+    metrics = LLMMetrics()
+    metrics.enable_opentelemetry(sdk_metrics.MeterProvider(metric_readers=[reader]))
+
+    metrics.duration.observe(LABELS, 0.3)
+    metrics.requests.inc(LABELS)
+
+    exported = {
+        metric.name: metric.data.data_points[0]
+        for resource in reader.get_metrics_data().resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    }
+    assert exported["llm_request_duration_seconds"].sum == pytest.approx(0.3)
+    assert exported["llm_request_duration_seconds"].attributes == LABELS._asdict()
+    assert exported["llm_requests_total"].value == 1
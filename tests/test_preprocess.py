@@ -0,0 +1,195 @@
+"""Tests for the image and PDF preprocessing stage."""
+
+import base64
+import io
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+from src.llm_helpers.encoding_cache import EncodingCache
+from src.llm_helpers.file_utils import file_to_message
+from src.llm_helpers.preprocess import (
+    PreprocessOptions,
+    preprocess_content,
+    preprocessed_content_type,
+)
+
+Image = pytest.importorskip("PIL.Image")
+pypdf = pytest.importorskip("pypdf")
+
+
+def make_image(size=(4000, 3000), mode="RGB", fmt="JPEG", orientation: int | None = None) -> bytes:
+    image = Image.new(mode, size, "red" if mode == "RGB" else (255, 0, 0, 128))
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"  # Make
+    if orientation is not None:
+        exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, format=fmt, exif=exif.tobytes())
+    return output.getvalue()
+
+
+def make_pdf(pages: int) -> bytes:
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    writer.add_metadata({"/Author": "Someone"})
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_preprocess_downscales_and_recompresses_images():
+    """Test that images are fit into max_edge, re-encoded and stripped of metadata."""
+    content = make_image()
+
+    result = preprocess_content(content, "image/jpeg", PreprocessOptions(max_edge=1024, quality=70))
+
+    with Image.open(io.BytesIO(result)) as image:
+        assert image.size == (1024, 768)
+        assert image.format == "JPEG"
+        assert not image.getexif()
+    assert len(result) < len(content)
+
+
+def test_preprocess_never_upscales():
+    """Test that small images keep their resolution."""
+    result = preprocess_content(make_image(size=(100, 50)), "image/jpeg", PreprocessOptions(max_edge=1024))
+
+    with Image.open(io.BytesIO(result)) as image:
+        assert image.size == (100, 50)
+
+
+def test_preprocess_applies_exif_orientation():
+    """Test that the EXIF orientation is applied before the EXIF data is dropped."""
+    content = make_image(size=(400, 200), orientation=6)  # rotated 90 degrees
+
+    result = preprocess_content(content, "image/jpeg", PreprocessOptions(max_edge=None))
+
+    with Image.open(io.BytesIO(result)) as image:
+        assert image.size == (200, 400)
+
+
+def test_preprocess_keeps_metadata_if_requested():
+    content = make_image(size=(100, 100))
+
+    result = preprocess_content(content, "image/jpeg", PreprocessOptions(strip_metadata=False))
+
+    with Image.open(io.BytesIO(result)) as image:
+        assert image.getexif()[0x010F] == "PhoneMaker"
+
+
+def test_preprocess_kept_metadata_does_not_rotate_again():
+    content = make_image(size=(400, 200), orientation=6)
+
+    result = preprocess_content(content, "image/jpeg", PreprocessOptions(max_edge=None, strip_metadata=False))
+
+    with Image.open(io.BytesIO(result)) as image:
+        assert image.size == (200, 400)
+        assert image.getexif()[0x010F] == "PhoneMaker"
+        assert image.getexif().get(0x0112, 1) == 1
+
+
+def test_preprocess_flattens_transparency_for_jpeg():
+    """Test that transparent PNGs can be converted to JPEG."""
+    content = make_image(size=(100, 100), mode="RGBA", fmt="PNG")
+
+    result = preprocess_content(content, "image/png", PreprocessOptions())
+
+    with Image.open(io.BytesIO(result)) as image:
+        assert image.format == "JPEG"
+        assert image.mode == "RGB"
+
+
+def test_preprocess_png_output():
+    options = PreprocessOptions(image_format="PNG")
+    result = preprocess_content(make_image(size=(100, 100)), "image/jpeg", options)
+
+    assert result.startswith(b"\x89PNG")
+    assert preprocessed_content_type("image/jpeg", options) == "image/png"
+
+
+def test_preprocess_selects_pdf_pages():
+    """Test that PDFs are cut to the page range and lose their metadata."""
+    result = preprocess_content(make_pdf(10), "application/pdf", PreprocessOptions(pdf_pages=(2, 4)))
+
+    reader = pypdf.PdfReader(io.BytesIO(result))
+    assert len(reader.pages) == 3
+    assert not (reader.metadata or {}).get("/Author")
+
+
+def test_preprocess_rejects_pdf_pages_after_the_last_page():
+    result = preprocess_content(make_pdf(3), "application/pdf", PreprocessOptions(pdf_pages=(2, 10)))
+    assert len(pypdf.PdfReader(io.BytesIO(result)).pages) == 2
+
+    with pytest.raises(ValueError, match="after the last page"):
+        preprocess_content(make_pdf(3), "application/pdf", PreprocessOptions(pdf_pages=(4, 5)))
+
+
+def test_preprocess_leaves_other_content_unchanged():
+    content = make_pdf(3)
+    assert preprocess_content(content, "application/pdf", PreprocessOptions()) == content
+    assert preprocess_content(b"text", "text/plain", PreprocessOptions()) == b"text"
+    assert preprocessed_content_type("text/plain", PreprocessOptions()) == "text/plain"
+
+
+def test_preprocess_options_validation():
+    with pytest.raises(ValueError, match="Unsupported image format"):
+        PreprocessOptions(image_format="BMP")
+    with pytest.raises(ValueError, match="Invalid PDF page range"):
+        PreprocessOptions(pdf_pages=(3, 1))
+
+
+def make_upload(content: bytes, content_type: str) -> UploadFile:
+    return UploadFile(filename="upload", file=BytesIO(content), headers={"content-type": content_type})
+
+
+@pytest.mark.asyncio
+async def test_file_to_message_preprocess_defaults_per_provider():
+    """Test that preprocess=True uses the provider's default options."""
+    content = make_image()
+
+    openai_part = await file_to_message(make_upload(content, "image/png"), "openai", preprocess=True)
+    google_part = await file_to_message(make_upload(content, "image/png"), "google", preprocess=True)
+
+    prefix = "data:image/jpeg;base64,"
+    assert openai_part["file_data"].startswith(prefix)
+    openai_image = Image.open(io.BytesIO(base64.b64decode(openai_part["file_data"].removeprefix(prefix))))
+    google_image = Image.open(io.BytesIO(base64.b64decode(google_part["data"])))
+    assert max(openai_image.size) == 2048
+    assert max(google_image.size) == 3072
+    assert google_part["mime_type"] == "image/jpeg"
+
+
+@pytest.mark.asyncio
+async def test_file_to_message_preprocess_mapping():
+    """Test that a mapping selects options per provider and skips missing providers."""
+    content = make_pdf(5)
+    options = {"google": PreprocessOptions(pdf_pages=(1, 1))}
+
+    google_part = await file_to_message(make_upload(content, "application/pdf"), "google", preprocess=options)
+    openai_part = await file_to_message(make_upload(content, "application/pdf"), "openai", preprocess=options)
+
+    assert len(pypdf.PdfReader(io.BytesIO(base64.b64decode(google_part["data"]))).pages) == 1
+    assert openai_part["file_data"].endswith(base64.b64encode(content).decode())
+
+
+@pytest.mark.asyncio
+async def test_file_to_message_preprocess_cache_key_includes_options():
+    """Test that cached payloads are not shared between different preprocessing options."""
+    content = make_image(size=(1000, 1000))
+    cache = EncodingCache()
+
+    small = await file_to_message(
+        make_upload(content, "image/jpeg"), "google", cache=cache, preprocess=PreprocessOptions(max_edge=100)
+    )
+    large = await file_to_message(
+        make_upload(content, "image/jpeg"), "google", cache=cache, preprocess=PreprocessOptions(max_edge=500)
+    )
+    again = await file_to_message(
+        make_upload(content, "image/jpeg"), "google", cache=cache, preprocess=PreprocessOptions(max_edge=100)
+    )
+
+    assert small != large
+    assert again == small
+    assert (cache.info().hits, cache.info().misses) == (1, 2)
@@ -0,0 +1,167 @@
+"""Tests for provider-side prompt caching."""
+
+import asyncio
+import base64
+import datetime
+import gc
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+from langchain_core.messages import HumanMessage
+from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers import prompt_cache
+from src.llm_helpers.metrics import Labels, LLMMetrics
+from src.llm_helpers.prompt_cache import GoogleContextCache, PromptCache
+
+DOCUMENT = {"type": "file", "source_type": "base64", "mime_type": "application/pdf", "data": base64.b64encode(b"%PDF").decode()}
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "cached answer", "cached_tokens": 8}
+
+
+class FakeCaches:
+    """The part of `client.aio.caches` used by `GoogleContextCache`."""
+
+    def __init__(self):
+        self.created, self.updated, self.deleted = [], [], []
+        self.missing = set()
+
+    async def create(self, model, config):
+        name = f"cachedContents/{len(self.created) + 1}"
+        self.created.append((model, config))
+        return self._cached(name, config.ttl)
+
+    async def update(self, name, config):
+        if name in self.missing:
+            raise errors.ClientError(404, {"error": {"message": "not found", "status": "NOT_FOUND"}})
+        self.updated.append(name)
+        return self._cached(name, config.ttl)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+    @staticmethod
+    def _cached(name, ttl):
+        expire_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=int(ttl[:-1]))
+        return SimpleNamespace(name=name, expire_time=expire_time)
+
+
+@pytest.fixture
+def caches():
+    return FakeCaches()
+
+
+@pytest.fixture
+def context_caches(caches):
+    return GoogleContextCache("google:gemini-2.5-flash", ttl=600, client=SimpleNamespace(aio=SimpleNamespace(caches=caches)))
+
+
+@pytest.mark.asyncio
+async def test_openai_requests_carry_cache_key_and_retention(stub_server, http_clients):
+    prompt_cache = PromptCache(key="support-v1", retention="24h")
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", http_clients=http_clients, prompt_cache=prompt_cache)
+
+    [chunk async for chunk in llm.astream([HumanMessage(content="Hi")])]
+
+    [(_, path, body)] = stub_server.requests
+    assert path.endswith("/responses")
+    assert body["prompt_cache_key"] == "support-v1"
+    assert body["prompt_cache_retention"] == "24h"
+
+
+@pytest.mark.asyncio
+async def test_metrics_report_cache_hit_rate(stub_server, http_clients):
+    metrics = LLMMetrics()
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", http_clients=http_clients, metrics=metrics)
+
+    await llm.ainvoke([HumanMessage(content="Hi")])
+
+    labels = Labels("openai", "gpt-5.1", "none")
+    assert metrics.cached_input_tokens.snapshot() == {labels: 8}
+    assert metrics.cache_hit_rates() == {labels: 0.8}
+
+
+def test_model_params_per_provider():
+    prompt_cache = PromptCache(key="k")
+
+    assert prompt_cache.model_params("openai") == {"model_kwargs": {"prompt_cache_key": "k"}}
+    assert prompt_cache.model_params("groq") == {}
+    assert PromptCache(cached_content="cachedContents/1").model_params("google") == {"cached_content": "cachedContents/1"}
+    with pytest.raises(ValueError, match="only supported for Google"):
+        PromptCache(cached_content="cachedContents/1").model_params("azure")
+
+
+def test_google_client_uses_cached_content(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+
+    llm, _ = get_llm(model_string="google:gemini-2.5-flash", prompt_cache=PromptCache(cached_content="cachedContents/1"))
+
+    assert llm.cached_content == "cachedContents/1"
+
+
+@pytest.mark.asyncio
+async def test_context_cache_is_created_once_per_document(context_caches, caches):
+    first = await context_caches.get([DOCUMENT], system_instruction="Answer from the document")
+    second = await context_caches.get([DOCUMENT], system_instruction="Answer from the document")
+    other = await context_caches.get([DOCUMENT])
+
+    assert first == second == PromptCache(cached_content="cachedContents/1")
+    assert other == PromptCache(cached_content="cachedContents/2")
+    model, config = caches.created[0]
+    assert model == "gemini-2.5-flash"
+    assert config.ttl == "600s"
+    assert config.contents[0].parts[0].inline_data.data == b"%PDF"
+
+
+@pytest.mark.asyncio
+async def test_context_cache_locks_are_released(context_caches, caches):
+    """Test that concurrent calls share one creation and leave no lock behind."""
+    first, second = await asyncio.gather(context_caches.get([DOCUMENT]), context_caches.get([DOCUMENT]))
+
+    assert first == second
+    assert len(caches.created) == 1
+    gc.collect()
+    assert not context_caches._locks
+
+
+@pytest.mark.asyncio
+async def test_context_cache_ttl_is_refreshed_before_expiry(context_caches, caches):
+    await context_caches.get([DOCUMENT])
+    context_caches._handles = {key: handle._replace(expire_time=time.time() + 60) for key, handle in context_caches._handles.items()}
+
+    await context_caches.get([DOCUMENT])
+
+    assert caches.updated == ["cachedContents/1"]
+    assert context_caches.handles()[0].expire_time > time.time() + 500
+
+
+@pytest.mark.asyncio
+async def test_context_cache_is_recreated_when_gone(context_caches, caches):
+    await context_caches.get([DOCUMENT])
+    context_caches._handles = {key: handle._replace(expire_time=time.time() + 60) for key, handle in context_caches._handles.items()}
+    caches.missing.add("cachedContents/1")
+
+    prompt_cache = await context_caches.get([DOCUMENT])
+
+    assert prompt_cache.cached_content == "cachedContents/2"
+    await context_caches.clear()
+    assert caches.deleted == ["cachedContents/2"]
+
+
+@pytest.mark.asyncio
+async def test_context_cache_hashes_off_the_loop_and_forgets_expired_handles(monkeypatch, context_caches, caches):
+    threads = []
+    digest = prompt_cache._digest
+    monkeypatch.setattr(prompt_cache, "_digest", lambda *args: threads.append(threading.get_ident()) or digest(*args))
+    await context_caches.get([DOCUMENT])
+    context_caches._handles = {key: handle._replace(expire_time=time.time() - 1) for key, handle in context_caches._handles.items()}
+
+    await context_caches.get(["Another document"])
+
+    assert threading.get_ident() not in threads
+    assert [handle.name for handle in context_caches.handles()] == ["cachedContents/2"]
@@ -0,0 +1,160 @@
+"""Tests for adaptive client-side rate limiting, partly against a local stub server."""
+
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers.rate_limit import (
+    AdaptiveRateLimiter,
+    RateLimit,
+    RateLimitCallbackHandler,
+    clear_rate_limiters,
+    get_rate_limiter,
+    parse_duration,
+    parse_retry_after,
+)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_limiters():
+    clear_rate_limiters()
+    yield
+    clear_rate_limiters()
+
+
+@pytest.mark.parametrize(
+    ("value", "seconds"),
+    [("1.5", 1.5), ("20ms", 0.02), ("6m0s", 360), ("1h2m3.5s", 3723.5), ("soon", None), ("", None)],
+)
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
+
+
+def test_parse_retry_after_prefers_milliseconds():
+    assert parse_retry_after({"Retry-After-Ms": "250", "Retry-After": "3"}) == 0.25
+    assert parse_retry_after({"retry-after": "3"}) == 3
+    assert parse_retry_after({"x-other": "1"}) is None
+
+
+def test_requests_per_minute_allows_burst_then_waits():
+    """Test that the burst is let through immediately and further requests are refused."""
+    limiter = AdaptiveRateLimiter(RateLimit(requests_per_minute=60, burst_seconds=2))
+
+    assert limiter.acquire(blocking=False)
+    assert limiter.acquire(blocking=False)
+    assert not limiter.acquire(blocking=False)
+
+
+def test_token_usage_delays_next_request():
+    limiter = AdaptiveRateLimiter(RateLimit(tokens_per_minute=6000, burst_seconds=1), check_every=0.01)
+    assert limiter.acquire(blocking=False)
+
+    # 100 tokens of budget, 110 used: the next request waits ~0.1s for 10 tokens plus one
+    limiter.record_usage(110)
+    assert not limiter.acquire(blocking=False)
+
+    start = time.monotonic()
+    assert limiter.acquire()
+    assert 0.05 < time.monotonic() - start < 1.0
+
+
+def test_pause_blocks_requests():
+    limiter = AdaptiveRateLimiter()
+    limiter.pause(60)
+    assert not limiter.acquire(blocking=False)
+
+
+def test_update_from_headers():
+    """Test that exhausted budgets pause until reset and low budgets cap the bucket."""
+    limiter = AdaptiveRateLimiter(RateLimit(requests_per_minute=600))
+
+    limiter.update_from_headers({"x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "1s"})
+    assert limiter.acquire(blocking=False)
+    assert not limiter.acquire(blocking=False)
+
+    limiter = AdaptiveRateLimiter()
+    limiter.update_from_headers({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "20s"})
+    assert not limiter.acquire(blocking=False)
+
+
+def test_callback_handler_records_usage_and_429():
+    limiter = AdaptiveRateLimiter(RateLimit(tokens_per_minute=600, burst_seconds=1))
+    handler = RateLimitCallbackHandler(limiter)
+
+    message = AIMessage(content="hi", usage_metadata={"input_tokens": 5, "output_tokens": 15, "total_tokens": 20})
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+    assert not limiter.acquire(blocking=False)
+
+    class Response:
+        status_code = 429
+        headers = {"retry-after": "30"}
+
+    class RateLimitError(Exception):
+        response = Response()
+
+    limiter = AdaptiveRateLimiter()
+    RateLimitCallbackHandler(limiter).on_llm_error(RateLimitError())
+    assert not limiter.acquire(blocking=False)
+
+
+def test_get_rate_limiter_is_shared_per_model():
+    limit = RateLimit(requests_per_minute=60)
+
+    assert get_rate_limiter("openai", "gpt-5.1", limit) is get_rate_limiter("openai", "gpt-5.1", limit)
+    assert get_rate_limiter("openai", "gpt-5.1", limit) is not get_rate_limiter("openai", "gpt-5-mini", limit)
+
+
+def test_get_rate_limiter_rejects_a_conflicting_limit():
+    """Test that one model never gets two buckets that would double its budget."""
+    limiter = get_rate_limiter("openai", "gpt-5.1", RateLimit(requests_per_minute=60))
+
+    with pytest.raises(ValueError, match="already exists"):
+        get_rate_limiter("openai", "gpt-5.1", RateLimit(requests_per_minute=120))
+
+    clear_rate_limiters()
+    assert get_rate_limiter("openai", "gpt-5.1", RateLimit(requests_per_minute=120)) is not limiter
+
+
+def test_get_llm_attaches_shared_limiter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    limit = RateLimit(requests_per_minute=120)
+
+    openai_llm, _ = get_llm(model_string="openai:gpt-5.1:none", rate_limit=limit)
+    groq_llm, _ = get_llm(model_string="groq:openai/gpt-oss-120b", rate_limit=limit)
+    same_llm, _ = get_llm(model_string="openai:gpt-5.1:none", rate_limit=limit)
+
+    assert openai_llm.rate_limiter is get_rate_limiter("openai", "gpt-5.1", limit)
+    assert openai_llm.rate_limiter is same_llm.rate_limiter
+    assert groq_llm.rate_limiter is get_rate_limiter("groq", "openai/gpt-oss-120b", limit)
+    assert any(isinstance(callback, RateLimitCallbackHandler) for callback in openai_llm.callbacks)
+    assert openai_llm.include_response_headers
+
+
+def test_get_llm_without_rate_limit_attaches_nothing(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none")
+
+    assert llm.rate_limiter is None
+    assert not llm.callbacks
+
+
+@pytest.mark.asyncio
+async def test_limiter_adapts_to_response_headers(stub_server_factory, http_clients):
+    """Test that an exhausted budget reported by the provider holds back the next call."""
+    headers = {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "300ms"}
+    server = stub_server_factory(reply="hello", headers=headers)
+    limiter = AdaptiveRateLimiter(check_every=0.01)
+    llm, _ = get_llm(
+        model_string="openai:gpt-5.1:none", streaming=False, http_clients=http_clients, rate_limit=limiter
+    )
+
+    await llm.ainvoke([HumanMessage(content="Say hello")])
+    start = time.monotonic()
+    await llm.ainvoke([HumanMessage(content="Say hello")])
+
+    assert time.monotonic() - start >= 0.25
+    assert len(server.requests) == 2
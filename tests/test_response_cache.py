@@ -0,0 +1,183 @@
+"""Tests for the response caches, using a local stub server as the provider."""
+
+import sys
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration
+from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers.response_cache import (
+    CachedChatModel,
+    MemoryResponseCache,
+    RedisResponseCache,
+    SQLiteResponseCache,
+    no_response_cache,
+)
+
+MESSAGES = [HumanMessage(content="Classify: hello")]
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "hello there"}
+
+
+class FakeRedis:
+    """The subset of the `redis.Redis` API used by `RedisResponseCache`."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at < time.monotonic():
+            return None
+        return value
+
+    def set(self, key, value, px=None):
+        self.data[key] = (value.encode(), time.monotonic() + px / 1000 if px else None)
+
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match.rstrip("*"))]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_cache(request, tmp_path):
+    def make(ttl=None):
+        match request.param:
+            case "memory":
+                return MemoryResponseCache(ttl=ttl)
+            case "sqlite":
+                return SQLiteResponseCache(tmp_path / "responses.sqlite", ttl=ttl)
+            case "redis":
+                return RedisResponseCache(ttl=ttl, client=FakeRedis())
+
+    return make
+
+
+GENERATIONS = [ChatGeneration(message=AIMessage(content="cached", usage_metadata={"input_tokens": 1, "output_tokens": 1, "total_tokens": 2}))]
+
+
+def test_backend_roundtrip(make_cache):
+    cache = make_cache()
+
+    assert cache.lookup("prompt", "llm") is None
+    cache.update("prompt", "llm", GENERATIONS)
+
+    [generation] = cache.lookup("prompt", "llm")
+    assert generation.message.content == "cached"
+    assert generation.message.usage_metadata["total_tokens"] == 2
+    assert cache.lookup("prompt", "other llm") is None
+
+    cache.clear()
+    assert cache.lookup("prompt", "llm") is None
+
+
+def test_backend_ttl(make_cache):
+    cache = make_cache(ttl=0.05)
+    cache.update("prompt", "llm", GENERATIONS)
+
+    assert cache.lookup("prompt", "llm") is not None
+    time.sleep(0.1)
+    assert cache.lookup("prompt", "llm") is None
+
+
+def test_no_response_cache_skips_reads_and_writes(make_cache):
+    cache = make_cache()
+    cache.update("prompt", "llm", GENERATIONS)
+
+    with no_response_cache():
+        assert cache.lookup("prompt", "llm") is None
+        cache.update("other", "llm", GENERATIONS)
+
+    assert cache.lookup("prompt", "llm") is not None
+    assert cache.lookup("other", "llm") is None
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    """Test that a second connection, as in another worker, sees the entries."""
+    SQLiteResponseCache(tmp_path / "responses.sqlite").update("prompt", "llm", GENERATIONS)
+
+    assert SQLiteResponseCache(tmp_path / "responses.sqlite").lookup("prompt", "llm") is not None
+
+
+@pytest.mark.asyncio
+async def test_get_llm_response_cache_invoke(stub_server, http_clients):
+    """Test that a repeated call is answered from the cache without a request."""
+    llm, _ = get_llm(
+        model_string="openai:gpt-5.1:none",
+        streaming=False,
+        http_clients=http_clients,
+        response_cache=MemoryResponseCache(),
+    )
+
+    first = await llm.ainvoke(MESSAGES)
+    second = await llm.ainvoke(MESSAGES)
+    await llm.ainvoke([HumanMessage(content="Classify: bye")])
+
+    assert isinstance(llm, CachedChatModel)
+    assert second.text == first.text == "hello there"
+    assert len(stub_server.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_llm_response_cache_replays_streams(stub_server, http_clients):
+    """Test that a cached streaming response is replayed as a stream."""
+    llm, _ = get_llm(
+        model_string="openai:gpt-5.1:none", http_clients=http_clients, response_cache=MemoryResponseCache()
+    )
+
+    first = [chunk async for chunk in llm.astream(MESSAGES)]
+    replayed = [chunk async for chunk in llm.astream(MESSAGES)]
+    invoked = await llm.ainvoke(MESSAGES)
+
+    assert len(stub_server.requests) == 1
+    assert len(first) > len(replayed) > 0
+    assert sum(replayed[1:], replayed[0]).text == sum(first[1:], first[0]).text == "hello there"
+    assert invoked.text == "hello there"
+
+
+def test_get_llm_response_cache_sync_stream(stub_server):
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", response_cache=MemoryResponseCache())
+
+    for _ in range(2):
+        assert "".join(chunk.text for chunk in llm.stream(MESSAGES)) == "hello there"
+
+    assert len(stub_server.requests) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_llm_response_cache_opt_out(stub_server, http_clients):
+    llm, _ = get_llm(
+        model_string="openai:gpt-5.1:none", http_clients=http_clients, response_cache=MemoryResponseCache()
+    )
+    await llm.ainvoke(MESSAGES)
+
+    with no_response_cache():
+        await llm.ainvoke(MESSAGES)
+        [chunk async for chunk in llm.astream(MESSAGES)]
+
+    assert len(stub_server.requests) == 3
+
+
+def test_get_llm_response_cache_keys_on_model(stub_server):
+    cache = MemoryResponseCache()
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", streaming=False, response_cache=cache)
+    other, _ = get_llm(model_string="openai:gpt-5-mini:low", streaming=False, response_cache=cache)
+
+    llm.invoke(MESSAGES)
+    other.invoke(MESSAGES)
+
+    assert len(stub_server.requests) == 2
+
+
+def test_redis_cache_requires_redis(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)
+
+    with pytest.raises(ImportError, match="llm-helpers\\[redis\\]"):
+        RedisResponseCache()
@@ -0,0 +1,230 @@
+"""Tests for the latency-aware router, using local fake chat models."""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from src.llm_helpers.get_llm import clear_llm_cache, get_llm
+from src.llm_helpers.rate_limit import RateLimit, clear_rate_limiters
+from src.llm_helpers.router import RouterChatModel
+
+
+class FakeChatModel(BaseChatModel):
+    """Replies with `reply` after `delay` seconds, or raises if `fail` is set."""
+
+    reply: str
+    delay: float = 0.0
+    fail: bool = False
+    calls: int = 0
+    cancelled: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _generate(self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} failed")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.reply} failed")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _stream(self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.reply} failed")
+        for word in self.reply.split():
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+    async def _astream(self, messages: list[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.reply} failed")
+        for word in self.reply.split():
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+MESSAGES = [HumanMessage(content="hi")]
+
+
+@pytest.mark.asyncio
+async def test_router_prefers_fastest_backend():
+    """Test that after measuring every backend, calls go to the fastest one."""
+    slow = FakeChatModel(reply="slow", delay=0.05)
+    fast = FakeChatModel(reply="fast", delay=0.0)
+    router = RouterChatModel(backends=[slow, fast], names=["slow", "fast"])
+
+    replies = [(await router.ainvoke(MESSAGES)).content for _ in range(5)]
+
+    assert replies == ["slow", "fast", "fast", "fast", "fast"]
+    stats = {s.name: s for s in router.backend_stats()}
+    assert stats["fast"].ewma_latency < stats["slow"].ewma_latency
+
+
+@pytest.mark.asyncio
+async def test_router_fails_over_and_marks_backend_unhealthy():
+    """Test that failing backends are skipped after enough errors."""
+    broken = FakeChatModel(reply="broken", fail=True)
+    good = FakeChatModel(reply="good", delay=0.01)
+    router = RouterChatModel(backends=[broken, good], names=["broken", "good"], ewma_alpha=0.5)
+
+    for _ in range(3):
+        assert (await router.ainvoke(MESSAGES)).content == "good"
+
+    stats = {s.name: s for s in router.backend_stats()}
+    assert not stats["broken"].healthy
+    assert stats["good"].healthy
+    assert broken.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_router_retries_unhealthy_backend_after_cooldown():
+    broken = FakeChatModel(reply="broken", fail=True)
+    good = FakeChatModel(reply="good", delay=0.01)
+    router = RouterChatModel(backends=[broken, good], ewma_alpha=1.0, cooldown=0.0)
+
+    await router.ainvoke(MESSAGES)
+    await router.ainvoke(MESSAGES)
+
+    assert broken.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_router_raises_when_all_backends_fail():
+    router = RouterChatModel(backends=[FakeChatModel(reply="a", fail=True), FakeChatModel(reply="b", fail=True)])
+
+    with pytest.raises(RuntimeError, match="failed"):
+        await router.ainvoke(MESSAGES)
+
+
+@pytest.mark.asyncio
+async def test_router_hedges_slow_backend():
+    """Test that a stalled backend is hedged after the deadline and the fast one wins."""
+    stalled = FakeChatModel(reply="stalled", delay=5.0)
+    backup = FakeChatModel(reply="backup", delay=0.0)
+    router = RouterChatModel(backends=[stalled, backup], hedge=True, hedge_delay=0.05)
+
+    start = time.perf_counter()
+    response = await router.ainvoke(MESSAGES)
+
+    assert response.content == "backup"
+    assert time.perf_counter() - start < 1.0
+    assert stalled.cancelled == 1
+
+
+@pytest.mark.asyncio
+async def test_router_hedge_deadline_uses_latency_percentile():
+    router = RouterChatModel(backends=[FakeChatModel(reply="a")], hedge_percentile=0.9, min_samples=10)
+    for latency in range(1, 11):
+        router._record_success(0, "invoke", latency / 10)
+
+    assert router._hedge_deadline(0, "invoke") == pytest.approx(0.9)
+
+
+@pytest.mark.asyncio
+async def test_router_keeps_stream_and_invoke_latencies_apart():
+    """Test that quick first chunks do not shorten the hedge deadline of full responses."""
+    router = RouterChatModel(backends=[FakeChatModel(reply="a")], min_samples=10)
+    for _ in range(10):
+        router._record_success(0, "stream", 0.1)
+        router._record_success(0, "invoke", 2.0)
+
+    assert router._hedge_deadline(0, "stream") == pytest.approx(0.1)
+    assert router._hedge_deadline(0, "invoke") == pytest.approx(2.0)
+    [stats] = router.backend_stats()
+    assert (stats.ewma_time_to_first_token, stats.ewma_latency, stats.samples) == (
+        pytest.approx(0.1),
+        pytest.approx(2.0),
+        20,
+    )
+
+
+@pytest.mark.asyncio
+async def test_router_no_hedge_when_primary_is_fast():
+    primary = FakeChatModel(reply="primary", delay=0.0)
+    secondary = FakeChatModel(reply="secondary", delay=0.0)
+    router = RouterChatModel(backends=[primary, secondary], hedge=True, hedge_delay=1.0)
+
+    assert (await router.ainvoke(MESSAGES)).content == "primary"
+    assert secondary.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_router_astream_hedges_on_first_token():
+    """Test that streaming hedges on the time to first token and streams the winner."""
+    stalled = FakeChatModel(reply="stalled reply", delay=5.0)
+    backup = FakeChatModel(reply="backup reply here", delay=0.0)
+    router = RouterChatModel(backends=[stalled, backup], hedge=True, hedge_delay=0.05)
+
+    chunks = [chunk.content async for chunk in router.astream(MESSAGES) if chunk.content]
+
+    assert chunks == ["backup", "reply", "here"]
+    assert stalled.cancelled == 1
+
+
+def test_router_sync_invoke_and_stream_fail_over():
+    broken = FakeChatModel(reply="broken", fail=True)
+    good = FakeChatModel(reply="good reply")
+    router = RouterChatModel(backends=[broken, good])
+
+    assert router.invoke(MESSAGES).content == "good reply"
+    assert [chunk.content for chunk in router.stream(MESSAGES) if chunk.content] == ["good", "reply"]
+
+
+def test_router_from_model_strings(monkeypatch):
+    """Test that backends are built with get_llm and named after their model strings."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+
+    router = RouterChatModel.from_model_strings(
+        ["openai:gpt-5.1:none", "groq:openai/gpt-oss-120b"], hedge=True, cache=False
+    )
+
+    assert router.names == ["openai:gpt-5.1:none", "groq:openai/gpt-oss-120b"]
+    assert [backend._llm_type for backend in router.backends] == ["openai-chat", "groq-chat"]
+    assert router.hedge
+
+
+def test_router_passes_get_llm_options_to_the_backends(stub_server):
+    """Test that options named like BaseChatModel fields reach get_llm, as in the README."""
+    limit = RateLimit(requests_per_minute=600)
+    try:
+        router = RouterChatModel.from_model_strings(
+            ["openai:gpt-5.1:none", "azure:gpt-5-chat"], streaming=False, hedge=True, cache=True, rate_limit=limit
+        )
+
+        assert router.invoke(MESSAGES).content
+        assert router.cache is None and router.rate_limiter is None
+        assert router.hedge
+        assert all(backend.rate_limiter.limit == limit for backend in router.backends)
+        assert router.backends[0] is get_llm(model_string="openai:gpt-5.1:none", streaming=False, cache=True, rate_limit=limit)[0]
+    finally:
+        clear_llm_cache()
+        clear_rate_limiters()
+
+
+def test_router_requires_backends():
+    with pytest.raises(ValueError, match="at least one backend"):
+        RouterChatModel(backends=[])
@@ -0,0 +1,137 @@
+"""Tests for the Server-Sent Events streaming adapter."""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers.sse import StreamEvent, chunk_events, encode_sse, normalized_stream, sse_response, sse_stream
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "one two three four"}
+
+
+async def _chunks(*chunks, delay=0.0):
+    for chunk in chunks:
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+@pytest.mark.parametrize(
+    "chunk, expected",
+    [
+        (AIMessageChunk(content="hi"), [StreamEvent("text", "hi")]),
+        (AIMessageChunk(content=""), []),
+        (AIMessageChunk(content=[{"type": "text", "text": "hi", "index": 0}]), [StreamEvent("text", "hi")]),
+        (
+            AIMessageChunk(content=[{"type": "reasoning", "summary": [{"type": "summary_text", "text": "hm"}]}]),
+            [StreamEvent("reasoning", "hm")],
+        ),
+        (AIMessageChunk(content=[{"type": "thinking", "thinking": "hm"}, "hi"]), [StreamEvent("reasoning", "hm"), StreamEvent("text", "hi")]),
+        (
+            AIMessageChunk(content=[{"type": "thinking", "thinking": [{"type": "text", "text": "hm"}]}]),
+            [StreamEvent("reasoning", "hm")],
+        ),
+        (AIMessageChunk(content="", additional_kwargs={"reasoning_content": "hm"}), [StreamEvent("reasoning", "hm")]),
+        (AIMessageChunk(content=[{"type": "function_call", "arguments": "{}"}]), []),
+    ],
+)
+def test_chunk_events_normalizes_provider_formats(chunk, expected):
+    assert chunk_events(chunk) == expected
+
+
+@pytest.mark.asyncio
+async def test_coalesces_until_kind_changes():
+    chunks = _chunks(
+        AIMessageChunk(content="", additional_kwargs={"reasoning_content": "think "}),
+        AIMessageChunk(content="", additional_kwargs={"reasoning_content": "more"}),
+        AIMessageChunk(content="a"),
+        AIMessageChunk(content="b"),
+    )
+
+    events = [event async for event in normalized_stream(chunks, flush_interval=10)]
+
+    assert events == [StreamEvent("reasoning", "think more"), StreamEvent("text", "ab")]
+
+
+@pytest.mark.asyncio
+async def test_flushes_by_size_and_interval():
+    by_size = _chunks(*(AIMessageChunk(content="ab") for _ in range(3)))
+    assert [event.text async for event in normalized_stream(by_size, flush_interval=10, flush_size=4)] == ["abab", "ab"]
+
+    slow = _chunks(*(AIMessageChunk(content="a") for _ in range(3)), delay=0.05)
+    assert [event.text async for event in normalized_stream(slow, flush_interval=0.01)] == ["a", "a", "a"]
+
+
+@pytest.mark.asyncio
+async def test_error_is_raised_after_pending_text():
+    async def failing():
+        yield AIMessageChunk(content="partial")
+        raise RuntimeError("boom")
+
+    events = []
+    with pytest.raises(RuntimeError, match="boom"):
+        async for event in normalized_stream(failing(), flush_interval=10):
+            events.append(event)
+
+    assert events == [StreamEvent("text", "partial")]
+
+
+@pytest.mark.asyncio
+async def test_bounded_queue_stops_reading_ahead():
+    read = 0
+
+    async def counting():
+        nonlocal read
+        for _ in range(100):
+            read += 1
+            yield AIMessageChunk(content="x")
+
+    stream = normalized_stream(counting(), flush_interval=0, flush_size=1, max_queued=4)
+    await anext(stream)
+    await asyncio.sleep(0.01)
+
+    assert read < 10
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_ends_with_error_event():
+    async def failing():
+        yield AIMessageChunk(content="partial")
+        raise RuntimeError("secret detail")
+
+    encoded = []
+    with pytest.raises(RuntimeError):
+        async for data in sse_stream(failing()):
+            encoded.append(data)
+
+    assert encoded == [b'event: text\ndata: {"text":"partial"}\n\n', b'event: error\ndata: {"error":"RuntimeError"}\n\n']
+
+
+def test_encode_sse():
+    assert encode_sse("text", {"text": "a\nb"}) == b'event: text\ndata: {"text":"a\\nb"}\n\n'
+
+
+@pytest.mark.asyncio
+async def test_sse_response_streams_get_llm_client(stub_server, http_clients):
+    llm, _ = get_llm(model_string="openai:gpt-5.1:none", http_clients=http_clients)
+    app = FastAPI()
+
+    @app.get("/chat")
+    async def chat():
+        return sse_response(llm.astream([HumanMessage(content="Count")]), flush_interval=10)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://app") as client:
+        response = await client.get("/chat")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.content == (
+        b'event: text\ndata: {"text":"one two three four"}\n\n' b"event: done\ndata: {}\n\n"
+    )
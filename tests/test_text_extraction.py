@@ -0,0 +1,116 @@
+"""Tests for local text extraction and the text mode of file_to_message."""
+
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi import UploadFile
+from langchain_core.messages import HumanMessage
+from pypdf import PdfWriter
+from src.llm_helpers.encoding_cache import EncodingCache
+from src.llm_helpers.file_utils import file_to_message, file_to_messages
+from src.llm_helpers.get_llm import get_llm
+from src.llm_helpers.text_extraction import DOCX_CONTENT_TYPE, TextExtractionError, extract_text
+
+PDF_PATH = Path(__file__).parent / "data" / "32047_53837_Ergaenzende_Informationen_zu_Ihrer_Abgabe.pdf"
+
+
+def _upload(content: bytes, filename: str, content_type: str | None) -> UploadFile:
+    headers = {"content-type": content_type} if content_type else {}
+    return UploadFile(filename=filename, file=io.BytesIO(content), size=len(content), headers=headers)
+
+
+def _docx(*paragraphs: str) -> bytes:
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t><w:tab/><w:t>end</w:t></w:r></w:p>" for text in paragraphs)
+    document = (
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        archive.writestr("word/document.xml", document)
+    return output.getvalue()
+
+
+def test_extract_pdf_text_layer():
+    text = extract_text(PDF_PATH.read_bytes(), "application/pdf")
+
+    assert text.startswith("Ergänzende Informationen zur Abgabe")
+    assert "Ordnungsnummer 32047/53837" in text
+
+
+def test_extract_docx_paragraphs():
+    assert extract_text(_docx("First", "Second"), DOCX_CONTENT_TYPE) == "First end\nSecond end"
+
+
+def test_extract_html_skips_scripts_and_styles():
+    html = (
+        "<html><head><title>Ignored</title><style>p {}</style></head>"
+        "<body><h1>Title</h1><script>var x;</script><p>One &amp;   two</p><ul><li>a</li><li>b</li></ul></body></html>"
+    )
+
+    assert extract_text(html.encode(), "text/html") == "Title\n\nOne & two\n\na\n\nb"
+
+
+def test_plain_text_keeps_indentation():
+    yaml = "root:\n  child: 1   \n\n\n\n  other: 2\n"
+
+    assert extract_text(yaml.encode(), "application/yaml") == "root:\n  child: 1\n\n  other: 2"
+
+
+def test_files_without_text_are_rejected():
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    scanned = io.BytesIO()
+    writer.write(scanned)
+
+    with pytest.raises(TextExtractionError, match="contains no text"):
+        extract_text(scanned.getvalue(), "application/pdf")
+    with pytest.raises(TextExtractionError, match="image/png"):
+        extract_text(b"\x89PNG", "image/png")
+
+
+@pytest.mark.asyncio
+async def test_text_mode_works_for_groq_and_mistral():
+    for provider in ("groq", "mistralai"):
+        part = await file_to_message(_upload(PDF_PATH.read_bytes(), "bescheid.pdf", "application/pdf"), provider, mode="text")
+
+        assert part["type"] == "text"
+        assert part["text"].startswith('<document name="bescheid.pdf">\nErgänzende Informationen')
+        assert part["text"].endswith("\n</document>")
+
+
+@pytest.mark.asyncio
+async def test_text_mode_caches_extractions(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(
+        "src.llm_helpers.file_utils.extract_text", lambda content, content_type: calls.append(content_type) or "text"
+    )
+    cache = EncodingCache(directory=tmp_path)
+
+    first = await file_to_message(_upload(b"# Notes", "notes.md", None), "openai", mode="text", cache=cache)
+    second = await file_to_message(_upload(b"# Notes", "copy.md", "text/markdown"), "google", mode="text", cache=cache)
+
+    assert calls == ["text/markdown"]
+    assert first["text"] == '<document name="notes.md">\ntext\n</document>'
+    assert second["text"] == '<document name="copy.md">\ntext\n</document>'
+    assert cache.info().hits == 1
+
+
+@pytest.mark.asyncio
+async def test_text_mode_rejects_images_before_reading():
+    with pytest.raises(TextExtractionError):
+        await file_to_messages([_upload(b"\x89PNG", "photo.png", "image/png")], "groq", mode="text")
+
+
+@pytest.mark.asyncio
+async def test_text_part_is_sent_to_groq(stub_server, http_clients):
+    llm, provider = get_llm(model_string="groq:openai/gpt-oss-120b", streaming=False, http_clients=http_clients)
+    part = await file_to_message(_upload(b"Line one\nLine two", "notes.txt", "text/plain"), provider, mode="text")
+
+    await llm.ainvoke([HumanMessage(content=[{"type": "text", "text": "Summarize"}, part])])
+
+    [(_, _, body)] = stub_server.requests
+    content = body["messages"][0]["content"]
+    assert content[1] == {"type": "text", "text": '<document name="notes.txt">\nLine one\nLine two\n</document>'}
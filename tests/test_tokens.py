@@ -0,0 +1,116 @@
+"""Tests for local token estimation and context-budget trimming."""
+
+import io
+from pathlib import Path
+
+import pytest
+from fastapi import UploadFile
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from src.llm_helpers import tokens
+from src.llm_helpers.file_utils import file_to_message
+from src.llm_helpers.tokens import (
+    MESSAGE_OVERHEAD_TOKENS,
+    REPLY_PRIMING_TOKENS,
+    count_message_tokens,
+    count_tokens,
+    fits_context,
+    get_context_budget,
+    get_encoding,
+    trim_to_budget,
+)
+
+PDF_PATH = Path(__file__).parent / "data" / "32047_53837_Ergaenzende_Informationen_zu_Ihrer_Abgabe.pdf"
+
+
+class FakeEncoding:
+    """Counts one token per word."""
+
+    def encode_ordinary(self, text):
+        return text.split()
+
+
+@pytest.fixture
+def word_encoding(monkeypatch):
+    monkeypatch.setattr(tokens, "_encodings", {tokens.ENCODING_NAME: FakeEncoding()})
+
+
+def _upload(path: Path) -> UploadFile:
+    return UploadFile(filename=path.name, file=io.BytesIO(path.read_bytes()), headers={"content-type": "application/pdf"})
+
+
+def test_encoding_is_loaded_once(monkeypatch):
+    monkeypatch.setattr(tokens, "_encodings", {})
+
+    assert get_encoding() is get_encoding()
+    assert list(tokens._encodings) == [tokens.ENCODING_NAME]
+
+
+def test_falls_back_to_characters_without_encoding(monkeypatch):
+    monkeypatch.setattr(tokens, "_encodings", {tokens.ENCODING_NAME: None})
+
+    assert tokens.count_text_tokens("a" * 9) == 3
+
+
+def test_count_tokens_includes_message_overhead(word_encoding):
+    messages = [SystemMessage(content="Be brief"), HumanMessage(content=[{"type": "text", "text": "Say hello"}])]
+
+    assert count_tokens(messages, model_string="openai:gpt-5.1:none") == 4 + 2 * MESSAGE_OVERHEAD_TOKENS + REPLY_PRIMING_TOKENS
+    assert count_tokens("Say hello", model_string="openai:gpt-5.1:none") == 2 + MESSAGE_OVERHEAD_TOKENS + REPLY_PRIMING_TOKENS
+
+
+def test_tool_calls_are_counted(word_encoding):
+    message = AIMessage(content="", tool_calls=[{"name": "search", "args": {"q": "x"}, "id": "1"}])
+
+    assert count_message_tokens(message) > MESSAGE_OVERHEAD_TOKENS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider, page_tokens", [("openai", 1500), ("azure", 1500), ("google", 258)])
+async def test_file_parts_are_estimated_per_pdf_page(word_encoding, provider, page_tokens):
+    part = await file_to_message(_upload(PDF_PATH), provider)
+
+    assert count_message_tokens(HumanMessage(content=[part]), provider) == MESSAGE_OVERHEAD_TOKENS + page_tokens
+
+
+def test_file_references_are_not_counted(word_encoding):
+    message = HumanMessage(content=[{"type": "input_file", "file_id": "file-1"}])
+
+    assert count_message_tokens(message) == MESSAGE_OVERHEAD_TOKENS
+
+
+def test_context_budget_uses_longest_prefix():
+    assert get_context_budget(model_string="openai:gpt-5.1:none").context_window == 400_000
+    assert get_context_budget(model_string="azure:gpt-5-chat").context_window == 128_000
+    with pytest.raises(ValueError, match="Unknown context window"):
+        get_context_budget(model_string="openai:unknown-model")
+
+
+def test_fits_context(word_encoding):
+    prompt = "word " * 90
+
+    assert fits_context(prompt, model_string="openai:gpt-5.1:none", context_window=200, max_output_tokens=100)
+    assert not fits_context(prompt, model_string="openai:gpt-5.1:none", context_window=150, max_output_tokens=100)
+
+
+def test_trim_keeps_system_and_latest_turns(word_encoding):
+    system = SystemMessage(content="rules")
+    history = [
+        HumanMessage(content="old " * 20),
+        AIMessage(content="old answer " * 10),
+        HumanMessage(content="recent question"),
+        AIMessage(content="recent answer"),
+        HumanMessage(content="new question"),
+    ]
+    messages = [system, *history]
+
+    trimmed = trim_to_budget(messages, model_string="openai:gpt-5.1:none", context_window=60, max_output_tokens=20)
+
+    assert trimmed == [system, *history[2:]]
+    assert trim_to_budget(messages, model_string="openai:gpt-5.1:none", context_window=1000, max_output_tokens=20) == messages
+
+
+def test_trim_raises_if_last_message_does_not_fit(word_encoding):
+    messages = [SystemMessage(content="rules"), HumanMessage(content="word " * 100)]
+
+    with pytest.raises(ValueError, match="does not fit"):
+        trim_to_budget(messages, model_string="openai:gpt-5.1:none", context_window=60, max_output_tokens=20)
@@ -0,0 +1,75 @@
+"""Tests for client warmup, against a local stub server."""
+
+import pytest
+from langchain_core.messages import HumanMessage
+from src.llm_helpers.get_llm import clear_llm_cache, get_llm, get_llm_cache_info
+from src.llm_helpers.http_clients import HttpClients
+from src.llm_helpers.warmup import warmup
+
+MODEL_STRINGS = [
+    "openai:gpt-5.1:none",
+    "azure:gpt-5-chat",
+    "groq:openai/gpt-oss-120b",
+    "mistralai:mistral-large-latest",
+]
+
+
+@pytest.fixture
+def stub_server_options():
+    return {"reply": "hello"}
+
+
+@pytest.mark.asyncio
+async def test_warmup_builds_clients_and_connects(stub_server):
+    """Test that every client is cached and opens a connection without a completion."""
+    clients = HttpClients()
+
+    timings = await warmup(MODEL_STRINGS, streaming=False, http_clients=clients)
+
+    assert [timing.model_string for timing in timings] == MODEL_STRINGS
+    assert [timing.provider for timing in timings] == ["openai", "azure", "groq", "mistralai"]
+    assert all(timing.error is None and timing.connect_seconds is not None for timing in timings)
+    assert all(method == "GET" and path.endswith("/models") for method, path, _ in stub_server.requests)
+    assert len(stub_server.requests) == len(MODEL_STRINGS)
+    assert get_llm_cache_info().currsize == len(MODEL_STRINGS)
+
+    # Request handlers get the warm client and its open connection
+    connections = set(stub_server.connections)
+    for model_string in MODEL_STRINGS:
+        llm, _ = get_llm(model_string=model_string, streaming=False, cache=True, http_clients=clients)
+        await llm.ainvoke([HumanMessage(content="Say hello")])
+    assert stub_server.connections <= connections
+    assert get_llm_cache_info().hits == len(MODEL_STRINGS)
+    await clients.aclose()
+
+
+@pytest.mark.asyncio
+async def test_warmup_opens_several_connections(stub_server):
+    clients = HttpClients()
+
+    await warmup(["openai:gpt-5.1:none"], connections=3, http_clients=clients)
+
+    assert len(stub_server.requests) == 3
+    assert len(stub_server.connections) == 3
+    await clients.aclose()
+
+
+@pytest.mark.asyncio
+async def test_warmup_reports_connection_errors(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    clients = HttpClients()
+
+    [timing] = await warmup(["openai:gpt-5.1:none"], http_clients=clients, streaming=False)
+
+    assert timing.connect_seconds is None
+    assert "Connection" in timing.error
+    assert timing.build_seconds > 0
+    await clients.aclose()
+    clear_llm_cache()
+
+
+@pytest.mark.asyncio
+async def test_warmup_rejects_invalid_model_string():
+    with pytest.raises(ValueError):
+        await warmup(["nope:model"])